@@ -0,0 +1,179 @@
+"""
+Local Ethereum stand-in for end-to-end and load testing.
+
+`LocalChain` runs an in-process eth-tester chain behind a JSON-RPC HTTP endpoint, with funded issuing accounts and
+an optional block time (transactions are mined instantly by default). Point `ETH_NODE_URL_ROPSTEN` at it and `/issue`
+and `/tx` run end to end without network access or real gas:
+
+    python -m benchmarks.ethchain --port 8545 --block-time 1 --accounts 2
+
+prints the environment to start the app with and serves until interrupted. Tests and benchmarks can use it
+in-process instead:
+
+    with LocalChain(block_time=0.5) as chain:
+        app = create_local_app(chain)
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+from eth_account import Account
+from eth_tester import EthereumTester, PyEVMBackend
+from eth_utils import keccak
+from web3.providers.eth_tester import EthereumTesterProvider
+
+DEFAULT_BALANCE = 100 * 10 ** 18
+KEY_CREATED_AT = '2019-01-01T00:00:00.000000+00:00'
+
+
+class LocalChain:
+    """An eth-tester chain served over JSON-RPC from a background thread."""
+
+    def __init__(self, block_time: float = 0.0, accounts: int = 1, balance: int = DEFAULT_BALANCE,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.block_time = block_time
+        self.balance = balance
+        self.tester = EthereumTester(PyEVMBackend())
+        self.provider = EthereumTesterProvider(self.tester)
+        self.accounts = [self._create_account(i) for i in range(accounts)]
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.server.daemon_threads = True
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'LocalChain':
+        if self.block_time:
+            self.tester.disable_auto_mine_transactions()
+            self._threads.append(threading.Thread(target=self._mine, name='local-chain-miner', daemon=True))
+        self._threads.append(threading.Thread(target=self.server.serve_forever, name='local-chain', daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.server.shutdown()
+        self.server.server_close()
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self) -> 'LocalChain':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    @property
+    def chain_id(self) -> int:
+        chain_id = self.request('eth_chainId', [])['result']
+        return int(chain_id, 16) if isinstance(chain_id, str) else chain_id
+
+    def request(self, method: str, params: List):
+        """Run a single JSON-RPC call against the chain and return its response object (without id)."""
+        with self.lock:
+            return self.provider.make_request(method, params)
+
+    def app_config(self, account: int = 0) -> Dict:
+        """Return the config values making the app issue from the given funded account through this chain."""
+        address, private_key = self.accounts[account]
+        return dict(
+            ETH_NODE_URL_ROPSTEN=self.url,
+            ETH_CHAIN_ID_ROPSTEN=self.chain_id,
+            ETH_PUBLIC_KEY=f'ecdsa-koblitz-pubkey:{address}',
+            ETH_PRIVATE_KEY=private_key,
+            ETH_KEY_CREATED_AT=KEY_CREATED_AT,
+        )
+
+    def _create_account(self, index: int) -> Tuple[str, str]:
+        """Add a deterministic account to the chain and fund it from the tester's own prefunded account."""
+        private_key = '0x' + keccak(text=f'verifiable-claims-engine-local-{index}').hex()
+        address = Account.from_key(private_key).address
+        self.tester.add_account(private_key)
+        self.tester.send_transaction({
+            'from': self.tester.get_accounts()[0],
+            'to': address,
+            'value': self.balance,
+            'gas': 21000,
+        })
+        return address, private_key
+
+    def _mine(self) -> None:
+        while not self._stop.wait(self.block_time):
+            with self.lock:
+                self.tester.mine_blocks(1)
+
+
+def create_local_app(chain: LocalChain, **config_data):
+    """Return an app issuing through the given chain."""
+    from flaskapp.app import create_app
+
+    return create_app(config_data=dict(chain.app_config(), **config_data))
+
+
+def _make_handler(chain: LocalChain):
+    class JsonRpcHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            if isinstance(payload, list):
+                response = [self._call(call) for call in payload]
+            else:
+                response = self._call(payload)
+            body = json.dumps(response, default=_to_json).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+        @staticmethod
+        def _call(call: Dict) -> Dict:
+            try:
+                response = chain.request(call['method'], call.get('params', []))
+            except Exception as e:
+                response = {'error': {'code': -32000, 'message': str(e)}}
+            return dict(response, jsonrpc='2.0', id=call.get('id'))
+
+    return JsonRpcHandler
+
+
+def _to_json(value):
+    """Serialize the bytes and attribute dicts that eth-tester results may hold."""
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex()
+    if hasattr(value, 'items'):
+        return dict(value.items())
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Serve a local Ethereum test chain over JSON-RPC.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8545)
+    parser.add_argument('--block-time', type=float, default=0.0, help='seconds per block, 0 mines every tx instantly')
+    parser.add_argument('--accounts', type=int, default=1, help='number of funded issuing accounts')
+    args = parser.parse_args(argv)
+
+    chain = LocalChain(args.block_time, args.accounts, host=args.host, port=args.port).start()
+    for name, value in chain.app_config().items():
+        print(f'export {name}={value}')
+    for address, private_key in chain.accounts[1:]:
+        print(f'# also funded: {address} {private_key}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        chain.stop()
+
+
+if __name__ == '__main__':
+    main()
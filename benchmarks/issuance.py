@@ -0,0 +1,186 @@
+"""
+Offline benchmark of `issue_certificate_batch`.
+
+Synthetic batches are issued end to end with the anchoring transaction handler replaced by a stub, so no node, key or
+gas is needed. Per-stage timings are read from the `vce_stage_seconds` histograms and peak memory is traced in a
+separate run, so that tracing doesn't distort the timings. Results can be saved and compared against a stored
+baseline, in which case any stage slower (or any run hungrier) than the baseline beyond the given tolerance is
+reported as a regression and the command exits with a non-zero status.
+
+    python -m benchmarks.issuance --sizes 10,100,1000 --image-size 10000 --save results.json
+    python -m benchmarks.issuance --sizes 10,100,1000 --baseline results.json --tolerance 0.2
+"""
+import argparse
+import hashlib
+import json
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+from unittest import mock
+
+from prometheus_client import REGISTRY
+
+from benchmarks.synthetic import make_issuer, make_template, make_roster, make_job
+from blockcerts.misc import issue_certificate_batch
+from blockcerts.models import Issuer, Template, Recipient, Job
+from flaskapp.config import get_config, parse_config, set_config
+
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000)
+DEFAULT_TOLERANCE = 0.2
+TX_HANDLER_PATH = 'blockcerts.issuer.cert_issuer.simple.SimplifiedEthereumTransactionHandler'
+BENCHMARK_CONFIG = {
+    'ETH_PUBLIC_KEY': 'ecdsa-koblitz-pubkey:0x0000000000000000000000000000000000000001',
+    'ETH_PRIVATE_KEY': '0x' + '11' * 32,
+    'ETH_KEY_CREATED_AT': '2019-01-01T00:00:00.000000+00:00',
+    'CERT_STORE_PATH': '',
+    'TX_CONFIRMATIONS': 0,
+    'CPU_WORKERS': 0,
+}
+
+
+class StubTransactionHandler:
+    """Stand-in for SimplifiedEthereumTransactionHandler that 'broadcasts' instantly and deterministically."""
+
+    latency = 0.0
+    reservation = None
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def issue_transaction(self, merkle_root: str, *args, **kwargs) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        return '0x' + hashlib.sha256(str(merkle_root).encode()).hexdigest()
+
+
+def stage_totals() -> Dict[str, float]:
+    """Return the accumulated seconds of every stage of the issuing pipeline."""
+    totals = {}
+    for metric in REGISTRY.collect():
+        if metric.name != 'vce_stage_seconds':
+            continue
+        for sample in metric.samples:
+            if sample.name.endswith('_sum') and sample.labels.get('pipeline') == 'issue':
+                totals[sample.labels['stage']] = sample.value
+    return totals
+
+
+def issue_batch(size: int, image_size: int, additional_fields: int) -> Dict[str, float]:
+    """Issue one synthetic batch and return the seconds spent in each stage."""
+    issuer = Issuer.from_dict(make_issuer(image_size))
+    template = Template.from_dict(make_template(image_size, additional_fields))
+    recipients = [Recipient.from_dict(recipient) for recipient in make_roster(size, additional_fields)]
+    job = Job.from_dict(make_job())
+    before = stage_totals()
+    with mock.patch(TX_HANDLER_PATH, StubTransactionHandler):
+        tx_id, signed_certs = issue_certificate_batch(issuer, template, recipients, job)
+    assert len(signed_certs) == size
+    return {stage: seconds - before.get(stage, 0.0) for stage, seconds in stage_totals().items()}
+
+
+def peak_memory(size: int, image_size: int, additional_fields: int) -> int:
+    """Issue one synthetic batch under tracemalloc and return the peak of traced memory, in bytes."""
+    tracemalloc.start()
+    try:
+        issue_batch(size, image_size, additional_fields)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes: List[int], image_size: int, additional_fields: int, repeat: int = 1, memory: bool = True) -> Dict:
+    previous_config = get_config()
+    set_config(parse_config(BENCHMARK_CONFIG))
+    results = {}
+    try:
+        for size in sizes:
+            runs = [issue_batch(size, image_size, additional_fields) for _ in range(repeat)]
+            stages = {stage: statistics.median(timings[stage] for timings in runs) for stage in runs[0]}
+            results[str(size)] = dict(
+                stages=stages,
+                throughput={stage: size / seconds for stage, seconds in stages.items() if seconds > 0},
+                peak_memory_bytes=peak_memory(size, image_size, additional_fields) if memory else None,
+            )
+    finally:
+        set_config(previous_config)
+    return dict(
+        meta=dict(
+            python=platform.python_version(),
+            platform=platform.platform(),
+            image_size=image_size,
+            additional_fields=additional_fields,
+            repeat=repeat,
+            max_rss_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        ),
+        results=results,
+    )
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Return a description of every stage or peak memory that regressed beyond `tolerance` against the baseline."""
+    regressions = []
+    for size, result in results['results'].items():
+        reference = baseline['results'].get(size)
+        if not reference:
+            continue
+        for stage, seconds in result['stages'].items():
+            expected = reference['stages'].get(stage)
+            if expected and seconds > expected * (1 + tolerance):
+                regressions.append(f'{size} recipients, {stage}: {seconds:.4f}s vs {expected:.4f}s baseline')
+        memory, expected = result.get('peak_memory_bytes'), reference.get('peak_memory_bytes')
+        if memory and expected and memory > expected * (1 + tolerance):
+            regressions.append(f'{size} recipients, peak memory: {memory} bytes vs {expected} bytes baseline')
+    return regressions
+
+
+def format_results(results: Dict) -> str:
+    lines = []
+    for size, result in results['results'].items():
+        lines.append(f'{size} recipients')
+        for stage, seconds in sorted(result['stages'].items(), key=lambda item: -item[1]):
+            throughput = result['throughput'].get(stage)
+            throughput = f'{throughput:12.1f} certs/s' if throughput else ''
+            lines.append(f'  {stage:45} {seconds:10.4f}s {throughput}')
+        if result['peak_memory_bytes']:
+            lines.append(f"  {'peak traced memory':45} {result['peak_memory_bytes'] / 2 ** 20:10.1f}MiB")
+    return '\n'.join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma separated roster sizes to benchmark')
+    parser.add_argument('--image-size', type=int, default=10000, help='size in bytes of every embedded image')
+    parser.add_argument('--additional-fields', type=int, default=0, help='additional fields per recipient')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per size, the median of each stage is kept')
+    parser.add_argument('--tx-latency', type=float, default=0.0, help='simulated broadcast latency in seconds')
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced memory run')
+    parser.add_argument('--save', help='write the results as JSON to this path')
+    parser.add_argument('--baseline', help='compare the results against the JSON results at this path')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='relative slowdown allowed before flagging a regression')
+    args = parser.parse_args(argv)
+
+    StubTransactionHandler.latency = args.tx_latency
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = run(sizes, args.image_size, args.additional_fields, args.repeat, memory=not args.no_memory)
+    print(format_results(results))
+
+    if args.save:
+        with open(args.save, mode='w') as results_file:
+            json.dump(results, results_file, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Load generator for a running instance of the API (`python wsgi.py` or uwsgi).
+
+Drives `/issue`, `/verify`, `/tx` and `/ping` with a weighted request mix, either closed-loop (`--concurrency`
+clients sending back to back) or open-loop (`--rate` requests per second arriving as a Poisson process, served by up
+to `--concurrency` clients). In open-loop mode latencies are measured from each request's scheduled arrival, so time
+spent queueing behind a saturated server is counted rather than hidden. Reports p50/p95/p99 latency, throughput and
+error rate per endpoint, and can save them as JSON to compare builds or `gevent`/`listen` settings:
+
+    python -m benchmarks.loadgen --url http://127.0.0.1:8080 --mix issue=1,ping=4 --concurrency 20 --duration 60
+    python -m benchmarks.loadgen --mix issue=1,verify=3,tx=3 --rate 10 --roster-size 100 --save results.json
+
+`/verify` and `/tx` need a signed certificate and a transaction id, which are taken from a warm-up `/issue` call (so
+the target has to be able to issue, e.g. against `benchmarks.ethchain`).
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import requests
+
+from benchmarks.synthetic import make_issuer, make_template, make_roster, make_job
+
+ENDPOINTS = ('issue', 'verify', 'tx', 'ping')
+PERCENTILES = (50, 95, 99)
+
+
+class LoadGenerator:
+
+    def __init__(self, url: str, mix: Dict[str, float], concurrency: int = 10, rate: float = 0.0,
+                 roster_size: int = 10, image_size: int = 10000, timeout: float = 300.0):
+        self.url = url.rstrip('/')
+        self.mix = mix
+        self.concurrency = concurrency
+        self.rate = rate
+        self.timeout = timeout
+        self.issue_payload = dict(
+            issuer=make_issuer(image_size),
+            template=make_template(image_size),
+            recipients=make_roster(roster_size),
+            job=make_job(),
+        )
+        self.signed_cert = None
+        self.tx_id = None
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def warm_up(self) -> None:
+        """Issue a batch to get the certificate and transaction id that `/verify` and `/tx` requests use."""
+        if not {'verify', 'tx'} & self.mix.keys():
+            return
+        response = requests.post(f'{self.url}/issue', json=self.issue_payload, timeout=self.timeout)
+        response.raise_for_status()
+        self.signed_cert = response.json()['signed_certificates'][0]
+        self.tx_id = response.json()['tx_id']
+
+    def run(self, duration: float = None, total: int = None) -> Dict:
+        """Send requests until `duration` seconds have passed or `total` requests have been sent."""
+        self.warm_up()
+        start = time.perf_counter()
+        deadline = start + duration if duration else float('inf')
+        if self.rate:
+            self._run_open_loop(deadline, total)
+        else:
+            self._run_closed_loop(deadline, total)
+        return summarize(self.samples, time.perf_counter() - start)
+
+    def _run_closed_loop(self, deadline: float, total: int) -> None:
+        remaining = iter(range(total)) if total else None
+
+        def client():
+            while time.perf_counter() < deadline and (remaining is None or next(remaining, None) is not None):
+                self._send(self._pick(), time.perf_counter())
+
+        threads = [threading.Thread(target=client) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _run_open_loop(self, deadline: float, total: int) -> None:
+        sent = 0
+        arrival = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while arrival < deadline and (not total or sent < total):
+                time.sleep(max(0.0, arrival - time.perf_counter()))
+                executor.submit(self._send, self._pick(), arrival)
+                sent += 1
+                arrival += random.expovariate(self.rate)
+
+    def _pick(self) -> str:
+        return random.choices(list(self.mix.keys()), weights=list(self.mix.values()))[0]
+
+    def _send(self, endpoint: str, scheduled: float) -> None:
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        try:
+            if endpoint == 'issue':
+                response = session.post(f'{self.url}/issue', json=self.issue_payload, timeout=self.timeout)
+            elif endpoint == 'verify':
+                response = session.post(f'{self.url}/verify', json=self.signed_cert, timeout=self.timeout)
+            elif endpoint == 'tx':
+                response = session.get(f'{self.url}/tx/ropsten/{self.tx_id}', timeout=self.timeout)
+            else:
+                response = session.get(f'{self.url}/ping', timeout=self.timeout)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        latency = time.perf_counter() - scheduled
+        with self.lock:
+            self.samples[endpoint].append((latency, ok))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of the given sorted values."""
+    if not values:
+        return None
+    return values[max(1, math.ceil(pct / 100 * len(values))) - 1]
+
+
+def summarize(samples: Dict[str, List[Tuple[float, bool]]], elapsed: float) -> Dict:
+    """Return latency percentiles, throughput and error rate per endpoint and overall."""
+    def stats(endpoint_samples):
+        latencies = sorted(latency for latency, _ in endpoint_samples)
+        errors = sum(1 for _, ok in endpoint_samples if not ok)
+        result = dict(
+            requests=len(endpoint_samples),
+            errors=errors,
+            error_rate=errors / len(endpoint_samples) if endpoint_samples else 0.0,
+            throughput=len(endpoint_samples) / elapsed if elapsed else 0.0,
+            mean=sum(latencies) / len(latencies) if latencies else None,
+        )
+        result.update({f'p{pct}': percentile(latencies, pct) for pct in PERCENTILES})
+        return result
+
+    endpoints = {endpoint: stats(endpoint_samples) for endpoint, endpoint_samples in samples.items()}
+    endpoints['all'] = stats([sample for endpoint_samples in samples.values() for sample in endpoint_samples])
+    return dict(elapsed=elapsed, endpoints=endpoints)
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse a request mix like `issue=1,ping=4` into endpoint weights."""
+    weights = {}
+    for item in mix.split(','):
+        endpoint, _, weight = item.partition('=')
+        if endpoint not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{endpoint}', use one of {', '.join(ENDPOINTS)}.")
+        weights[endpoint] = float(weight or 1)
+    return weights
+
+
+def format_summary(summary: Dict) -> str:
+    lines = [f"{'endpoint':10} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}"]
+    for endpoint, stats in summary['endpoints'].items():
+        latencies = ' '.join(
+            f'{stats[f"p{pct}"] * 1000:7.1f}ms' if stats[f'p{pct}'] is not None else f"{'-':>9}"
+            for pct in PERCENTILES
+        )
+        lines.append(
+            f"{endpoint:10} {stats['requests']:9d} {stats['errors']:7d} {stats['throughput']:8.2f} {latencies}"
+        )
+    return '\n'.join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:80', help='base url of the running app')
+    parser.add_argument('--mix', type=parse_mix, default='ping=1', help='weighted endpoints, e.g. issue=1,ping=4')
+    parser.add_argument('--concurrency', type=int, default=10, help='number of concurrent clients')
+    parser.add_argument('--rate', type=float, default=0.0, help='open-loop arrival rate in requests per second')
+    parser.add_argument('--duration', type=float, help='seconds to run for')
+    parser.add_argument('--requests', type=int, help='number of requests to send')
+    parser.add_argument('--roster-size', type=int, default=10, help='recipients per /issue request')
+    parser.add_argument('--image-size', type=int, default=10000, help='size in bytes of every embedded image')
+    parser.add_argument('--timeout', type=float, default=300.0, help='per-request timeout in seconds')
+    parser.add_argument('--save', help='write the results as JSON to this path')
+    args = parser.parse_args(argv)
+    if not args.duration and not args.requests:
+        parser.error('either --duration or --requests is required')
+
+    generator = LoadGenerator(args.url, args.mix, args.concurrency, args.rate, args.roster_size, args.image_size,
+                              args.timeout)
+    summary = generator.run(args.duration, args.requests)
+    print(format_summary(summary))
+    if args.save:
+        options = {key: value for key, value in vars(args).items() if key != 'save'}
+        with open(args.save, mode='w') as results_file:
+            json.dump(dict(summary, options=options), results_file, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
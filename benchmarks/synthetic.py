@@ -0,0 +1,93 @@
+"""Synthetic issuers, templates, rosters and jobs shaped like real `/issue` payloads."""
+import base64
+import random
+from collections import OrderedDict
+from typing import List
+
+from attrdict import AttrDict
+
+PNG_DATA_URI_PREFIX = 'data:image/png;base64,'
+DISPLAY_HTML = (
+    '<div style="font-family: Lato; text-align: left;"><img src="%ISSUER_LOGO%" style="max-width: 110px;" />'
+    '<h2>%CERT_TITLE%</h2><p>%CERT_DESCRIPTION%</p><p>Awarded to %RECIPIENT_NAME% on %ISSUING_DATE%, valid until '
+    '%EXPIRATION_DATE%.</p><img src="%ISSUER_SIGNATURE%" style="max-width: 110px;" />{fields}</div>'
+)
+FIRST_NAMES = ['Ada', 'Alan', 'Grace', 'Edsger', 'Barbara', 'Donald', 'Frances', 'Ken', 'Radia', 'Tim']
+LAST_NAMES = ['Lovelace', 'Turing', 'Hopper', 'Dijkstra', 'Liskov', 'Knuth', 'Allen', 'Thompson', 'Perlman', 'Lee']
+
+
+def make_image(size: int, seed: int = 0) -> str:
+    """Return a base64 data URI holding `size` pseudo-random bytes, as large as an embedded image of that size."""
+    data = random.Random(seed).getrandbits(size * 8).to_bytes(size, 'big') if size else b''
+    return PNG_DATA_URI_PREFIX + base64.b64encode(data).decode('ascii')
+
+
+def make_issuer(image_size: int = 10000) -> AttrDict:
+    return AttrDict({
+        "name": "Benchmark Issuer",
+        "main_url": "https://issuer.example.com",
+        "id": "https://issuer.example.com/issuer.json",
+        "email": "issuer@example.com",
+        "logo_file": make_image(image_size, seed=1),
+        "revocation_list": "https://issuer.example.com/revocation_list.json",
+        "intro_url": "https://issuer.example.com/intro",
+        "signature_lines": [
+            {
+                "job_title": "Benchmark Signer",
+                "signature_image": make_image(image_size, seed=2),
+                "name": "Signer Name",
+            }
+        ],
+        "signature_file": make_image(image_size, seed=3),
+    })
+
+
+def make_template(image_size: int = 10000, additional_fields: int = 0) -> AttrDict:
+    """Return a template with a display html using every placeholder plus `additional_fields` per-recipient ones."""
+    fields = ''.join(f'<p>%FIELD_{i}%</p>' for i in range(additional_fields))
+    return AttrDict({
+        "id": "BENC-HMAR-K000",
+        "title": "Benchmark Certificate",
+        "description": "A certificate generated to benchmark the issuing pipeline.",
+        "criteria_narrative": "Recipients are synthetic.",
+        "image": make_image(image_size, seed=4),
+        "additional_global_fields": [
+            {"path": "$.displayHtml", "value": ""},
+            {
+                "path": "$.@context",
+                "value": [
+                    "https://w3id.org/openbadges/v2",
+                    "https://w3id.org/blockcerts/v2",
+                    {"displayHtml": {"@id": "schema:description"}}
+                ]
+            }
+        ],
+        "additional_per_recipient_fields": [{"path": "$.displayHtml", "value": "*|FOO|*", "csv_column": "displayHtml"}],
+        "display_html": DISPLAY_HTML.format(fields=fields),
+    })
+
+
+def make_roster(size: int, additional_fields: int = 0, seed: int = 0) -> List[AttrDict]:
+    """Return `size` recipients with unique emails and `additional_fields` extra fields each."""
+    rng = random.Random(seed)
+    roster = []
+    for i in range(size):
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        fields = OrderedDict(displayHtml="")
+        for field in range(additional_fields):
+            fields[f'field_{field}'] = f'value {field} of recipient {i}'
+        roster.append(AttrDict({
+            "name": name,
+            "identity": f'recipient-{i}@example.com',
+            "pubkey": "-",
+            "additional_fields": fields,
+        }))
+    return roster
+
+
+def make_job() -> AttrDict:
+    return AttrDict(dict(
+        blockchain="ethereum_ropsten",
+        gas_price=20000000000,
+        gas_limit=25000,
+    ))
@@ -0,0 +1,100 @@
+"""
+Pool of issuing accounts.
+
+Every account can only anchor one transaction per nonce, so all batches signed by a single account queue on its nonce
+sequence. Besides `ETH_PUBLIC_KEY`/`ETH_PRIVATE_KEY`, more accounts can be configured as comma-separated
+`ETH_PUBLIC_KEYS`/`ETH_PRIVATE_KEYS` (with their `ETH_KEYS_CREATED_AT`, or a single date for all of them), and each
+batch is assigned to the least loaded funded one: the account with the fewest batches being issued and transactions
+awaiting confirmation, preferring larger balances. Each account keeps its own nonces and balance in the ledger.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple
+
+from blockcerts.issuer.cert_issuer.ledger import BalanceLedger, get_balance_ledger
+from flaskapp.config import get_config
+from flaskapp.errors import ValidationError
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class IssuingAccount(NamedTuple):
+    public_key: str
+    private_key: str
+    created_at: str
+
+    @property
+    def address(self) -> str:
+        return self.public_key.split(':')[-1]
+
+
+class AccountPool:
+    """Assign batches to the least loaded funded account."""
+
+    def __init__(self, accounts: List[IssuingAccount], ledger: BalanceLedger):
+        self.accounts = accounts
+        self.ledger = ledger
+        self.in_flight = {account.public_key: 0 for account in accounts}  # type: Dict[str, int]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, chain_id: int):
+        """Pick an account to issue a batch on the given chain with, counting the batch in its load until done."""
+        if not self.accounts:
+            raise ValidationError(
+                key='eth_public_key', details='No issuing account is configured, the job has to provide its own keys.'
+            )
+        with self._lock:
+            account = min(self.accounts, key=lambda candidate: self._load(candidate, chain_id))
+            self.in_flight[account.public_key] += 1
+        try:
+            yield account
+        finally:
+            with self._lock:
+                self.in_flight[account.public_key] -= 1
+
+    def _load(self, account: IssuingAccount, chain_id: int) -> tuple:
+        balance = self.ledger.account(chain_id, account.address)
+        available = balance.available
+        funded = available is None or available > 0
+        return not funded, self.in_flight[account.public_key] + len(balance.reservations), -(available or 0)
+
+
+def parse_accounts(config: Dict) -> List[IssuingAccount]:
+    """Return the issuing accounts of the given config, the `ETH_PUBLIC_KEY` one first."""
+    public_keys = _split(config.get('ETH_PUBLIC_KEYS'))
+    private_keys = _split(config.get('ETH_PRIVATE_KEYS'))
+    created_at = _split(config.get('ETH_KEYS_CREATED_AT')) or [config.get('ETH_KEY_CREATED_AT')]
+    if len(public_keys) != len(private_keys):
+        raise ValueError('ETH_PUBLIC_KEYS and ETH_PRIVATE_KEYS must list the same number of keys.')
+    if len(created_at) == 1:
+        created_at = created_at * len(public_keys)
+    if len(created_at) != len(public_keys):
+        raise ValueError('ETH_KEYS_CREATED_AT must list a single date or one date per key.')
+
+    accounts = [IssuingAccount(*account) for account in zip(public_keys, private_keys, created_at)]
+    if config.get('ETH_PUBLIC_KEY') and config.get('ETH_PRIVATE_KEY'):
+        primary = IssuingAccount(config['ETH_PUBLIC_KEY'], config['ETH_PRIVATE_KEY'], config.get('ETH_KEY_CREATED_AT'))
+        accounts = [primary] + [account for account in accounts if account.public_key != primary.public_key]
+    return accounts
+
+
+def get_account_pool() -> AccountPool:
+    """Return the account pool of this process for the configured accounts."""
+    config = get_config()
+    accounts = parse_accounts(config)
+    ledger = get_balance_ledger(
+        config.get('BALANCE_REFRESH_INTERVAL'),
+        config.get('LOW_BALANCE_THRESHOLD'),
+        config.get('LOW_BALANCE_WEBHOOK_URL'),
+    )
+    key = (tuple(accounts), id(ledger))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = AccountPool(accounts, ledger)
+        return _pools[key]
+
+
+def _split(values: str) -> List[str]:
+    return [value.strip() for value in (values or '').split(',') if value.strip()]
@@ -0,0 +1,80 @@
+"""
+Compact batch representation of signed certificates.
+
+Certificates issued in the same batch share most of their content (badge, issuer, `@context`, verification and most
+of the merkle proof). The compact representation sends everything that is identical across the batch once, in
+`shared`, followed by one delta per certificate with whatever is specific to it. `expand_batch` is the reference
+decoder that rebuilds the full Blockcerts JSON of every certificate (key order aside, which the sorted JSON responses
+don't carry anyway).
+"""
+import copy
+from typing import Dict, List, Tuple
+
+COMPACT_BATCH_FORMAT = 'compact-batch/1'
+
+
+def compact_batch(certificates: List[Dict]) -> Dict:
+    """Split the given certificates into the sections they all share and their per-certificate deltas."""
+    shared, deltas = _split(certificates) if certificates else ({}, [])
+    return dict(
+        format=COMPACT_BATCH_FORMAT,
+        shared=shared,
+        certificates=deltas,
+    )
+
+
+def expand_batch(compact: Dict) -> List[Dict]:
+    """Rebuild the full certificates from a compact batch."""
+    if compact.get('format') != COMPACT_BATCH_FORMAT:
+        raise ValueError(f"Unsupported compact batch format '{compact.get('format')}'.")
+    return [_merge(copy.deepcopy(compact['shared']), delta) for delta in compact['certificates']]
+
+
+def _split(objects: List[Dict]) -> Tuple[Dict, List[Dict]]:
+    """
+    Return the part common to all given dicts and what's left of each one of them.
+
+    Keys holding the same value in every dict are shared as a whole. Keys holding a dict in every object but with
+    different contents are split recursively, so that e.g. the merkle root and anchors of the signatures are shared
+    while target hashes and proofs go to the deltas. The shared part of such a key is kept even when empty, so that
+    merging always recreates the key.
+    """
+    shared = {}
+    deltas = [{} for _ in objects]
+    first = objects[0]
+    for key, value in first.items():
+        if not all(key in obj for obj in objects):
+            continue
+        values = [obj[key] for obj in objects]
+        if all(_identical(value, other) for other in values[1:]):
+            shared[key] = value
+        elif all(isinstance(other, dict) for other in values):
+            shared[key], nested_deltas = _split(values)
+            for delta, nested_delta in zip(deltas, nested_deltas):
+                if nested_delta:
+                    delta[key] = nested_delta
+
+    for obj, delta in zip(objects, deltas):
+        for key, value in obj.items():
+            if key not in shared:
+                delta[key] = value
+    return shared, deltas
+
+
+def _identical(a, b) -> bool:
+    """Compare two JSON values without letting `1`, `1.0` and `True` pass as the same value."""
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_identical(value, b[key]) for key, value in a.items())
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(_identical(x, y) for x, y in zip(a, b))
+    return type(a) is type(b) and a == b
+
+
+def _merge(base: Dict, delta: Dict) -> Dict:
+    """Deep-merge the given delta into base, in place."""
+    for key, value in delta.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = copy.deepcopy(value)
+    return base
@@ -1,4 +1,6 @@
-from voluptuous import Schema, REMOVE_EXTRA, Optional, All, Length
+from voluptuous import Schema, REMOVE_EXTRA, Optional, All, Length, In
+
+from blockcerts.issuer.cert_issuer.fees import URGENCY_LEVELS
 
 RECIPIENT_NAME_KEY = 'name'
 RECIPIENT_EMAIL_KEY = 'identity'
@@ -59,10 +61,24 @@ JOB_SCHEMA = Schema(
         Optional('eth_key_created_at'): str,
         Optional("gas_price"): int,
         Optional("gas_limit"): int,
+        Optional("urgency"): In(URGENCY_LEVELS),
+        Optional("job_id"): str,
     },
     required=True,
     extra=REMOVE_EXTRA,
 )
+ISSUING_JOB_SCHEMA = Schema(
+    {
+        'issuer': ISSUER_SCHEMA,
+        'template': TEMPLATE_SCHEMA,
+        'recipients': RECIPIENT_SCHEMA,
+        'job': JOB_SCHEMA,
+    },
+    required=True,
+    extra=REMOVE_EXTRA,
+)
+
+COMPACT_RESPONSE_FORMAT = 'compact'
 
 DEFAULT_NO_SAFE_MODE = True
 DEFAULT_ADDITIONAL_GLOBAL_FIELDS = '{"fields": [{"path": "$.displayHtml","value": ""}, {"path": "$.@context","value":' \
@@ -91,3 +107,5 @@ DEFAULT_ENCODING = 'utf-8'
 TEMP_PATH = "/app/temp"
 ETH_PRIVATE_KEY_PATH = f"{TEMP_PATH}/keyring"
 ETH_PRIVATE_KEY_FILE_NAME = "eth_private_key"
+CERT_STORE_PATH = f"{TEMP_PATH}/cert_store.sqlite3"
+PROFILE_DIR = f"{TEMP_PATH}/profiles"
@@ -0,0 +1,88 @@
+"""
+Issue batches from an asyncio event loop, without the API server.
+
+Each file holds the JSON body of an `/issue` request. All the batches are issued concurrently through
+`issue_certificate_batch_async`, configured from the environment like the API, and their anchors are then followed
+until confirmed (unless `--no-wait`). Each result is written as `<job_id>.json` to the output directory, in the same
+shape as the `/issue` response:
+
+    python -m blockcerts.issue_async batch-1.json batch-2.json --output-dir issued/
+    python -m blockcerts.issue_async batch-*.json --no-wait
+
+Exits with 1 if any batch couldn't be issued.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import uuid
+from typing import Dict, List
+
+from blockcerts.const import ISSUING_JOB_SCHEMA
+from blockcerts.issuer.cert_issuer.async_simple import close_session
+from blockcerts.misc import issue_certificate_batch_async
+from blockcerts.models import Issuer, Template, Recipient, Job
+from flaskapp.config import parse_config, set_config
+from flaskapp.metrics import register_metrics
+
+log = logging.getLogger(__name__)
+
+
+async def issue_batch(path: str, output_dir: str = None) -> Dict:
+    """Issue the batch described by the given `/issue` body and return the result, written out if asked."""
+    with open(path) as f:
+        payload = ISSUING_JOB_SCHEMA(json.load(f))
+    job_id = payload['job'].pop('job_id', None) or str(uuid.uuid4())
+    tx_id, signed_certs = await issue_certificate_batch_async(
+        Issuer.from_dict(payload['issuer']),
+        Template.from_dict(payload['template']),
+        [Recipient.from_dict(recipient) for recipient in payload['recipients']],
+        Job.from_dict(payload['job']),
+        job_id=job_id,
+    )
+    result = dict(job_id=job_id, tx_id=tx_id, signed_certificates=list(signed_certs.values()))
+    if output_dir:
+        with open(os.path.join(output_dir, f'{job_id}.json'), 'w') as f:
+            json.dump(result, f)
+    return result
+
+
+async def issue_batches(paths: List[str], output_dir: str = None, wait: bool = True) -> int:
+    """Issue the given batches concurrently and return how many failed."""
+    try:
+        results = await asyncio.gather(*(issue_batch(path, output_dir) for path in paths), return_exceptions=True)
+        failures = 0
+        for path, result in zip(paths, results):
+            if isinstance(result, Exception):
+                failures += 1
+                log.error("Failed to issue %s: %s", path, result)
+            else:
+                log.info("Issued %s as job '%s', anchored by %s.", path, result['job_id'], result['tx_id'])
+        if wait:
+            # The anchors are followed by the tasks track_anchor_async left running.
+            await asyncio.gather(*(asyncio.all_tasks() - {asyncio.current_task()}))
+        return failures
+    finally:
+        await close_session()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', help='JSON bodies of /issue requests')
+    parser.add_argument('--output-dir', help='directory to write the issued batches to, as <job_id>.json')
+    parser.add_argument('--no-wait', action='store_true', help="don't wait for the anchors to be confirmed")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    set_config(parse_config(os.environ))
+    register_metrics()
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    failures = asyncio.run(issue_batches(args.files, args.output_dir, wait=not args.no_wait))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""
+Asyncio flavour of the issuance core.
+
+`AsyncCertificateBatchIssuer` and `AsyncEthereumTransactionHandler` add coroutine flavours (`*_async`) of the methods
+of their synchronous parents in `simple`, which they keep as they are so that either can stand in for its parent. The
+coroutines send their JSON-RPC calls through an `AsyncJsonRpcClient` (aiohttp) instead of web3's blocking HTTP
+provider, so that a single event loop can drive many anchors in flight without relying on gevent:
+- the preflight batch and the fee history are read concurrently;
+- raw transactions are broadcast to the `broadcast_count` fastest nodes concurrently, and reads are hedged and failed
+  over the same way as in the NodePool;
+- the receipts of an anchor and of its replacements are polled concurrently until it's confirmed (`confirm_async`).
+The client scores the nodes of the process' NodePool, so what is learned about them is shared with the synchronous
+path. Building the merkle tree and attaching the proofs is CPU-bound and runs in an executor.
+"""
+import asyncio
+import itertools
+import logging
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+from attrdict import AttrDict
+
+from blockcerts.issuer.cert_issuer import instrumentation
+from blockcerts.issuer.cert_issuer.errors import InsufficientFundsError
+from blockcerts.issuer.cert_issuer.fees import FeeEstimate, REPLACEMENT_FEE_BUMP, REWARD_PERCENTILES, \
+    anchoring_gas_limit, cache_fee_history, eip1559_fees, get_cached_fee_history, legacy_fees, parse_fee_history, \
+    to_int
+from blockcerts.issuer.cert_issuer.providers import Node, NodePool, BROADCAST_METHODS, HEDGED_METHODS
+from blockcerts.issuer.cert_issuer.simple import SimplifiedCertificateBatchIssuer, \
+    SimplifiedEthereumTransactionHandler, Preflight
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_POLL_INTERVAL = 15.0
+
+_sessions = weakref.WeakKeyDictionary()
+_request_ids = itertools.count()
+
+
+class AsyncJsonRpcClient:
+    """Send JSON-RPC calls to the nodes of a NodePool over aiohttp, scoring them as the pool does."""
+
+    def __init__(self, pool: NodePool, session: aiohttp.ClientSession = None, timeout: float = DEFAULT_TIMEOUT):
+        self.pool = pool
+        self.session = session
+        self.timeout = timeout
+
+    async def call(self, method: str, params) -> Any:
+        """Run a JSON-RPC call and return its raw result, raising a ValueError on errors as web3 does."""
+        return _get_result(await self.request(method, params))
+
+    async def call_batch(self, calls: List[Tuple[str, Any]]) -> List:
+        """Run the given (method, params) calls in a single round trip and return their raw results in order."""
+        return [_get_result(response) for response in await self.request_batch(calls)]
+
+    async def request(self, method: str, params) -> Dict:
+        nodes = self.pool.ranked()
+        with instrumentation.time_rpc(method):
+            if method in BROADCAST_METHODS and self.pool.broadcast_count > 1 and len(nodes) > 1:
+                return await self._broadcast(nodes[:self.pool.broadcast_count], method, params)
+            if method in HEDGED_METHODS and self.pool.hedge_delay and len(nodes) > 1 and nodes[1].available:
+                return await self._hedge(nodes, method, params)
+            return await self._failover(nodes, method, params)
+
+    async def request_batch(self, calls: List[Tuple[str, Any]]) -> List[Dict]:
+        """Send the given (method, params) calls as one JSON-RPC batch to the fastest node that answers."""
+        nodes = self.pool.ranked()
+        for i, node in enumerate(nodes):
+            try:
+                return await self._send_batch(node, calls)
+            except Exception:
+                if i == len(nodes) - 1:
+                    raise
+
+    async def _failover(self, nodes: List[Node], method: str, params) -> Dict:
+        """Try the nodes in turn until one of them answers."""
+        for i, node in enumerate(nodes):
+            try:
+                return await self._send(node, method, params)
+            except Exception:
+                if i == len(nodes) - 1:
+                    raise
+
+    async def _hedge(self, nodes: List[Node], method: str, params) -> Dict:
+        """Send the call to the fastest node, and to the second fastest too if the first is late."""
+        first = asyncio.ensure_future(self._send(nodes[0], method, params))
+        done, _ = await asyncio.wait([first], timeout=self.pool.hedge_delay)
+        if done:
+            try:
+                return first.result()
+            except Exception:
+                return await self._failover(nodes[1:], method, params)
+
+        pending = {first, asyncio.ensure_future(self._send(nodes[1], method, params))}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    response = task.result()
+                except Exception as e:
+                    exception = e
+                    continue
+                for late in pending:
+                    late.cancel()
+                return response
+        if len(nodes) > 2:
+            return await self._failover(nodes[2:], method, params)
+        raise exception
+
+    async def _broadcast(self, nodes: List[Node], method: str, params) -> Dict:
+        """
+        Send the call to all the given nodes and return the first successful answer.
+
+        The other sends are left to complete on their own. If every node answers with an error (e.g. a nonce too low)
+        the first error is returned, like a single node would. If none of them answers at all, the last exception is
+        raised.
+        """
+        pending = {asyncio.ensure_future(self._send(node, method, params)) for node in nodes}
+        errors, exception = [], None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    response = task.result()
+                except Exception as e:
+                    exception = e
+                    continue
+                if 'error' not in response:
+                    return response
+                errors.append(response)
+        if errors:
+            return errors[0]
+        raise exception
+
+    async def _send(self, node: Node, method: str, params) -> Dict:
+        return await self._post(node, _get_payload(method, params))
+
+    async def _send_batch(self, node: Node, calls: List[Tuple[str, Any]]) -> List[Dict]:
+        payload = [_get_payload(method, params) for method, params in calls]
+        responses = await self._post(node, payload)
+        if not isinstance(responses, list):
+            # Nodes without batch support answer with a single error, fall back to concurrent single calls.
+            return list(await asyncio.gather(*(self._send(node, method, params) for method, params in calls)))
+        by_id = {response.get('id'): response for response in responses}
+        return [by_id[call['id']] for call in payload]
+
+    async def _post(self, node: Node, payload):
+        """POST the given payload to the node, scoring it. JSON-RPC errors are answers, not node failures."""
+        session = self.session or get_session()
+        start = time.perf_counter()
+        try:
+            async with session.post(node.url, json=payload,
+                                    timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                response.raise_for_status()
+                answer = await response.json(content_type=None)
+        except asyncio.CancelledError:
+            raise  # a hedged call that lost the race, not a failure of the node
+        except Exception:
+            node.record_failure(time.perf_counter() - start)
+            raise
+        node.record_success(time.perf_counter() - start)
+        return answer
+
+
+class AsyncEthereumTransactionHandler(SimplifiedEthereumTransactionHandler):
+    """
+    SimplifiedEthereumTransactionHandler with coroutine flavours of its methods, sending their calls through an
+    AsyncJsonRpcClient. The synchronous methods still go through web3, e.g. for the ConfirmationTracker.
+
+    Nonces, balance reservations and signers come from the same per-process NonceManager, BalanceLedger and
+    SignerRegistry as the synchronous handler's, so both can issue from the same accounts side by side.
+    """
+
+    def __init__(self, *args, client: AsyncJsonRpcClient = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.client = client or AsyncJsonRpcClient(self.web3.provider.pool)
+
+    async def issue_transaction_async(self, merkle_root: bytes) -> str:
+        """Coroutine flavour of `issue_transaction`."""
+        with instrumentation.time_stage('issue', 'preflight'):
+            preflight, history = await asyncio.gather(
+                self._preflight_async(with_balance=self.account.stale), self._get_fee_history_async()
+            )
+        if preflight.balance is not None:
+            self.account.refresh(preflight.balance)
+        fees = await self._estimate_fees_async(merkle_root, history)
+        reservation = self.account.reserve(fees.max_cost)
+        nonce = self.nonces.allocate(preflight.nonce)
+        try:
+            for i in range(self.max_retry):
+                if i:
+                    fees = fees.bumped(REPLACEMENT_FEE_BUMP)
+                    reservation.resize(fees.max_cost)
+                tx_info = self._get_tx_info(merkle_root, nonce, fees)
+                try:
+                    self.tx_id = await self.send_transaction_async(tx_info)
+                    self.tx_info, self.fees, self.reservation = tx_info, fees, reservation
+                    return self.tx_id
+                except Exception:
+                    if i >= self.max_retry - 1:
+                        raise
+        except Exception:
+            reservation.release()
+            self.nonces.release(nonce)
+            raise
+
+    async def send_transaction_async(self, tx_info: Dict) -> str:
+        """Coroutine flavour of `send_transaction`."""
+        signed_tx = self.signer.sign_transaction(tx_info)
+        return await self.client.call('eth_sendRawTransaction', [self.web3.toHex(signed_tx.rawTransaction)])
+
+    async def confirm_async(self, confirmations: int, deadline: float, max_replacements: int,
+                            interval: float = DEFAULT_POLL_INTERVAL,
+                            give_up_after: float = None) -> Optional[Tuple[str, Dict]]:
+        """
+        Wait until the last transaction sent, or one of its replacements, is buried under the given number of
+        confirmations, and return the id and raw receipt of the one that got mined.
+
+        As in the ConfirmationTracker, a replacement paying bumped fees is sent at the same nonce whenever no attempt
+        is mined before the deadline, and the reservation is settled with the account's balance once confirmed. If
+        none is mined within `give_up_after` seconds, the reservation is given back, the account's nonces follow the
+        node again and None is returned.
+        """
+        tx_ids = [self.tx_id]
+        first_sent_at = sent_at = time.monotonic()
+        while True:
+            block_number, mined_tx_id, receipt = await self._get_mined_async(tx_ids)
+            if receipt is not None:
+                if block_number - to_int(receipt['blockNumber']) + 1 >= confirmations:
+                    if self.reservation:
+                        balance = await self.client.call('eth_getBalance', [self.account_from, 'latest'])
+                        self.reservation.settle(to_int(balance))
+                    return mined_tx_id, receipt
+            elif give_up_after is not None and time.monotonic() - first_sent_at > give_up_after:
+                if self.reservation:
+                    self.reservation.settle()
+                self.nonces.resync()
+                log.warning('Gave up on anchoring transaction %s, still not mined after %s seconds.', self.tx_id,
+                            give_up_after)
+                return None
+            elif time.monotonic() - sent_at > deadline and len(tx_ids) <= max_replacements:
+                if await self._replace_async():
+                    tx_ids.append(self.tx_id)
+                sent_at = time.monotonic()
+            await asyncio.sleep(interval)
+
+    async def _preflight_async(self, with_balance: bool = True) -> Preflight:
+        with instrumentation.time_rpc('preflight_batch'):
+            results = await self.client.call_batch(self._get_preflight_calls(with_balance))
+        return self._parse_preflight(results)
+
+    async def _get_fee_history_async(self) -> Optional[Dict]:
+        """Return the fee history of recent blocks, cached along with the FeeOracle's, or None without EIP-1559."""
+        key = self.web3.provider.endpoint_uri
+        cached = get_cached_fee_history(key, self.fee_oracle.ttl)
+        if cached:
+            return cached[0]
+        try:
+            history = parse_fee_history(await self.client.call(
+                'eth_feeHistory', [hex(self.fee_oracle.history_blocks), 'latest', REWARD_PERCENTILES]
+            ))
+        except (ValueError, KeyError):
+            history = None
+        cache_fee_history(key, history)
+        return history
+
+    async def _estimate_fees_async(self, merkle_root: bytes, history: Optional[Dict]) -> FeeEstimate:
+        gas_limit = anchoring_gas_limit(merkle_root, self.max_gas_limit)
+        if not history:
+            gas_price = to_int(await self.client.call('eth_gasPrice', []))
+            return legacy_fees(gas_limit, gas_price, self.urgency, self.max_gas_price)
+        return eip1559_fees(gas_limit, history, self.urgency, self.max_gas_price)
+
+    async def _get_mined_async(self, tx_ids: List[str]) -> Tuple[int, Optional[str], Optional[Dict]]:
+        """Return the latest block number, and the id and receipt of the attempt that got mined if any."""
+        block_number, *receipts = await asyncio.gather(
+            self.client.call('eth_blockNumber', []),
+            *(self.client.call('eth_getTransactionReceipt', [tx_id]) for tx_id in tx_ids)
+        )
+        for tx_id, receipt in zip(reversed(tx_ids), reversed(receipts)):
+            if receipt and receipt.get('blockNumber') is not None:
+                return to_int(block_number), tx_id, receipt
+        return to_int(block_number), None, None
+
+    async def _replace_async(self) -> bool:
+        """Broadcast the last transaction again, at the same nonce, with bumped fees. Return whether it was sent."""
+        fees = self.fees.bumped(REPLACEMENT_FEE_BUMP)
+        if self.max_gas_price and (fees.max_fee_per_gas or fees.gas_price) > self.max_gas_price:
+            log.warning('Anchoring transaction %s is stuck but its fees already reach the cap.', self.tx_id)
+            return False
+        if self.reservation:
+            try:
+                self.reservation.resize(fees.max_cost)
+            except InsufficientFundsError as e:
+                log.warning("Anchoring transaction %s is stuck but can't be replaced: %s", self.tx_id, e)
+                return False
+        tx_info = dict(self.tx_info, **fees.tx_fields())
+        tx_id = await self.send_transaction_async(tx_info)
+        log.info('Replaced stuck anchoring transaction %s with %s.', self.tx_id, tx_id)
+        self.tx_id, self.tx_info, self.fees = tx_id, tx_info, fees
+        return True
+
+
+class AsyncCertificateBatchIssuer(SimplifiedCertificateBatchIssuer):
+    """
+    SimplifiedCertificateBatchIssuer issuing from an event loop with `issue_async`.
+
+    Build it with `create`, which computes the merkle tree in an executor so that the event loop isn't blocked.
+    """
+
+    @classmethod
+    async def create(cls, config: AttrDict, unsigned_certs: dict, leaf_hashes: List[str] = None,
+                     executor=None) -> 'AsyncCertificateBatchIssuer':
+        return await asyncio.get_event_loop().run_in_executor(executor, cls, config, unsigned_certs, leaf_hashes)
+
+    async def issue_async(self, on_signed: Callable[[str, Dict], None] = None) -> Tuple[str, Dict]:
+        """Coroutine flavour of `issue`."""
+        tx_id = await self._broadcast_transaction_async()
+        with instrumentation.time_stage('issue', 'proof_attachment'):
+            signed_certs = await asyncio.get_event_loop().run_in_executor(
+                None, self._add_proof_to_certs, tx_id, on_signed
+            )
+        return tx_id, signed_certs
+
+    async def _broadcast_transaction_async(self) -> str:
+        self.transaction_handler = AsyncEthereumTransactionHandler(**self._get_handler_kwargs())
+        with instrumentation.time_stage('issue', 'broadcast'):
+            self.tx_id = await self.transaction_handler.issue_transaction_async(self.merkle_root)
+        return self.tx_id
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Return the session of the running event loop, so that connections to the nodes are kept alive across calls."""
+    loop = asyncio.get_event_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = _sessions[loop] = aiohttp.ClientSession()
+    return session
+
+
+async def close_session() -> None:
+    """Close the session of the running event loop, e.g. before the loop itself gets closed."""
+    session = _sessions.pop(asyncio.get_event_loop(), None)
+    if session:
+        await session.close()
+
+
+def _get_payload(method: str, params) -> Dict:
+    return dict(jsonrpc='2.0', method=method, params=params, id=next(_request_ids))
+
+
+def _get_result(response: Dict):
+    if 'error' in response:
+        raise ValueError(response['error'])
+    return response['result']
@@ -50,8 +50,9 @@ def instantiate_blockchain_handlers(app_config, file_mode=True):
 
     if file_mode:
         certificate_batch_handler = CertificateBatchHandler(secret_manager=secret_manager,
-                                                            certificate_handler=CertificateV2Handler(),
-                                                            merkle_tree=MerkleTreeGenerator())
+                                                            certificate_handler=CertificateV2Handler(app_config.certificate_cache_size),
+                                                            merkle_tree=MerkleTreeGenerator(app_config.merkle_tree_file),
+                                                            output_workers=app_config.output_workers)
     else:
         certificate_batch_handler = CertificateBatchWebHandler(secret_manager=secret_manager,
                                                         certificate_handler=CertificateWebV2Handler(),
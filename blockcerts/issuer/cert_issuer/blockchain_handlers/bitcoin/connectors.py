@@ -3,6 +3,7 @@ Connectors wrap the details of communicating with different Bitcoin clients and
 """
 import io
 import logging
+import threading
 import time
 from abc import abstractmethod
 
@@ -234,29 +235,42 @@ class BitcoinServiceProviderConnector(ServiceProviderConnector):
 PYCOIN_BTC_PROVIDERS = "blockchain.info blockexplorer.com blockcypher.com chain.so"
 PYCOIN_XTN_PROVIDERS = "blockexplorer.com"  # chain.so
 
-# initialize connectors
-connectors = {}
+_connectors = None
+_connectors_lock = threading.Lock()
 
-# configure mainnet providers
-provider_list = providers.providers_for_config_string(PYCOIN_BTC_PROVIDERS,
-                                                      helpers.to_pycoin_chain(Chain.bitcoin_mainnet))
-provider_list.append(BlockrIOBroadcaster('https://btc.blockr.io/api/v1'))
-provider_list.append(BlockExplorerBroadcaster('https://blockexplorer.com/api'))
-provider_list.append(InsightProvider(netcode=helpers.to_pycoin_chain(Chain.bitcoin_mainnet)))
-provider_list.append(ChainSoProvider(netcode=helpers.to_pycoin_chain(Chain.bitcoin_mainnet)))
-connectors[Chain.bitcoin_mainnet] = provider_list
 
-# configure testnet providers
-xtn_provider_list = providers.providers_for_config_string(PYCOIN_XTN_PROVIDERS,
-                                                          helpers.to_pycoin_chain(Chain.bitcoin_testnet))
-xtn_provider_list.append(ChainSoProvider(netcode=helpers.to_pycoin_chain(Chain.bitcoin_testnet)))
-xtn_provider_list.append(BlockrIOBroadcaster('https://tbtc.blockr.io/api/v1'))
-xtn_provider_list.append(BlockExplorerBroadcaster('https://testnet.blockexplorer.com/api'))
-connectors[Chain.bitcoin_testnet] = xtn_provider_list
+def get_connectors():
+    """
+    Return the providers of each chain, configured on first use rather than when this module is imported.
+    :return:
+    """
+    global _connectors
+    with _connectors_lock:
+        if _connectors is None:
+            connectors = {}
+
+            # configure mainnet providers
+            provider_list = providers.providers_for_config_string(PYCOIN_BTC_PROVIDERS,
+                                                                  helpers.to_pycoin_chain(Chain.bitcoin_mainnet))
+            provider_list.append(BlockrIOBroadcaster('https://btc.blockr.io/api/v1'))
+            provider_list.append(BlockExplorerBroadcaster('https://blockexplorer.com/api'))
+            provider_list.append(InsightProvider(netcode=helpers.to_pycoin_chain(Chain.bitcoin_mainnet)))
+            provider_list.append(ChainSoProvider(netcode=helpers.to_pycoin_chain(Chain.bitcoin_mainnet)))
+            connectors[Chain.bitcoin_mainnet] = provider_list
+
+            # configure testnet providers
+            xtn_provider_list = providers.providers_for_config_string(PYCOIN_XTN_PROVIDERS,
+                                                                      helpers.to_pycoin_chain(Chain.bitcoin_testnet))
+            xtn_provider_list.append(ChainSoProvider(netcode=helpers.to_pycoin_chain(Chain.bitcoin_testnet)))
+            xtn_provider_list.append(BlockrIOBroadcaster('https://tbtc.blockr.io/api/v1'))
+            xtn_provider_list.append(BlockExplorerBroadcaster('https://testnet.blockexplorer.com/api'))
+            connectors[Chain.bitcoin_testnet] = xtn_provider_list
+            _connectors = connectors
+    return _connectors
 
 
 def get_providers_for_chain(chain, bitcoind=False):
     if bitcoind:
         return [BitcoindConnector(helpers.to_pycoin_chain(chain))]
     else:
-        return connectors[chain]
+        return get_connectors()[chain]
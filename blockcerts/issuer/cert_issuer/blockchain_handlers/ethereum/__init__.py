@@ -54,8 +54,9 @@ def instantiate_blockchain_handlers(app_config):
     chain = app_config.chain
     secret_manager = initialize_signer(app_config)
     certificate_batch_handler = CertificateBatchHandler(secret_manager=secret_manager,
-                                                        certificate_handler=CertificateV2Handler(),
-                                                        merkle_tree=MerkleTreeGenerator())
+                                                        certificate_handler=CertificateV2Handler(app_config.certificate_cache_size),
+                                                        merkle_tree=MerkleTreeGenerator(app_config.merkle_tree_file),
+                                                        output_workers=app_config.output_workers)
     if chain == Chain.mockchain:
         transaction_handler = MockTransactionHandler()
     # ethereum chains
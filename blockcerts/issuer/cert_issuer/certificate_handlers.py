@@ -1,19 +1,42 @@
 import json
 import logging
+import threading
+from collections import OrderedDict
 
 from cert_schema import normalize_jsonld
 from cert_schema import validate_v2
 from cert_issuer import helpers
+from cert_issuer.checkpoint import BatchCheckpoint
+from cert_issuer.errors import OutputWriteError
 from pycoin.serialize import b2h
 from cert_issuer.models import CertificateHandler, BatchHandler
 
 from cert_issuer.signer import FinalizableSigner
 
+DEFAULT_CERTIFICATE_CACHE_SIZE = 10000
+
+
 class CertificateV2Handler(CertificateHandler):
+    """
+    Issues certificates stored as files, reading and parsing each of them once.
+
+    The parsed certificate and its normalized bytes are kept in a bounded LRU cache between
+    `get_byte_array_to_issue` and `add_proof`; certificates evicted from it are read again.
+    """
+
+    def __init__(self, cache_size=DEFAULT_CERTIFICATE_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
     def get_byte_array_to_issue(self, certificate_metadata):
-        certificate_json = self._get_certificate_to_issue(certificate_metadata)
-        normalized = normalize_jsonld(certificate_json, detect_unmapped_fields=False)
-        return normalized.encode('utf-8')
+        cached = self._get_cached(certificate_metadata, pop=False)
+        if cached:
+            return cached[1]
+        certificate_json = self._read_certificate(certificate_metadata)
+        normalized = normalize_jsonld(certificate_json, detect_unmapped_fields=False).encode('utf-8')
+        self._cache_certificate(certificate_metadata, certificate_json, normalized)
+        return normalized
 
     def add_proof(self, certificate_metadata, merkle_proof):
         """
@@ -24,14 +47,39 @@ class CertificateV2Handler(CertificateHandler):
         certificate_json = self._get_certificate_to_issue(certificate_metadata)
         certificate_json['signature'] = merkle_proof
 
-        with open(certificate_metadata.blockchain_cert_file_name, 'w') as out_file:
-            out_file.write(json.dumps(certificate_json))
+        helpers.write_atomically(certificate_metadata.blockchain_cert_file_name, json.dumps(certificate_json))
 
     def _get_certificate_to_issue(self, certificate_metadata):
+        # Each certificate gets its proof once, so it's no longer needed in the cache afterwards.
+        cached = self._get_cached(certificate_metadata, pop=True)
+        if cached:
+            return cached[0]
+        return self._read_certificate(certificate_metadata)
+
+    def _read_certificate(self, certificate_metadata):
         with open(certificate_metadata.unsigned_cert_file_name, 'r') as unsigned_cert_file:
             certificate_json = json.load(unsigned_cert_file)
         return certificate_json
 
+    def _get_cached(self, certificate_metadata, pop):
+        key = certificate_metadata.unsigned_cert_file_name
+        with self._cache_lock:
+            if pop:
+                return self._cache.pop(key, None)
+            cached = self._cache.get(key)
+            if cached:
+                self._cache.move_to_end(key)
+            return cached
+
+    def _cache_certificate(self, certificate_metadata, certificate_json, normalized):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[certificate_metadata.unsigned_cert_file_name] = (certificate_json, normalized)
+            self._cache.move_to_end(certificate_metadata.unsigned_cert_file_name)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
 class CertificateWebV2Handler(CertificateHandler):
     def get_byte_array_to_issue(self, certificate_json):
         normalized = normalize_jsonld(certificate_json, detect_unmapped_fields=False)
@@ -83,13 +131,30 @@ class CertificateBatchHandler(BatchHandler):
     Manages a batch of certificates. Responsible for iterating certificates in a consistent order.
 
     In this case, certificates are initialized as an Ordered Dictionary, and we iterate in insertion order.
+
+    Proofs are still generated in that order, but the certificates are written out by a pool of
+    output_workers threads. A certificate that fails to be written doesn't stop the others: it is
+    left out of the final output, and the failures are raised together by post_batch_actions.
     """
+    def __init__(self, secret_manager, certificate_handler, merkle_tree,
+                 output_workers=helpers.DEFAULT_OUTPUT_WORKERS):
+        super().__init__(secret_manager, certificate_handler, merkle_tree)
+        self.output_workers = output_workers
+        self.output_errors = {}
+
     def pre_batch_actions(self, config):
+        self.checkpoint = BatchCheckpoint(config.work_dir)
+        if not (config.resume and self.checkpoint.load()):
+            self.checkpoint.clear()
         self._process_directories(config)
         
     def post_batch_actions(self, config):
-        helpers.copy_output(self.certificates_to_issue)
+        written = OrderedDict(
+            (uid, metadata) for uid, metadata in self.certificates_to_issue.items() if uid not in self.output_errors)
+        self.output_errors.update(helpers.copy_output(written, self.output_workers))
         logging.info('Your Blockchain Certificates are in %s', config.blockchain_certificates_dir)
+        if self.output_errors:
+            raise OutputWriteError(self.output_errors)
 
     def prepare_batch(self):
         """
@@ -97,6 +162,19 @@ class CertificateBatchHandler(BatchHandler):
         :return: byte array to put on the blockchain
         """
 
+        uids = list(self.certificates_to_issue.keys())
+        file_names = [metadata.unsigned_cert_file_name for metadata in self.certificates_to_issue.values()]
+        tree_file = self.checkpoint.get_tree_file(uids, file_names) if self.checkpoint else None
+        if tree_file is not None:
+            logging.info('Using the checkpointed merkle tree in %s', tree_file)
+            self.merkle_tree.load_tree_file(tree_file)
+            return self.merkle_tree.get_blockchain_data()
+        leaf_hashes = self.checkpoint.get_leaf_hashes(uids, file_names) if self.checkpoint else None
+        if leaf_hashes is not None:
+            logging.info('Using the %d checkpointed leaves of the batch', len(leaf_hashes))
+            self.merkle_tree.populate_hashes(leaf_hashes)
+            return self.merkle_tree.get_blockchain_data()
+
         # validate batch
         for _, metadata in self.certificates_to_issue.items():
             self.certificate_handler.validate_certificate(metadata)
@@ -107,8 +185,14 @@ class CertificateBatchHandler(BatchHandler):
                 self.certificate_handler.sign_certificate(signer, metadata)
 
         self.merkle_tree.populate(self.get_certificate_generator())
-        logging.info('here is the op_return_code data: %s', b2h(self.merkle_tree.get_blockchain_data()))
-        return self.merkle_tree.get_blockchain_data()
+        blockchain_data = self.merkle_tree.get_blockchain_data()
+        logging.info('here is the op_return_code data: %s', b2h(blockchain_data))
+        if self.checkpoint and self.merkle_tree.tree_file:
+            self.checkpoint.save_prepared(uids, file_names, None, b2h(blockchain_data),
+                                          tree_file=self.merkle_tree.tree_file)
+        elif self.checkpoint:
+            self.checkpoint.save_prepared(uids, file_names, self.merkle_tree.get_leaf_hashes(), b2h(blockchain_data))
+        return blockchain_data
 
     def get_certificate_generator(self):
         """
@@ -121,9 +205,11 @@ class CertificateBatchHandler(BatchHandler):
 
     def finish_batch(self, tx_id, chain):
         proof_generator = self.merkle_tree.get_proof_generator(tx_id, chain)
-        for _, metadata in self.certificates_to_issue.items():
-            proof = next(proof_generator)
-            self.certificate_handler.add_proof(metadata, proof)
+        with helpers.ParallelWriter(self.output_workers) as writer:
+            for uid, metadata in self.certificates_to_issue.items():
+                proof = next(proof_generator)
+                writer.submit(uid, self.certificate_handler.add_proof, metadata, proof)
+        self.output_errors = writer.errors
 
     def _process_directories(self, config):
         unsigned_certs_dir = config.unsigned_certificates_dir
@@ -135,7 +221,8 @@ class CertificateBatchHandler(BatchHandler):
                 unsigned_certs_dir,
                 signed_certs_dir,
                 blockchain_certificates_dir,
-                work_dir)
+                work_dir,
+                resume=bool(self.checkpoint and self.checkpoint.state))
 
         num_certificates = len(certificates_metadata)
 
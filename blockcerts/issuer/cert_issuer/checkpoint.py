@@ -0,0 +1,127 @@
+"""
+Checkpoints of the batch being issued from the work dir, so that an interrupted run can be resumed.
+
+Issuing a batch goes through stages: its certificates are normalized and hashed into the leaves of the merkle tree
+(`prepared`), the merkle root is anchored (`broadcast`), then the proofs are added and the certificates copied out.
+The state reached is saved in the work dir after each stage. Running again with `--resume` skips what was completed:
+the leaves aren't normalized again, and a batch whose transaction was already broadcast gets its proofs from that
+transaction instead of paying for a second one.
+
+The size and modification time of every certificate are checkpointed along with the leaves: the work copies are hard
+links to the inputs, so a certificate edited in place since would otherwise be proofed against its stale leaf. Batches
+whose tree is built on disk (`--merkle_tree_file`) checkpoint the tree file, and its size and modification time,
+instead of listing every leaf.
+"""
+import json
+import logging
+import os
+
+from cert_issuer import helpers
+from cert_issuer.errors import ResumeError
+
+CHECKPOINT_FILE_NAME = 'checkpoint.json'
+
+STAGE_PREPARED = 'prepared'
+STAGE_BROADCAST = 'broadcast'
+
+
+class BatchCheckpoint(object):
+    def __init__(self, work_dir):
+        self.file_name = os.path.join(work_dir, CHECKPOINT_FILE_NAME)
+        self.state = {}
+
+    def load(self):
+        """
+        Loads the saved state, if any
+        :return: whether there was a saved state
+        """
+        if not os.path.isfile(self.file_name):
+            return False
+        with open(self.file_name, 'r') as checkpoint_file:
+            self.state = json.load(checkpoint_file)
+        logging.info('Resuming batch from stage %s', self.stage)
+        return True
+
+    @property
+    def stage(self):
+        return self.state.get('stage')
+
+    @property
+    def tx_id(self):
+        return self.state.get('tx_id')
+
+    def get_leaf_hashes(self, uids, file_names):
+        """
+        Returns the checkpointed leaf hashes of the batch, checking it still holds the same, unmodified certificates
+        :param uids: the uids of the certificates of the batch, in batch order
+        :param file_names: the files of these certificates
+        :return: the hex digests of the leaves, or None if the batch wasn't prepared yet or its tree is in a file
+        """
+        if not self._check_batch(uids, file_names):
+            return None
+        return self.state.get('leaf_hashes')
+
+    def get_tree_file(self, uids, file_names):
+        """
+        Returns the checkpointed tree file of the batch, checking neither it nor the certificates were modified
+        :param uids: the uids of the certificates of the batch, in batch order
+        :param file_names: the files of these certificates
+        :return: the name of the tree file, or None if the batch wasn't prepared yet or its tree isn't in a file
+        """
+        if not self._check_batch(uids, file_names) or 'tree_file' not in self.state:
+            return None
+        tree_file = self.state['tree_file']
+        if not os.path.isfile(tree_file) or get_file_version(tree_file) != self.state['tree_file_version']:
+            raise ResumeError(
+                'Merkle tree file %s was modified since the checkpoint in %s' % (tree_file, self.file_name))
+        return tree_file
+
+    def save_prepared(self, uids, file_names, leaf_hashes, merkle_root, tree_file=None):
+        """
+        :param leaf_hashes: the hex digests of the leaves, left out (None) when the tree is in tree_file
+        :param tree_file: the file the merkle tree was built in, if any
+        :return:
+        """
+        state = dict(stage=STAGE_PREPARED, uids=list(uids), file_versions=[get_file_version(f) for f in file_names],
+                     merkle_root=merkle_root)
+        if tree_file:
+            state.update(tree_file=os.path.abspath(tree_file), tree_file_version=get_file_version(tree_file))
+        else:
+            state.update(leaf_hashes=list(leaf_hashes))
+        self._save(state)
+
+    def save_broadcast(self, tx_id):
+        self._save(dict(self.state, stage=STAGE_BROADCAST, tx_id=tx_id))
+
+    def clear(self):
+        self.state = {}
+        if os.path.isfile(self.file_name):
+            os.remove(self.file_name)
+
+    def _check_batch(self, uids, file_names):
+        """
+        Checks the batch still holds the same, unmodified certificates as the checkpoint
+        :return: whether the batch was prepared
+        """
+        if not self.state:
+            return False
+        if self.state['uids'] != list(uids):
+            raise ResumeError('The certificates to issue changed since the checkpoint in %s' % self.file_name)
+        for uid, file_name, version in zip(uids, file_names, self.state['file_versions']):
+            if get_file_version(file_name) != version:
+                raise ResumeError('Certificate %s was modified since the checkpoint in %s' % (uid, self.file_name))
+        return True
+
+    def _save(self, state):
+        self.state = state
+        helpers.write_atomically(self.file_name, json.dumps(self.state))
+
+
+def get_file_version(file_name):
+    """
+    Returns the size and modification time of a file, which change whenever it's written
+    :param file_name:
+    :return:
+    """
+    stat = os.stat(file_name)
+    return [stat.st_size, stat.st_mtime_ns]
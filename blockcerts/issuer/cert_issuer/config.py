@@ -45,6 +45,14 @@ def add_arguments(p):
     p.add_argument('--work_dir', default=WORK_PATH,
                    help='Default path to work directory, storing intermediate outputs. This gets deleted in between runs.')
     p.add_argument('--max_retry', default=10, type=int, help='Maximum attempts to retry transaction on failure')
+    p.add_argument('--certificate_cache_size', default=10000, type=int,
+                   help='Number of parsed certificates kept in memory between hashing them and adding their proofs.')
+    p.add_argument('--output_workers', default=8, type=int,
+                   help='Number of threads writing out the certificates of a batch.')
+    p.add_argument('--merkle_tree_file', default=None,
+                   help='Build the merkle tree of the batch in this file, memory-mapped, rather than in memory. Meant for batches of millions of certificates; the file can be archived alongside the anchor.')
+    p.add_argument('--resume', dest='resume', default=False, action='store_true',
+                   help='Resume the interrupted batch in the work directory from its last completed stage, rather than starting over.')
     p.add_argument('--chain', default='bitcoin_regtest',
                    help='Which chain to use. Default is bitcoin_regtest (which is how the docker container is configured). Other options are bitcoin_testnet bitcoin_mainnet, mockchain, ethereum_mainnet, ethereum_ropsten')
 
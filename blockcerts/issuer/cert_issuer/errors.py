@@ -10,6 +10,13 @@ class InsufficientFundsError(Error):
     pass
 
 
+class InsufficientGasLimitError(Error):
+    """
+    The gas limit is too low for the transaction to be mined
+    """
+    pass
+
+
 class ConnectorError(Error):
     pass
 
@@ -56,6 +63,23 @@ class NonemptyOutputDirectoryError(Error):
     pass
 
 
+class OutputWriteError(Error):
+    """
+    Some certificates of the batch could not be written out; the others were
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('Failed to write %d certificate(s): %s' % (
+            len(errors), ', '.join('%s (%s)' % (uid, error) for uid, error in errors.items())))
+
+
+class ResumeError(Error):
+    """
+    The batch can't be resumed from its checkpoint
+    """
+    pass
+
+
 class BroadcastError(Error):
     """
     Error broadcasting transaction
@@ -68,3 +92,10 @@ class UnrecognizedChainError(Error):
     Didn't recognize chain
     """
     pass
+
+
+class UnexpectedChainError(Error):
+    """
+    The node is connected to a different chain than the one to anchor to
+    """
+    pass
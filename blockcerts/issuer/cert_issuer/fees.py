@@ -0,0 +1,187 @@
+"""
+Fee strategy for anchoring transactions.
+
+The gas limit of an anchoring transaction is known exactly: it only moves data to an externally owned account, so it
+costs the intrinsic gas of its payload. Fees are estimated from the fee history of recent blocks: the priority fee is
+a percentile of the tips recently paid, picked by urgency, and the max fee leaves room for the base fee to keep rising
+for a number of full blocks (up to 12.5% each), also picked by urgency. Nodes without EIP-1559 support get a legacy
+gas price instead. Fee histories are cached per node for about a block, so consecutive batches don't refetch them.
+"""
+import statistics
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from blockcerts.issuer.cert_issuer.errors import InsufficientGasLimitError
+
+TX_BASE_GAS = 21000
+TX_DATA_ZERO_BYTE_GAS = 4
+TX_DATA_NONZERO_BYTE_GAS = 16
+
+URGENCY_LOW = 'low'
+URGENCY_MEDIUM = 'medium'
+URGENCY_HIGH = 'high'
+URGENCY_LEVELS = (URGENCY_LOW, URGENCY_MEDIUM, URGENCY_HIGH)
+DEFAULT_URGENCY = URGENCY_MEDIUM
+
+FEE_HISTORY_BLOCKS = 10
+FEE_HISTORY_TTL = 12  # seconds, about one block
+BASE_FEE_MAX_CHANGE = 1.125
+DEFAULT_PRIORITY_FEE = 10 ** 9
+REPLACEMENT_FEE_BUMP = 1.125  # nodes only accept a replacement paying at least 10% more than the replaced transaction
+
+
+class UrgencyPolicy(NamedTuple):
+    reward_percentile: int  # percentile of recent tips paid as priority fee
+    base_fee_blocks: int  # full blocks of base fee increases the max fee can absorb
+    gas_price_multiplier: float  # applied to the node's gas price on chains without EIP-1559
+
+
+URGENCY_POLICIES = {
+    URGENCY_LOW: UrgencyPolicy(reward_percentile=10, base_fee_blocks=1, gas_price_multiplier=1.0),
+    URGENCY_MEDIUM: UrgencyPolicy(reward_percentile=50, base_fee_blocks=6, gas_price_multiplier=1.1),
+    URGENCY_HIGH: UrgencyPolicy(reward_percentile=90, base_fee_blocks=12, gas_price_multiplier=1.5),
+}
+REWARD_PERCENTILES = sorted({policy.reward_percentile for policy in URGENCY_POLICIES.values()})
+
+_fee_histories = {}
+_fee_histories_lock = threading.Lock()
+
+
+class FeeEstimate(NamedTuple):
+    gas_limit: int
+    max_fee_per_gas: Optional[int] = None
+    max_priority_fee_per_gas: Optional[int] = None
+    gas_price: Optional[int] = None
+
+    @property
+    def is_eip1559(self) -> bool:
+        return self.max_fee_per_gas is not None
+
+    @property
+    def max_cost(self) -> int:
+        """The most the transaction can cost, in wei."""
+        return self.gas_limit * (self.max_fee_per_gas if self.is_eip1559 else self.gas_price)
+
+    def tx_fields(self) -> Dict:
+        """Return the gas and fee fields of a transaction paying these fees."""
+        if self.is_eip1559:
+            return dict(
+                gas=self.gas_limit,
+                maxFeePerGas=self.max_fee_per_gas,
+                maxPriorityFeePerGas=self.max_priority_fee_per_gas,
+            )
+        return dict(gas=self.gas_limit, gasPrice=self.gas_price)
+
+    def bumped(self, factor: float) -> 'FeeEstimate':
+        """Return these fees multiplied by the given factor, rounded up (the gas limit stays the same)."""
+        per_mille = round(factor * 1000)
+        return self._replace(**{
+            field: -(-getattr(self, field) * per_mille // 1000)
+            for field in ('max_fee_per_gas', 'max_priority_fee_per_gas', 'gas_price')
+            if getattr(self, field) is not None
+        })
+
+
+def intrinsic_gas(data: bytes) -> int:
+    """Gas used by a transaction carrying the given data to an externally owned account."""
+    zero_bytes = data.count(0)
+    return TX_BASE_GAS + zero_bytes * TX_DATA_ZERO_BYTE_GAS + (len(data) - zero_bytes) * TX_DATA_NONZERO_BYTE_GAS
+
+
+class FeeOracle:
+    """Estimate the fees of anchoring transactions sent through the given web3 instance."""
+
+    def __init__(self, web3, history_blocks: int = FEE_HISTORY_BLOCKS, ttl: float = FEE_HISTORY_TTL):
+        self.web3 = web3
+        self.history_blocks = history_blocks
+        self.ttl = ttl
+
+    def estimate(self, data: bytes, urgency: str = DEFAULT_URGENCY, max_gas_price: int = None,
+                 max_gas_limit: int = None) -> FeeEstimate:
+        """
+        Return the fees of a transaction carrying the given data, confirming with the given urgency.
+
+        :param max_gas_price: cap on the max fee per gas (or gas price) in wei, e.g. the job's `gas_price`.
+        :param max_gas_limit: cap on the gas limit, e.g. the job's `gas_limit`. Fails if the transaction needs more.
+        """
+        gas_limit = anchoring_gas_limit(data, max_gas_limit)
+        history = self._get_fee_history()
+        if not history:
+            return legacy_fees(gas_limit, self.web3.eth.gasPrice, urgency, max_gas_price)
+        return eip1559_fees(gas_limit, history, urgency, max_gas_price)
+
+    def _get_fee_history(self) -> Optional[Dict]:
+        """Return the (cached) fee history of recent blocks, or None if the node doesn't support EIP-1559."""
+        key = getattr(self.web3.provider, 'endpoint_uri', None) or id(self.web3.provider)
+        cached = get_cached_fee_history(key, self.ttl)
+        if cached:
+            return cached[0]
+
+        try:
+            history = parse_fee_history(self.web3.manager.request_blocking(
+                'eth_feeHistory', [hex(self.history_blocks), 'latest', REWARD_PERCENTILES]
+            ))
+        except (ValueError, KeyError, NotImplementedError):
+            history = None
+        cache_fee_history(key, history)
+        return history
+
+
+def anchoring_gas_limit(data: bytes, max_gas_limit: int = None) -> int:
+    """Return the gas limit of a transaction carrying the given data, failing if it's above the given cap."""
+    gas_limit = intrinsic_gas(data)
+    if max_gas_limit and gas_limit > max_gas_limit:
+        raise InsufficientGasLimitError(f'Anchoring needs {gas_limit} gas, more than the limit of {max_gas_limit}.')
+    return gas_limit
+
+
+def legacy_fees(gas_limit: int, gas_price: int, urgency: str = DEFAULT_URGENCY,
+                max_gas_price: int = None) -> FeeEstimate:
+    """Return the fees of a legacy transaction, given the node's gas price."""
+    gas_price = int(gas_price * URGENCY_POLICIES[urgency or DEFAULT_URGENCY].gas_price_multiplier)
+    return FeeEstimate(gas_limit, gas_price=min(gas_price, max_gas_price or gas_price))
+
+
+def eip1559_fees(gas_limit: int, history: Dict, urgency: str = DEFAULT_URGENCY,
+                 max_gas_price: int = None) -> FeeEstimate:
+    """Return the fees of a type 2 transaction, given the fee history of recent blocks."""
+    policy = URGENCY_POLICIES[urgency or DEFAULT_URGENCY]
+    tips = [rewards[REWARD_PERCENTILES.index(policy.reward_percentile)] for rewards in history['reward']]
+    priority_fee = int(statistics.median(tips)) if any(tips) else DEFAULT_PRIORITY_FEE
+    next_base_fee = history['baseFeePerGas'][-1]
+    max_fee = int(next_base_fee * BASE_FEE_MAX_CHANGE ** policy.base_fee_blocks) + priority_fee
+    if max_gas_price:
+        max_fee = min(max_fee, max_gas_price)
+        priority_fee = min(priority_fee, max_fee)
+    return FeeEstimate(gas_limit, max_fee_per_gas=max_fee, max_priority_fee_per_gas=priority_fee)
+
+
+def parse_fee_history(raw: Dict) -> Optional[Dict]:
+    """Return the base fees and rewards of an `eth_feeHistory` result, or None if the node doesn't support EIP-1559."""
+    history = dict(
+        baseFeePerGas=[to_int(fee) for fee in raw['baseFeePerGas']],
+        reward=[[to_int(tip) for tip in rewards] for rewards in raw.get('reward') or []],
+    )
+    if not any(history['baseFeePerGas']) or not history['reward']:
+        return None
+    return history
+
+
+def get_cached_fee_history(key, ttl: float = FEE_HISTORY_TTL) -> Optional[Tuple[Optional[Dict]]]:
+    """Return the fee history cached for the given node as a 1-tuple (as it may be None), or None if there's none."""
+    with _fee_histories_lock:
+        cached = _fee_histories.get(key)
+    if cached and time.monotonic() - cached[0] < ttl:
+        return cached[1],
+    return None
+
+
+def cache_fee_history(key, history: Optional[Dict]) -> None:
+    with _fee_histories_lock:
+        _fee_histories[key] = (time.monotonic(), history)
+
+
+def to_int(value) -> int:
+    """Return the given quantity as an int, whether the web3 version at hand already formatted it or not."""
+    return int(value, 16) if isinstance(value, str) else int(value)
@@ -1,8 +1,11 @@
 import collections
 import logging
 import os
-import random
 import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 import glob2
 from cert_core import Chain, UnknownChainError
@@ -16,6 +19,10 @@ UNSIGNED_CERTIFICATES_DIR = 'unsigned_certificates'
 SIGNED_CERTIFICATES_DIR = 'signed_certificates'
 BLOCKCHAIN_CERTIFICATES_DIR = 'blockchain_certificates'
 JSON_EXT = '.json'
+DEFAULT_OUTPUT_WORKERS = 8
+# The umask can only be read by setting it, so it's read once on import rather than from the writer threads.
+UMASK = os.umask(0)
+os.umask(UMASK)
 
 
 class CertificateMetadata(object):
@@ -30,7 +37,7 @@ class CertificateMetadata(object):
 
 
 def prepare_issuance_batch(unsigned_certs_dir, signed_certs_dir, blockchain_certs_dir, work_dir,
-                           file_extension=JSON_EXT):
+                           file_extension=JSON_EXT, resume=False):
     """
     Prepares file system for issuing a batch of certificates. Copies inputs to work_dir, and ensures
     that all output dirs required for processing the batch exist.
@@ -38,6 +45,7 @@ def prepare_issuance_batch(unsigned_certs_dir, signed_certs_dir, blockchain_cert
     :param signed_certs_dir: output dir
     :param blockchain_certs_dir: output dir
     :param work_dir: work dir
+    :param resume: keep the certificates of the previous batch in work_dir, if any, to resume it
     :return:
     """
 
@@ -48,19 +56,24 @@ def prepare_issuance_batch(unsigned_certs_dir, signed_certs_dir, blockchain_cert
     os.makedirs(blockchain_certs_dir, exist_ok=True)
     os.makedirs(signed_certs_dir, exist_ok=True)
 
-    # ensure previous processing state, if any, is cleaned up
-    for item in os.listdir(work_dir):
-        file_path = os.path.join(work_dir, item)
-        if os.path.isdir(file_path):
-            shutil.rmtree(file_path)
-
     # define work subdirs
     unsigned_certs_work_dir = os.path.join(work_dir, UNSIGNED_CERTIFICATES_DIR)
     signed_certs_work_dir = os.path.join(work_dir, SIGNED_CERTIFICATES_DIR)
     blockchain_certs_work_dir = os.path.join(work_dir, BLOCKCHAIN_CERTIFICATES_DIR)
 
-    # copy input certs to unsigned certs work subdir and create output subdirs
-    shutil.copytree(unsigned_certs_dir, unsigned_certs_work_dir)
+    if resume and os.path.isdir(unsigned_certs_work_dir):
+        logging.info('Resuming the batch in work path=%s', work_dir)
+    else:
+        # ensure previous processing state, if any, is cleaned up
+        for item in os.listdir(work_dir):
+            file_path = os.path.join(work_dir, item)
+            if os.path.isdir(file_path):
+                shutil.rmtree(file_path)
+
+        # link (or copy) input certs to unsigned certs work subdir
+        link_tree(unsigned_certs_dir, unsigned_certs_work_dir)
+
+    # create output subdirs
     os.makedirs(signed_certs_work_dir, exist_ok=True)
     os.makedirs(blockchain_certs_work_dir, exist_ok=True)
 
@@ -86,11 +99,116 @@ def prepare_issuance_batch(unsigned_certs_dir, signed_certs_dir, blockchain_cert
     return cert_info
 
 
-def copy_output(certificates_metadata):
-    for _, metadata in certificates_metadata.items():
-        from_file = metadata.blockchain_cert_file_name
-        to_file = metadata.final_blockchain_cert_file_name
-        shutil.copy2(from_file, to_file)
+def copy_output(certificates_metadata, max_workers=DEFAULT_OUTPUT_WORKERS):
+    """
+    Copies the blockchain certificates to their final location, max_workers at a time.
+    :return: the errors of the certificates that couldn't be copied, by uid
+    """
+    with ParallelWriter(max_workers) as writer:
+        for uid, metadata in certificates_metadata.items():
+            writer.submit(uid, link_or_copy, metadata.blockchain_cert_file_name,
+                          metadata.final_blockchain_cert_file_name)
+    return writer.errors
+
+
+def write_atomically(file_name, data):
+    """
+    Writes data to a temporary file next to file_name, then renames it to file_name: readers
+    see either the previous file or the complete new one, never a partial write. The file keeps
+    the mode of the one it replaces, or gets the default one (mkstemp's 0600 is not kept).
+    """
+    directory, base_name = os.path.split(file_name)
+    fd, tmp_file_name = tempfile.mkstemp(dir=directory or '.', prefix='.' + base_name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as tmp_file:
+            tmp_file.write(data)
+            os.fchmod(tmp_file.fileno(), get_file_mode(file_name))
+        os.replace(tmp_file_name, file_name)
+    except BaseException:
+        os.remove(tmp_file_name)
+        raise
+
+
+def get_file_mode(file_name):
+    """
+    Returns the permission bits of file_name if it exists, otherwise those a new file gets
+    :param file_name:
+    :return:
+    """
+    try:
+        return os.stat(file_name).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~UMASK
+
+
+class ParallelWriter(object):
+    """
+    Runs file writes in a pool of threads, with at most twice as many waiting as there are threads.
+
+    A failed write doesn't stop the others: its error is logged and kept in `errors`, by key, in
+    the order the writes were submitted.
+    """
+
+    def __init__(self, max_workers=DEFAULT_OUTPUT_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max(max_workers, 1))
+        self.errors = collections.OrderedDict()
+        self._futures = collections.OrderedDict()
+        self._slots = threading.BoundedSemaphore(2 * max(max_workers, 1))
+
+    def submit(self, key, fn, *args):
+        self._slots.acquire()
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures[key] = future
+
+    def wait(self):
+        for key, future in self._futures.items():
+            error = future.exception()
+            if error is not None:
+                logging.error('Failed to write %s: %s', key, error)
+                self.errors[key] = error
+        self._futures.clear()
+        return self.errors
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.executor.shutdown(wait=True)
+        self.wait()
+
+
+def link_tree(from_dir, to_dir):
+    """
+    Like shutil.copytree, but hard-linking the files rather than copying their bytes where possible.
+    The linked files are only read, so they can share their data with the originals.
+    """
+    shutil.copytree(from_dir, to_dir, copy_function=link_or_copy)
+
+
+def link_or_copy(from_file, to_file):
+    """
+    Hard-link from_file to to_file, replacing it if it exists. Falls back to copying when linking
+    isn't possible, e.g. across filesystems or on filesystems without hard links. As in
+    write_atomically, the link or copy is made under a temporary name next to to_file and then
+    renamed to it, so readers never find to_file missing or partially copied.
+    """
+    if os.path.exists(to_file) and os.path.samefile(from_file, to_file):
+        # Already linked; renaming another link over it would be a no-op leaving the temporary one behind.
+        return to_file
+    directory, base_name = os.path.split(to_file)
+    tmp_file_name = os.path.join(directory, '.' + base_name + '.' + uuid.uuid4().hex + '.tmp')
+    try:
+        try:
+            os.link(from_file, tmp_file_name)
+        except OSError:
+            shutil.copy2(from_file, tmp_file_name)
+        os.replace(tmp_file_name, to_file)
+    except BaseException:
+        if os.path.lexists(tmp_file_name):
+            os.remove(tmp_file_name)
+        raise
+    return to_file
 
 
 def to_pycoin_chain(chain):
@@ -100,8 +218,3 @@ def to_pycoin_chain(chain):
         return 'BTC'
     else:
         raise UnknownChainError(chain.name)
-
-
-def _get_random_from_csv(values: str) -> str:
-    """Get a random choice of a comma-separated string with values, or the entire input if no commas are present."""
-    return random.choice(values.split(','))
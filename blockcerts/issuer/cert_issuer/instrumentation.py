@@ -0,0 +1,44 @@
+"""
+Timing and balance hooks of the issuing pipeline.
+
+The issuer doesn't depend on any metrics library: it reports stage and JSON-RPC timings, and the available balance of
+its accounts, through the hooks below, which do nothing until the embedding app replaces them with `install`.
+"""
+from contextlib import nullcontext
+from typing import Callable, ContextManager
+
+
+def _no_timer(*labels: str) -> ContextManager:
+    return nullcontext()
+
+
+def _no_balance(chain_id: int, address: str, available: int) -> None:
+    pass
+
+
+time_stage = _no_timer  # type: Callable[[str, str], ContextManager]
+time_rpc = _no_timer  # type: Callable[[str], ContextManager]
+report_balance = _no_balance  # type: Callable[[int, str, int], None]
+
+
+def install(time_stage: Callable[[str, str], ContextManager] = None, time_rpc: Callable[[str], ContextManager] = None,
+            report_balance: Callable[[int, str, int], None] = None) -> None:
+    """
+    Replace the given hooks.
+
+    :param time_stage: called with the pipeline and the stage, returns a context manager timing the stage.
+    :param time_rpc: called with the JSON-RPC method, returns a context manager timing the call.
+    :param report_balance: called with the chain id, the address and the available balance of an account, in wei.
+    """
+    hooks = globals()
+    for name, hook in (('time_stage', time_stage), ('time_rpc', time_rpc), ('report_balance', report_balance)):
+        if hook is not None:
+            hooks[name] = hook
+
+
+def rpc_timing_middleware(make_request: Callable, web3) -> Callable:
+    """Web3 middleware timing every JSON-RPC call by method, through `time_rpc`."""
+    def middleware(method, params):
+        with time_rpc(method):
+            return make_request(method, params)
+    return middleware
@@ -12,16 +12,24 @@ if sys.version_info.major < 3:
 
 def issue(app_config, certificate_batch_handler, transaction_handler):
     certificate_batch_handler.pre_batch_actions(app_config)
+    checkpoint = certificate_batch_handler.checkpoint
 
-    transaction_handler.ensure_balance()
+    if not (checkpoint and checkpoint.tx_id):
+        transaction_handler.ensure_balance()
 
     issuer = Issuer(
         certificate_batch_handler=certificate_batch_handler,
         transaction_handler=transaction_handler,
-        max_retry=app_config.max_retry)
-    tx_id = issuer.issue(app_config.chain)
+        max_retry=app_config.max_retry,
+        checkpoint=checkpoint)
+    try:
+        tx_id = issuer.issue(app_config.chain)
+    finally:
+        certificate_batch_handler.merkle_tree.close()
 
     certificate_batch_handler.post_batch_actions(app_config)
+    if checkpoint:
+        checkpoint.clear()
     return tx_id
 
 
@@ -9,10 +9,11 @@ MAX_TX_RETRIES = 5
 
 
 class Issuer:
-    def __init__(self, certificate_batch_handler, transaction_handler, max_retry=MAX_TX_RETRIES):
+    def __init__(self, certificate_batch_handler, transaction_handler, max_retry=MAX_TX_RETRIES, checkpoint=None):
         self.certificate_batch_handler = certificate_batch_handler
         self.transaction_handler = transaction_handler
         self.max_retry = max_retry
+        self.checkpoint = checkpoint
 
     def issue(self, chain):
         """
@@ -22,9 +23,18 @@ class Issuer:
 
         blockchain_bytes = self.certificate_batch_handler.prepare_batch()
 
+        if self.checkpoint and self.checkpoint.tx_id:
+            # anchored before the previous run was interrupted, don't pay for another transaction
+            txid = self.checkpoint.tx_id
+            logging.info('Resuming batch already broadcast with txid %s', txid)
+            self.certificate_batch_handler.finish_batch(txid, chain)
+            return txid
+
         for attempt_number in range(0, self.max_retry):
             try:
                 txid = self.transaction_handler.issue_transaction(blockchain_bytes)
+                if self.checkpoint:
+                    self.checkpoint.save_broadcast(txid)
                 self.certificate_batch_handler.finish_batch(txid, chain)
                 logging.info('Broadcast transaction with txid %s', txid)
                 return txid
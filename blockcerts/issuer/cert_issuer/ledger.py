@@ -0,0 +1,195 @@
+"""
+Local ledger of the balances of issuing accounts.
+
+Instead of reading an account's balance before every batch, the ledger keeps the last balance read from the chain
+(refreshed once it's older than `refresh_interval`, and whenever one of its transactions is confirmed) and debits it
+locally with the maximum cost of every transaction still in flight. Batches the account can't pay for are rejected
+right away with an InsufficientFundsError, and concurrent batches can't jointly spend more than the account holds.
+Accounts falling below `low_balance_threshold` are reported once (a warning, and a POST to `webhook_url` if set) until
+they're funded again.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import requests
+
+from blockcerts.issuer.cert_issuer import instrumentation
+from blockcerts.issuer.cert_issuer.errors import InsufficientFundsError
+
+log = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_INTERVAL = 60.0
+WEBHOOK_TIMEOUT = 10
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+
+class Reservation:
+    """Funds of an account set aside for a transaction in flight."""
+
+    __slots__ = ('account', 'amount')
+
+    def __init__(self, account: 'AccountBalance', amount: int):
+        self.account = account
+        self.amount = amount
+
+    def resize(self, amount: int) -> None:
+        """Reserve a different amount, e.g. for a replacement paying higher fees."""
+        self.account.resize(self, amount)
+
+    def release(self) -> None:
+        """Give the funds back, the transaction never made it to the chain."""
+        self.account.release(self)
+
+    def settle(self, balance: int = None) -> None:
+        """
+        Give the funds back once the transaction is mined, as the chain's balance now accounts for it.
+
+        :param balance: the account's balance read after the transaction was mined, if None (the transaction may not
+            be mined yet, or was given up on) the balance is read from the chain again before the next reservation.
+        """
+        self.account.settle(self, balance)
+
+
+class AccountBalance:
+    """Balance of an issuing account on a chain, minus what's reserved for its transactions in flight."""
+
+    def __init__(self, chain_id: int, address: str, refresh_interval: float, low_balance_threshold: int = 0,
+                 on_low_balance: Callable[['AccountBalance'], None] = None):
+        self.chain_id = chain_id
+        self.address = address
+        self.refresh_interval = refresh_interval
+        self.low_balance_threshold = low_balance_threshold
+        self.on_low_balance = on_low_balance
+        self.balance = None
+        self.refreshed_at = None
+        self.reservations = set()
+        self.low = False
+        self._lock = threading.Lock()
+
+    @property
+    def stale(self) -> bool:
+        """Whether the balance has to be read from the chain again before reserving funds."""
+        return self.refreshed_at is None or time.monotonic() - self.refreshed_at > self.refresh_interval
+
+    @property
+    def reserved(self) -> int:
+        return sum(reservation.amount for reservation in self.reservations)
+
+    @property
+    def available(self) -> Optional[int]:
+        return None if self.balance is None else self.balance - self.reserved
+
+    def refresh(self, balance: int) -> None:
+        with self._lock:
+            self.balance = balance
+            self.refreshed_at = time.monotonic()
+        self._update()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.refreshed_at = None
+
+    def reserve(self, amount: int) -> Reservation:
+        """Set the given amount aside, failing if the account can't cover it on top of what's already reserved."""
+        with self._lock:
+            self._ensure_available(amount)
+            reservation = Reservation(self, amount)
+            self.reservations.add(reservation)
+        self._update()
+        return reservation
+
+    def resize(self, reservation: Reservation, amount: int) -> None:
+        with self._lock:
+            self._ensure_available(amount - reservation.amount)
+            reservation.amount = amount
+        self._update()
+
+    def release(self, reservation: Reservation) -> None:
+        with self._lock:
+            self.reservations.discard(reservation)
+        self._update()
+
+    def settle(self, reservation: Reservation, balance: int = None) -> None:
+        """Release the reservation and refresh the balance at once, so no reservation sees one without the other."""
+        with self._lock:
+            self.reservations.discard(reservation)
+            if balance is None:
+                self.refreshed_at = None
+            else:
+                self.balance = balance
+                self.refreshed_at = time.monotonic()
+        self._update()
+
+    def _ensure_available(self, amount: int) -> None:
+        available = self.balance - self.reserved
+        if amount > available:
+            raise InsufficientFundsError(
+                f'Account {self.address} has {available} wei available, {amount} wei are needed.'
+            )
+
+    def _update(self) -> None:
+        """Export the available balance and report the account when it falls below the threshold."""
+        available = self.available
+        if available is None:
+            return
+        instrumentation.report_balance(self.chain_id, self.address, available)
+        low = available < self.low_balance_threshold
+        if low and not self.low:
+            log.warning('Account %s on chain %s is running low: %s wei available.', self.address, self.chain_id,
+                        available)
+            if self.on_low_balance:
+                self.on_low_balance(self)
+        self.low = low
+
+
+class BalanceLedger:
+    """Balances of all the issuing accounts of the process."""
+
+    def __init__(self, refresh_interval: float = DEFAULT_REFRESH_INTERVAL, low_balance_threshold: int = 0,
+                 webhook_url: str = None):
+        self.refresh_interval = refresh_interval
+        self.low_balance_threshold = low_balance_threshold
+        self.webhook_url = webhook_url
+        self.accounts = {}  # type: Dict[tuple, AccountBalance]
+        self._lock = threading.Lock()
+
+    def account(self, chain_id: int, address: str) -> AccountBalance:
+        key = (chain_id, address.lower())
+        with self._lock:
+            if key not in self.accounts:
+                self.accounts[key] = AccountBalance(
+                    chain_id, address, self.refresh_interval, self.low_balance_threshold, self._alert
+                )
+            return self.accounts[key]
+
+    def _alert(self, account: AccountBalance) -> None:
+        if not self.webhook_url:
+            return
+        payload = dict(
+            chain_id=account.chain_id,
+            address=account.address,
+            available=account.available,
+            threshold=account.low_balance_threshold,
+        )
+        threading.Thread(target=_post_alert, args=(self.webhook_url, payload), daemon=True).start()
+
+
+def _post_alert(url: str, payload: Dict) -> None:
+    try:
+        requests.post(url, json=payload, timeout=WEBHOOK_TIMEOUT).raise_for_status()
+    except requests.RequestException:
+        log.exception('Failed to send the low balance alert of account %s.', payload['address'])
+
+
+def get_balance_ledger(refresh_interval: float = DEFAULT_REFRESH_INTERVAL, low_balance_threshold: int = 0,
+                       webhook_url: str = None) -> BalanceLedger:
+    """Return the ledger of this process for the given settings."""
+    key = (refresh_interval, low_balance_threshold, webhook_url)
+    with _ledgers_lock:
+        if key not in _ledgers:
+            _ledgers[key] = BalanceLedger(refresh_interval, low_balance_threshold, webhook_url)
+        return _ledgers[key]
@@ -0,0 +1,154 @@
+"""
+Compact on-disk merkle trees, for batches too large to keep their tree in memory.
+
+A tree file holds a header followed by the 32-byte sha256 nodes of every level, from the leaves up to the root:
+
+    magic (4 bytes) | version (1 byte) | padding (3 bytes) | leaf count (8 bytes, big endian)
+    leaves | level 1 | ... | root
+
+Levels are built as chainpoint's MerkleTools builds them: each pair of nodes is hashed into its parent, and the odd
+last node of a level, if any, is carried up as is. The size of every level follows from the leaf count, so no index
+is stored. Trees are written level by level while being built, then memory-mapped: a proof takes one read per level
+and leaves the pages it didn't touch on disk. The file can be archived alongside the anchor.
+"""
+import mmap
+import struct
+from hashlib import sha256
+
+MAGIC = b'BCMT'
+VERSION = 1
+HEADER = struct.Struct('>4sB3xQ')
+NODE_SIZE = 32
+# Nodes hashed at a time when building a level, an even number so that no pair is split.
+CHUNK_NODES = 2 * 32768
+
+
+def get_level_sizes(leaf_count):
+    """
+    Returns the number of nodes of every level, from the leaves up to the root
+    :param leaf_count:
+    :return:
+    """
+    sizes = [leaf_count]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return sizes
+
+
+class MerkleTreeFileWriter(object):
+    """
+    Builds a tree file from leaves added one at a time, holding at most CHUNK_NODES nodes in memory.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.leaf_count = 0
+        self._file = open(file_name, 'w+b')
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0))
+
+    def add_leaf(self, leaf):
+        """
+        :param leaf: the 32-byte hash of the leaf
+        :return:
+        """
+        if len(leaf) != NODE_SIZE:
+            raise ValueError('Merkle tree leaves must be %d bytes long, got %d' % (NODE_SIZE, len(leaf)))
+        self._file.write(leaf)
+        self.leaf_count += 1
+
+    def finish(self):
+        """
+        Builds the levels above the leaves and closes the file
+        :return: the root of the tree
+        """
+        if not self.leaf_count:
+            self.close()
+            raise ValueError('Cannot build a merkle tree without leaves')
+        level_offset = HEADER.size
+        for level_size in get_level_sizes(self.leaf_count)[:-1]:
+            next_level_offset = level_offset + level_size * NODE_SIZE
+            self._write_next_level(level_offset, level_size, next_level_offset)
+            level_offset = next_level_offset
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, self.leaf_count))
+        self._file.seek(level_offset)
+        root = self._file.read(NODE_SIZE)
+        self.close()
+        return root
+
+    def close(self):
+        self._file.close()
+
+    def _write_next_level(self, level_offset, level_size, next_level_offset):
+        write_offset = next_level_offset
+        for start in range(0, level_size, CHUNK_NODES):
+            count = min(CHUNK_NODES, level_size - start)
+            self._file.seek(level_offset + start * NODE_SIZE)
+            nodes = self._file.read(count * NODE_SIZE)
+            parents = bytearray()
+            for pair_offset in range(0, count - 1, 2):
+                parents += sha256(nodes[pair_offset * NODE_SIZE:(pair_offset + 2) * NODE_SIZE]).digest()
+            if count % 2:
+                parents += nodes[-NODE_SIZE:]
+            self._file.seek(write_offset)
+            self._file.write(parents)
+            write_offset += len(parents)
+
+
+class MerkleTreeFile(object):
+    """
+    Read-only, memory-mapped view of a tree file.
+    """
+
+    def __init__(self, file_name):
+        with open(file_name, 'rb') as tree_file:
+            self._map = mmap.mmap(tree_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.leaf_count = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('%s is not a version %d merkle tree file' % (file_name, VERSION))
+        self.level_sizes = get_level_sizes(self.leaf_count)
+        self._level_offsets = []
+        offset = HEADER.size
+        for level_size in self.level_sizes:
+            self._level_offsets.append(offset)
+            offset += level_size * NODE_SIZE
+        if len(self._map) != offset:
+            self.close()
+            raise ValueError('%s is truncated or corrupted' % file_name)
+
+    def get_node(self, level, index):
+        offset = self._level_offsets[level] + index * NODE_SIZE
+        return self._map[offset:offset + NODE_SIZE]
+
+    def get_leaf(self, index):
+        return self.get_node(0, index).hex()
+
+    def get_merkle_root(self):
+        return self.get_node(len(self.level_sizes) - 1, 0).hex()
+
+    def get_proof(self, index):
+        """
+        Returns the proof of the given leaf, in the format of chainpoint's MerkleTools
+        :param index:
+        :return: the siblings of the path from the leaf to the root, as {'left'|'right': hex digest}
+        """
+        if not 0 <= index < self.leaf_count:
+            raise IndexError('No leaf %d in a tree of %d leaves' % (index, self.leaf_count))
+        proof = []
+        for level, level_size in enumerate(self.level_sizes[:-1]):
+            if index % 2:
+                proof.append({'left': self.get_node(level, index - 1).hex()})
+            elif index + 1 < level_size:
+                proof.append({'right': self.get_node(level, index + 1).hex()})
+            index //= 2
+        return proof
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -4,6 +4,8 @@ from cert_core import Chain
 from chainpoint.chainpoint import MerkleTools
 from pycoin.serialize import h2b
 
+from cert_issuer.merkle_tree_file import MerkleTreeFile, MerkleTreeFileWriter
+
 
 def hash_byte_array(data):
     hashed = hashlib.sha256(data).hexdigest()
@@ -17,8 +19,14 @@ def ensure_string(value):
 
 
 class MerkleTreeGenerator(object):
-    def __init__(self):
-        self.tree = MerkleTools(hash_type='sha256')
+    """
+    Builds the merkle tree of a batch in memory or, given a tree_file, on disk (see merkle_tree_file).
+    """
+
+    def __init__(self, tree_file=None):
+        self.tree_file = tree_file
+        self._writer = None
+        self.tree = None if tree_file else MerkleTools(hash_type='sha256')
 
     def populate(self, node_generator):
         """
@@ -27,16 +35,55 @@ class MerkleTreeGenerator(object):
         :param node_generator:
         :return:
         """
+        if self.tree_file:
+            for data in node_generator:
+                self._get_writer().add_leaf(hashlib.sha256(data).digest())
+            return
         for data in node_generator:
             hashed = hash_byte_array(data)
             self.tree.add_leaf(hashed)
 
+    def populate_hashes(self, hashes):
+        """
+        Populate Merkle Tree with leaves already hashed (hex digests), e.g. computed in another process.
+        :param hashes:
+        :return:
+        """
+        if self.tree_file:
+            for hashed in hashes:
+                self._get_writer().add_leaf(h2b(hashed))
+            return
+        self.tree.add_leaf(list(hashes))
+
+    def load_tree_file(self, tree_file):
+        """
+        Uses a tree file built beforehand, e.g. by an interrupted run, instead of building the tree
+        :param tree_file:
+        :return:
+        """
+        self.tree_file = tree_file
+        self.tree = MerkleTreeFile(tree_file)
+
+    def get_leaf_hashes(self):
+        """
+        Returns the leaves of the tree (hex digests), in insertion order
+        :return:
+        """
+        tree = self._get_tree()
+        return [ensure_string(tree.get_leaf(index)) for index in range(0, self._get_leaf_count())]
+
     def get_blockchain_data(self):
         """
         Finalize tree and return byte array to issue on blockchain
         :return:
         """
-        self.tree.make_tree()
+        if self.tree_file:
+            if self.tree is None:
+                self._get_writer().finish()
+                self._writer = None
+                self.tree = MerkleTreeFile(self.tree_file)
+        else:
+            self.tree.make_tree()
         merkle_root = self.tree.get_merkle_root()
         return h2b(ensure_string(merkle_root))
 
@@ -47,10 +94,11 @@ class MerkleTreeGenerator(object):
         :param tx_id: blockchain transaction id
         :return:
         """
-        root = ensure_string(self.tree.get_merkle_root())
-        node_count = len(self.tree.leaves)
+        tree = self._get_tree()
+        root = ensure_string(tree.get_merkle_root())
+        node_count = self._get_leaf_count()
         for index in range(0, node_count):
-            proof = self.tree.get_proof(index)
+            proof = tree.get_proof(index)
             proof2 = []
 
             for p in proof:
@@ -58,7 +106,7 @@ class MerkleTreeGenerator(object):
                 for key, value in p.items():
                     dict2[key] = ensure_string(value)
                 proof2.append(dict2)
-            target_hash = ensure_string(self.tree.get_leaf(index))
+            target_hash = ensure_string(tree.get_leaf(index))
             merkle_proof = {
                 "type": ['MerkleProof2017', 'Extension'],
                 "merkleRoot": root,
@@ -71,6 +119,33 @@ class MerkleTreeGenerator(object):
                 }]}
             yield merkle_proof
 
+    def close(self):
+        """
+        Closes the tree file, if any. No proof can be generated afterwards
+        :return:
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self.tree_file and self.tree is not None:
+            self.tree.close()
+
+    def _get_writer(self):
+        # Opened on first use rather than in __init__, once the batch is prepared (and the work dir cleaned).
+        if self._writer is None:
+            self._writer = MerkleTreeFileWriter(self.tree_file)
+        return self._writer
+
+    def _get_tree(self):
+        if self.tree is None:
+            self.get_blockchain_data()
+        return self.tree
+
+    def _get_leaf_count(self):
+        if self.tree_file:
+            return self._get_tree().leaf_count
+        return len(self.tree.leaves)
+
 
 def to_source_id(txid, chain):
     if chain == Chain.bitcoin_mainnet or Chain.bitcoin_testnet or Chain.ethereum_mainnet or Chain.ethereum_ropsten:
@@ -7,6 +7,7 @@ class BatchHandler(object):
         self.certificate_handler = certificate_handler
         self.secret_manager = secret_manager
         self.merkle_tree = merkle_tree
+        self.checkpoint = None
 
     @abstractmethod
     def pre_batch_actions(self, config):
@@ -0,0 +1,57 @@
+"""
+Nonce allocation for issuing accounts.
+
+The node's pending nonce lags behind transactions that were just broadcast (and behind those sent through another
+node of the pool), so concurrent batches of the same account reading it would sign for the same nonce and replace one
+another. Nonces are handed out from a local counter per account instead, which only ever moves past the node's view.
+"""
+import threading
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+class NonceManager:
+    """Hand out consecutive nonces for one account."""
+
+    def __init__(self):
+        self.next_nonce = None
+        self._lock = threading.Lock()
+
+    def allocate(self, pending_nonce: int) -> int:
+        """Return the next nonce to sign with, given the node's pending nonce for the account."""
+        with self._lock:
+            nonce = pending_nonce if self.next_nonce is None else max(pending_nonce, self.next_nonce)
+            self.next_nonce = nonce + 1
+            return nonce
+
+    def release(self, nonce: int) -> None:
+        """
+        Give back a nonce whose transaction was never broadcast.
+
+        The last nonce handed out is simply reused. Any other one would leave a gap that holds back every later
+        transaction, so the counter is resynchronised with the node, whose pending nonce then points at the gap.
+        """
+        with self._lock:
+            if self.next_nonce == nonce + 1:
+                self.next_nonce = nonce
+            else:
+                self.next_nonce = None
+
+    def resync(self) -> None:
+        """
+        Follow the node's pending nonce again from the next allocation, e.g. once a transaction was dropped.
+
+        Otherwise the counter would stay past the dropped nonce, and every later transaction would wait behind it.
+        """
+        with self._lock:
+            self.next_nonce = None
+
+
+def get_nonce_manager(chain_id: int, address: str) -> NonceManager:
+    """Return the nonce manager of this process for the given account."""
+    key = (chain_id, address.lower())
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = NonceManager()
+        return _managers[key]
@@ -0,0 +1,250 @@
+"""
+Health-scored pool of Ethereum nodes.
+
+`ETH_NODE_URL_*` may list several comma-separated nodes. Instead of sticking to one of them at random, every JSON-RPC
+call goes through a `NodePool` which keeps an exponentially weighted moving average of each node's latency and opens a
+circuit breaker on nodes failing several times in a row, leaving them aside for a cooldown period:
+- reads go to the fastest healthy node, failing over to the next ones on connection errors or timeouts;
+- latency-sensitive reads (receipts, nonces) are hedged: if the fastest node hasn't answered after `hedge_delay`
+  seconds the call is also sent to the second fastest, and whichever answers first wins;
+- raw transactions are broadcast to the `broadcast_count` fastest nodes at once, so that one lagging or partitioned
+  node doesn't delay anchoring;
+- independent reads can be sent together as a single JSON-RPC batch, in one round trip (`request_batch`).
+Pools are shared per process, so that what is learned about the nodes outlives each request.
+"""
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed, wait, \
+    FIRST_COMPLETED
+from typing import Dict, List, Tuple, Any
+
+import requests
+from web3 import HTTPProvider
+from web3.providers.base import BaseProvider
+
+HEDGED_METHODS = ('eth_getTransactionReceipt', 'eth_getTransactionCount', 'eth_getTransactionByHash')
+BROADCAST_METHODS = ('eth_sendRawTransaction',)
+
+DEFAULT_HEDGE_DELAY = 0.3
+DEFAULT_BROADCAST_COUNT = 2
+FAILURE_THRESHOLD = 3  # consecutive failures opening a node's circuit breaker
+COOLDOWN = 30.0  # seconds a node is left aside once its circuit breaker opens
+LATENCY_WEIGHT = 0.3  # weight of the latest call in the moving average of a node's latency
+FAILURE_PENALTY = 1.0  # seconds added to the latency of a failed call, so that failing fast doesn't look fast
+MAX_WORKERS = 16
+BATCH_TIMEOUT = 10  # seconds, as web3 waits for single calls
+
+_pools = {}
+_pools_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+_request_ids = itertools.count()
+
+
+class Node:
+    """A node of the pool, along with its health."""
+
+    __slots__ = ('url', 'provider', 'session', 'latency', 'failures', 'open_until', '_lock')
+
+    def __init__(self, url: str):
+        self.url = url
+        self.provider = HTTPProvider(url)
+        self.session = requests.Session()  # batches bypass web3, reuse connections to the node all the same
+        self.latency = 0.0  # untried nodes go first, so that every node gets a score
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """Whether the circuit breaker is closed, or half-open after its cooldown (one failure opens it again)."""
+        return self.open_until <= time.monotonic()
+
+    def record_success(self, seconds: float) -> None:
+        with self._lock:
+            self.latency += LATENCY_WEIGHT * (seconds - self.latency)
+            self.failures = 0
+
+    def record_failure(self, seconds: float) -> None:
+        with self._lock:
+            self.latency += LATENCY_WEIGHT * (seconds + FAILURE_PENALTY - self.latency)
+            self.failures += 1
+            if self.failures >= FAILURE_THRESHOLD:
+                self.open_until = time.monotonic() + COOLDOWN
+
+    def request(self, method: str, params) -> Dict:
+        """Run a JSON-RPC call on this node, scoring it. JSON-RPC errors are answers, not node failures."""
+        start = time.perf_counter()
+        try:
+            response = self.provider.make_request(method, params)
+        except Exception:
+            self.record_failure(time.perf_counter() - start)
+            raise
+        self.record_success(time.perf_counter() - start)
+        return response
+
+    def request_batch(self, calls: List[Tuple[str, Any]]) -> List[Dict]:
+        """Run the given (method, params) calls as one JSON-RPC batch and return their responses in order."""
+        ids = [next(_request_ids) for _ in calls]
+        payload = [
+            dict(jsonrpc='2.0', method=method, params=params, id=id_) for id_, (method, params) in zip(ids, calls)
+        ]
+        request_kwargs = dict(self.provider.get_request_kwargs())
+        request_kwargs.setdefault('timeout', BATCH_TIMEOUT)
+        start = time.perf_counter()
+        try:
+            response = self.session.post(self.url, data=json.dumps(payload).encode(), **request_kwargs)
+            response.raise_for_status()
+            responses = response.json()
+        except Exception:
+            self.record_failure(time.perf_counter() - start)
+            raise
+        self.record_success(time.perf_counter() - start)
+        if not isinstance(responses, list):
+            # Nodes without batch support answer with a single error, fall back to one call at a time.
+            return [self.request(method, params) for method, params in calls]
+        by_id = {response.get('id'): response for response in responses}
+        return [by_id[id_] for id_ in ids]
+
+
+class NodePool:
+    """Route JSON-RPC calls across the given nodes according to their health."""
+
+    def __init__(self, urls: List[str], hedge_delay: float = DEFAULT_HEDGE_DELAY,
+                 broadcast_count: int = DEFAULT_BROADCAST_COUNT):
+        self.nodes = [Node(url) for url in urls]
+        self.hedge_delay = hedge_delay
+        self.broadcast_count = broadcast_count
+
+    def ranked(self) -> List[Node]:
+        """Return the nodes from fastest to slowest, the ones with an open circuit breaker last."""
+        return sorted(self.nodes, key=lambda node: (not node.available, node.latency))
+
+    def request(self, method: str, params) -> Dict:
+        nodes = self.ranked()
+        if method in BROADCAST_METHODS and self.broadcast_count > 1 and len(nodes) > 1:
+            return self._broadcast(nodes[:self.broadcast_count], method, params)
+        if method in HEDGED_METHODS and self.hedge_delay and len(nodes) > 1 and nodes[1].available:
+            return self._hedge(nodes, method, params)
+        return self._failover(nodes, method, params)
+
+    def request_batch(self, calls: List[Tuple[str, Any]]) -> List[Dict]:
+        """Send the given (method, params) calls as one JSON-RPC batch to the fastest node that answers."""
+        nodes = self.ranked()
+        for i, node in enumerate(nodes):
+            try:
+                return node.request_batch(calls)
+            except Exception:
+                if i == len(nodes) - 1:
+                    raise
+
+    @staticmethod
+    def _failover(nodes: List[Node], method: str, params) -> Dict:
+        """Try the nodes in turn until one of them answers."""
+        for i, node in enumerate(nodes):
+            try:
+                return node.request(method, params)
+            except Exception:
+                if i == len(nodes) - 1:
+                    raise
+
+    def _hedge(self, nodes: List[Node], method: str, params) -> Dict:
+        """Send the call to the fastest node, and to the second fastest too if the first is late."""
+        first = _get_executor().submit(nodes[0].request, method, params)
+        try:
+            return first.result(timeout=self.hedge_delay)
+        except FutureTimeoutError:
+            pass
+        except Exception:
+            return self._failover(nodes[1:], method, params)
+
+        second = _get_executor().submit(nodes[1].request, method, params)
+        for future in as_completed([first, second]):
+            try:
+                return future.result()
+            except Exception as e:
+                exception = e
+        if len(nodes) > 2:
+            return self._failover(nodes[2:], method, params)
+        raise exception
+
+    @staticmethod
+    def _broadcast(nodes: List[Node], method: str, params) -> Dict:
+        """
+        Send the call to all the given nodes and return the first successful answer.
+
+        If every node answers with an error (e.g. a nonce too low) the first error is returned, like a single node
+        would. If none of them answers at all, the last exception is raised.
+        """
+        pending = {_get_executor().submit(node.request, method, params) for node in nodes}
+        errors, exception = [], None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    exception = e
+                    continue
+                if 'error' not in response:
+                    return response
+                errors.append(response)
+        if errors:
+            return errors[0]
+        raise exception
+
+
+class PooledHTTPProvider(BaseProvider):
+    """Web3 provider sending its calls through a NodePool."""
+
+    def __init__(self, pool: NodePool, endpoint_uri: str = None):
+        super().__init__()
+        self.pool = pool
+        self.endpoint_uri = endpoint_uri or ','.join(node.url for node in pool.nodes)
+
+    def make_request(self, method, params) -> Dict:
+        return self.pool.request(method, params)
+
+    def request_batch(self, calls: List[Tuple[str, Any]]) -> List:
+        """
+        Send the given (method, params) calls in a single round trip and return their raw results in order.
+
+        Results aren't formatted by web3 (quantities stay hex strings) and any error fails the whole batch with a
+        ValueError, as web3 does for single calls.
+        """
+        responses = self.pool.request_batch(calls)
+        for response in responses:
+            if 'error' in response:
+                raise ValueError(response['error'])
+        return [response['result'] for response in responses]
+
+    def is_connected(self) -> bool:
+        try:
+            response = self.make_request('web3_clientVersion', [])
+        except Exception:
+            return False
+        return 'error' not in response
+
+    def __str__(self) -> str:
+        return f'Pool of {len(self.pool.nodes)} node(s)'
+
+
+def get_node_pool(urls: str, hedge_delay: float = DEFAULT_HEDGE_DELAY,
+                  broadcast_count: int = DEFAULT_BROADCAST_COUNT) -> NodePool:
+    """Return the pool of this process for the given comma-separated node urls."""
+    key = (urls, hedge_delay, broadcast_count)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = NodePool([url.strip() for url in urls.split(',') if url.strip()], hedge_delay,
+                                   broadcast_count)
+        return _pools[key]
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='node-pool')
+        return _executor
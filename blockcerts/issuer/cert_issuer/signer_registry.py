@@ -0,0 +1,76 @@
+"""
+In-memory registry of signing accounts.
+
+Deriving an account from its private key (and reading that key from a file) used to happen for every batch. The
+registry keeps the parsed LocalAccount of every key it's asked for, keyed by a fingerprint of the key rather than the
+key itself, for a bounded time and up to a bounded number of keys, so that signing involves neither file I/O nor key
+derivation and keys never have to be written to disk.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from eth_account import Account
+from eth_account.signers.local import LocalAccount
+
+DEFAULT_MAX_SIZE = 64
+DEFAULT_TTL = 60 * 60
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+class SignerRegistry:
+    """Bounded, expiring cache of LocalAccounts by key fingerprint."""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._signers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, private_key: str) -> LocalAccount:
+        """Return the account of the given private key, deriving it only if it isn't cached (or has expired)."""
+        fingerprint = key_fingerprint(private_key)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._signers.get(fingerprint)
+            if cached and now - cached[0] <= self.ttl:
+                self._signers.move_to_end(fingerprint)
+                return cached[1]
+
+        signer = Account.from_key(private_key)
+        with self._lock:
+            self._signers[fingerprint] = (now, signer)
+            self._signers.move_to_end(fingerprint)
+            self._evict(now)
+        return signer
+
+    def __len__(self) -> int:
+        return len(self._signers)
+
+    def _evict(self, now: float) -> None:
+        """Drop expired accounts, then the least recently used ones while over capacity."""
+        for fingerprint, (added_at, _) in list(self._signers.items()):
+            if now - added_at > self.ttl:
+                del self._signers[fingerprint]
+        while len(self._signers) > self.max_size:
+            self._signers.popitem(last=False)
+
+
+def key_fingerprint(private_key: str) -> str:
+    """Return a digest identifying the given private key, whether it's 0x-prefixed or not."""
+    normalized = private_key.strip().lower()
+    if normalized.startswith('0x'):
+        normalized = normalized[2:]
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def get_signer_registry(max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL) -> SignerRegistry:
+    """Return the registry of this process for the given limits."""
+    key = (max_size, ttl)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = SignerRegistry(max_size, ttl)
+        return _registries[key]
@@ -1,14 +1,23 @@
 import copy
 import os
-from typing import Generator, Dict, Tuple
+from typing import Dict, List, Tuple, Callable, NamedTuple, Optional
 
 from cert_core import Chain
-from cert_issuer.merkle_tree_generator import MerkleTreeGenerator
+from cert_issuer.merkle_tree_generator import MerkleTreeGenerator, hash_byte_array
 from cert_schema import normalize_jsonld
-from eth_account.datastructures import AttributeDict
 from web3 import Web3
 
-from blockcerts.issuer.cert_issuer.helpers import _get_random_from_csv
+from blockcerts.issuer.cert_issuer import instrumentation
+from blockcerts.issuer.cert_issuer.errors import UnexpectedChainError
+from blockcerts.issuer.cert_issuer.fees import FeeOracle, FeeEstimate, DEFAULT_URGENCY, REPLACEMENT_FEE_BUMP, to_int
+from blockcerts.issuer.cert_issuer.ledger import BalanceLedger, get_balance_ledger, DEFAULT_REFRESH_INTERVAL
+from blockcerts.issuer.cert_issuer.nonces import get_nonce_manager
+from blockcerts.issuer.cert_issuer.signer_registry import SignerRegistry, get_signer_registry, DEFAULT_MAX_SIZE, \
+    DEFAULT_TTL
+from blockcerts.issuer.cert_issuer.providers import PooledHTTPProvider, get_node_pool, DEFAULT_HEDGE_DELAY, \
+    DEFAULT_BROADCAST_COUNT
+
+CHAIN_IDS = {'mainnet': 1, 'ropsten': 3}
 
 
 class SimplifiedCertificateBatchIssuer:
@@ -18,7 +27,11 @@ class SimplifiedCertificateBatchIssuer:
     Please note that it currently only supports anchoring to Ethereum.
     """
 
-    def __init__(self, config: 'AttrDict', unsigned_certs: dict):
+    def __init__(self, config: 'AttrDict', unsigned_certs: dict, leaf_hashes: List[str] = None):
+        """
+        :param leaf_hashes: hashes of the normalized unsigned certs, in the same order, if they were already computed
+            (e.g. in a CPU worker, see `hash_certificates`).
+        """
         # 1- Prepare config and unsigned certs (These come from my latest changes in cert-tools
         self.config = config
         self.config.original_chain = self.config.chain
@@ -27,125 +40,221 @@ class SimplifiedCertificateBatchIssuer:
         self.path_to_secret = os.path.join(config.usb_name, config.key_file)
 
         self.unsigned_certs = unsigned_certs
-        self.cert_generator = self._create_cert_generator()
+        self.tx_id = None
+        if leaf_hashes is None:
+            leaf_hashes = hash_certificates(unsigned_certs)
 
         # 2- Calculate Merkle Tree and Root
-        self.merkle_tree_generator = MerkleTreeGenerator()
-        self.merkle_tree_generator.populate(self.cert_generator)
-        self.merkle_root = self.merkle_tree_generator.get_blockchain_data()
+        with instrumentation.time_stage('issue', 'merkle_tree'):
+            self.merkle_tree_generator = MerkleTreeGenerator()
+            self.merkle_tree_generator.populate_hashes(leaf_hashes)
+            self.merkle_root = self.merkle_tree_generator.get_blockchain_data()
+
+    def issue(self, on_signed: Callable[[str, Dict], None] = None) -> Tuple[str, Dict]:
+        """
+        Anchor the merkle root in a blockchain transaction and add the tx id and merkle proof to each cert.
 
-    def issue(self) -> Tuple[str, Dict]:
-        """Anchor the merkle root in a blockchain transaction and add the tx id and merkle proof to each cert."""
+        :param on_signed: optional callback, called with the uid and the cert as soon as each cert gets its proof.
+        """
         tx_id = self._broadcast_transaction()
-        signed_certs = self._add_proof_to_certs(tx_id)
+        with instrumentation.time_stage('issue', 'proof_attachment'):
+            signed_certs = self._add_proof_to_certs(tx_id, on_signed)
         return tx_id, signed_certs
 
-    def _add_proof_to_certs(self, tx_id) -> Dict:
+    def _add_proof_to_certs(self, tx_id, on_signed: Callable[[str, Dict], None] = None) -> Dict:
         """Add merkle proof to the JSON of the certificates."""
         proof_generator = self.merkle_tree_generator.get_proof_generator(tx_id, self.config.chain)
         signed_certs = copy.deepcopy(self.unsigned_certs)
-        for _, cert in signed_certs.items():
+        for uid, cert in signed_certs.items():
             proof = next(proof_generator)
             cert['signature'] = proof
+            if on_signed:
+                on_signed(uid, cert)
         return signed_certs
 
     def _broadcast_transaction(self) -> str:
         """Broadcast the tx used to anchor a merkle root to a given blockchain."""
-        self.transaction_handler = SimplifiedEthereumTransactionHandler(
+        self.transaction_handler = SimplifiedEthereumTransactionHandler(**self._get_handler_kwargs())
+        with instrumentation.time_stage('issue', 'broadcast'):
+            self.tx_id = self.transaction_handler.issue_transaction(self.merkle_root)
+        return self.tx_id
+
+    def _get_handler_kwargs(self) -> Dict:
+        """Return the settings of the transaction handler anchoring this batch."""
+        return dict(
             chain=self.config.original_chain.split('_')[1],
             path_to_secret=self.path_to_secret,
             private_key=self.config.get('eth_private_key'),
-            recommended_max_cost=self.config.gas_price * self.config.gas_limit,
             account_from=self.config.get('eth_public_key') or self.config.issuing_address,
+            urgency=self.config.get('urgency'),
+            max_gas_price=self.config.get('gas_price'),
+            max_gas_limit=self.config.get('gas_limit'),
+            hedge_delay=self.config.get('eth_node_hedge_delay', DEFAULT_HEDGE_DELAY),
+            broadcast_count=self.config.get('eth_node_broadcast_count') or DEFAULT_BROADCAST_COUNT,
+            chain_id=self.config.get('eth_chain_id'),
+            eth_node_url=self.config.get('eth_node_url'),
+            ledger=get_balance_ledger(
+                self.config.get('balance_refresh_interval') or DEFAULT_REFRESH_INTERVAL,
+                self.config.get('low_balance_threshold') or 0,
+                self.config.get('low_balance_webhook_url'),
+            ),
+            signers=get_signer_registry(
+                self.config.get('signer_cache_size') or DEFAULT_MAX_SIZE,
+                self.config.get('signer_cache_ttl') or DEFAULT_TTL,
+            ),
         )
-        tx_id = self.transaction_handler.issue_transaction(self.merkle_root)
-        return tx_id
 
-    def _create_cert_generator(self) -> Generator:
-        """Return a generator of jsonld-normalized unsigned certs."""
-        for uid, cert in self.unsigned_certs.items():
-            normalized = normalize_jsonld(cert, detect_unmapped_fields=False)
-            yield normalized.encode('utf-8')
+
+def hash_certificates(unsigned_certs: Dict) -> List[str]:
+    """Return the hex digests of the jsonld-normalized unsigned certs, the leaves of the batch's merkle tree."""
+    with instrumentation.time_stage('issue', 'normalize_jsonld'):
+        return [
+            hash_byte_array(normalize_jsonld(cert, detect_unmapped_fields=False).encode('utf-8'))
+            for cert in unsigned_certs.values()
+        ]
+
+
+class Preflight(NamedTuple):
+    chain_id: int
+    balance: Optional[int]  # only read when the ledger's balance is stale
+    nonce: int
 
 
 class SimplifiedEthereumTransactionHandler:
-    """Class to handle anchoring to the Ethereum network."""
+    """
+    Class to handle anchoring to the Ethereum network.
+
+    Fees come from a FeeOracle according to the given urgency, never going above the given caps (the job's
+    `gas_price` and `gas_limit`), and are sent as EIP-1559 (type 2) transactions when the node supports them.
+    Calls go through the NodePool of the chain's nodes, see `providers`, and the maximum cost of every transaction
+    is reserved in the BalanceLedger until it's confirmed, see `ledger`.
+    """
 
     def __init__(
             self,
             chain: str,
             path_to_secret: str,
             private_key: str,
-            recommended_max_cost: int,
             account_from: str,
             account_to: str = '0xdeaDDeADDEaDdeaDdEAddEADDEAdDeadDEADDEaD',
-            max_retry=3
-
+            max_retry=3,
+            urgency: str = DEFAULT_URGENCY,
+            max_gas_price: int = None,
+            max_gas_limit: int = None,
+            hedge_delay: float = DEFAULT_HEDGE_DELAY,
+            broadcast_count: int = DEFAULT_BROADCAST_COUNT,
+            chain_id: int = None,
+            eth_node_url: str = None,
+            ledger: BalanceLedger = None,
+            signers: SignerRegistry = None,
     ):
         self.max_retry = max_retry
         self.account_from = account_from
         self.account_to = account_to
         self.path_to_secret = path_to_secret
+        self.urgency = urgency or DEFAULT_URGENCY
+        self.max_gas_price = max_gas_price
+        self.max_gas_limit = max_gas_limit
+
+        self.chain_id = chain_id or CHAIN_IDS[chain]
+        self.eth_node_url = eth_node_url or self._get_node_url(chain)
 
-        self.eth_node_url = self._get_node_url(chain)
-
-        self.web3 = Web3(Web3.HTTPProvider(self.eth_node_url))
-        assert self.web3.isConnected()
-
-        self._ensure_balance(recommended_max_cost)
-        self.private_key = private_key or self._read_private_key()
-
-    def issue_transaction(self, merkle_root: str, gas_price: int = 20000000000, gas_limit: int = 25000) -> str:
-        """Broadcast a transaction with the merkle root as data and return the transaction id."""
-        for i in range(self.max_retry):
-            signed_tx = self._get_signed_tx(merkle_root, gas_price, gas_limit, i)
-            try:
-                tx_hash = self.web3.eth.sendRawTransaction(signed_tx.rawTransaction)
-                tx_id = self.web3.toHex(tx_hash)
-                return tx_id
-            except Exception as e:
-                if i >= self.max_retry - 1:
-                    raise
-                continue
-
-    def _get_signed_tx(self, merkle_root: str, gas_price: int, gas_limit: int, try_count: int) -> AttributeDict:
-        """Prepare a raw transaction and sign it with the private key."""
-        nonce = self.web3.eth.getTransactionCount(self.account_from)
-        tx_info = {
+        self.web3 = Web3(PooledHTTPProvider(get_node_pool(self.eth_node_url, hedge_delay, broadcast_count)))
+        self.web3.middleware_onion.add(instrumentation.rpc_timing_middleware)
+
+        self.fee_oracle = FeeOracle(self.web3)
+        self.account = (ledger or get_balance_ledger()).account(self.chain_id, self.account_from)
+        self.nonces = get_nonce_manager(self.chain_id, self.account_from)
+        self.tx_id, self.tx_info, self.fees, self.reservation = None, None, None, None
+        self.signer = (signers or get_signer_registry()).get(private_key or self._read_private_key())
+
+    def issue_transaction(self, merkle_root: bytes) -> str:
+        """
+        Broadcast a transaction with the merkle root as data and return the transaction id.
+
+        The nonce comes from the account's NonceManager, so concurrent batches never sign for the same one. Failed
+        broadcasts are retried at the same nonce with bumped fees, so that a retry replaces the first attempt if it
+        did reach the mempool instead of queueing a second, paid transaction behind it. The last transaction sent is
+        kept in `tx_info`, `fees` and `tx_id` so that it can be tracked and replaced later on, and its maximum cost
+        stays reserved in `reservation` until it's settled.
+        """
+        with instrumentation.time_stage('issue', 'preflight'):
+            preflight = self._preflight(with_balance=self.account.stale)
+        if preflight.balance is not None:
+            self.account.refresh(preflight.balance)
+        fees = self.fee_oracle.estimate(merkle_root, self.urgency, self.max_gas_price, self.max_gas_limit)
+        reservation = self.account.reserve(fees.max_cost)
+        nonce = self.nonces.allocate(preflight.nonce)
+        try:
+            for i in range(self.max_retry):
+                if i:
+                    fees = fees.bumped(REPLACEMENT_FEE_BUMP)
+                    reservation.resize(fees.max_cost)
+                tx_info = self._get_tx_info(merkle_root, nonce, fees)
+                try:
+                    self.tx_id = self.send_transaction(tx_info)
+                    self.tx_info, self.fees, self.reservation = tx_info, fees, reservation
+                    return self.tx_id
+                except Exception:
+                    if i >= self.max_retry - 1:
+                        raise
+                    continue
+        except Exception:
+            reservation.release()
+            self.nonces.release(nonce)
+            raise
+
+    def send_transaction(self, tx_info: Dict) -> str:
+        """Sign the given transaction with the account's key, broadcast it and return its id."""
+        signed_tx = self.signer.sign_transaction(tx_info)
+        tx_hash = self.web3.eth.sendRawTransaction(signed_tx.rawTransaction)
+        return self.web3.toHex(tx_hash)
+
+    def _get_tx_info(self, merkle_root: bytes, nonce: int, fees: FeeEstimate) -> Dict:
+        """Prepare a raw transaction paying the given fees, signed for the expected chain."""
+        return {
             'nonce': nonce,
             'to': self.account_to,
             'value': 0,
-            'gas': gas_limit,
-            'gasPrice': gas_price,
             'data': merkle_root,
+            'chainId': self.chain_id,
+            **fees.tx_fields(),
         }
-        if try_count:
-            tx_info['nonce'] = tx_info['nonce'] + try_count
-            tx_info['gas'] = self._factor_in_new_try(tx_info['gas'], try_count)
-            tx_info['gasPrice'] = self._factor_in_new_try(tx_info['gasPrice'], try_count)
-        signed_tx = self.web3.eth.account.sign_transaction(tx_info, self.private_key)
-        return signed_tx
 
-    @staticmethod
-    def _factor_in_new_try(number, try_count) -> int:
-        """Increase the given number with 10% with each try."""
-        factor = float(f"1.{try_count}")
-        return int(number * factor)
+    def _preflight(self, with_balance: bool = True) -> 'Preflight':
+        """
+        Read the node's chain id, the account's pending nonce and (if asked to) its balance in a single JSON-RPC batch.
+
+        Fails if the node isn't on the expected chain, so that nothing gets signed for (or sent to) the wrong one.
+        """
+        with instrumentation.time_rpc('preflight_batch'):
+            results = self.web3.provider.request_batch(self._get_preflight_calls(with_balance))
+        return self._parse_preflight(results)
+
+    def _get_preflight_calls(self, with_balance: bool) -> List[Tuple[str, List]]:
+        calls = [('eth_chainId', []), ('eth_getTransactionCount', [self.account_from, 'pending'])]
+        if with_balance:
+            calls.append(('eth_getBalance', [self.account_from, 'latest']))
+        return calls
+
+    def _parse_preflight(self, results: List) -> 'Preflight':
+        """Turn the raw results of the preflight batch into a Preflight, failing if the node is on another chain."""
+        results = [to_int(result) for result in results]
+        chain_id, nonce, balance = results[0], results[1], results[2] if len(results) > 2 else None
+        if chain_id != self.chain_id:
+            raise UnexpectedChainError(f'The node is on chain {chain_id}, expected chain {self.chain_id}.')
+        return Preflight(chain_id, balance, nonce)
 
     def _read_private_key(self) -> str:
-        """Read private key from file."""
+        """Read private key from file, for setups still keeping it on disk instead of passing it."""
         with open(self.path_to_secret) as key_file:
             key = key_file.read().strip()
         return key
 
-    def _ensure_balance(self, recommended_max_cost) -> None:
-        """Make sure that the Ethereum account's balance is enough to cover the tx costs."""
-        assert self.web3.eth.getBalance(self.account_from) >= recommended_max_cost
-
     @staticmethod
     def _get_node_url(chain: str) -> str:
-        """Returns the url to a node for the chosen chain. It is possible to provide multiple values in the envvar."""
+        """Returns the url of the nodes for the chosen chain. Multiple comma-separated urls are pooled together."""
         if chain == 'mainnet':
-            return _get_random_from_csv(os.environ.get('ETH_NODE_URL_MAINNET'))
+            return os.environ.get('ETH_NODE_URL_MAINNET')
         elif chain == 'ropsten':
-            return _get_random_from_csv(os.environ.get('ETH_NODE_URL_ROPSTEN'))
+            return os.environ.get('ETH_NODE_URL_ROPSTEN')
@@ -64,7 +64,7 @@ class TestCertificateHandler(unittest.TestCase):
                 }
         return proof, proof_1, proof_2
 
-    def _helper_mock_call(self, *args):
+    def _helper_mock_call(self, *args, **kwargs):
         helper_mock = mock.MagicMock()
         helper_mock.__len__.return_value = self.directory_count
 
@@ -194,13 +194,12 @@ class TestCertificateHandler(unittest.TestCase):
 
         assert not mock_method.called
 
-    @mock.patch("builtins.open", create=True)
-    def test_add_proof(self,mock_open):
+    @mock.patch("cert_issuer.helpers.write_atomically")
+    def test_add_proof(self, mock_write):
         handler = CertificateV2Handler()
 
         cert_to_issue = {'kek':'kek'}
         proof = {'a': 'merkel'}
-        file_call = 'call().__enter__().write(\'{"kek": "kek", "signature": {"a": "merkel"}}\')'
 
         chain = mock.Mock()
         metadata = mock.Mock()
@@ -210,10 +209,7 @@ class TestCertificateHandler(unittest.TestCase):
         CertificateV2Handler, '_get_certificate_to_issue', return_value=cert_to_issue) as mock_method:
                 handler.add_proof(metadata, proof)
 
-        mock_open.assert_any_call('file_path.nfo','w')
-        calls = mock_open.mock_calls
-        call_strings = map(str, calls)
-        assert file_call in call_strings
+        mock_write.assert_called_once_with('file_path.nfo', '{"kek": "kek", "signature": {"a": "merkel"}}')
 
     def test_web_add_proof(self):
         handler = CertificateWebV2Handler()
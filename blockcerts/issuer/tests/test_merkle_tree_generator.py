@@ -3,7 +3,7 @@ import unittest
 from cert_core import Chain
 from pycoin.serialize import b2h
 
-from cert_issuer.merkle_tree_generator import MerkleTreeGenerator
+from cert_issuer.merkle_tree_generator import MerkleTreeGenerator, hash_byte_array
 
 
 def get_test_data_generator():
@@ -22,6 +22,12 @@ class TestMerkleTreeGenerator(unittest.TestCase):
         byte_array = merkle_tree_generator.get_blockchain_data()
         self.assertEqual(b2h(byte_array), '0932f1d2e98219f7d7452801e2b64ebd9e5c005539db12d9b1ddabe7834d9044')
 
+    def test_populate_hashes(self):
+        merkle_tree_generator = MerkleTreeGenerator()
+        merkle_tree_generator.populate_hashes(hash_byte_array(data) for data in get_test_data_generator())
+        byte_array = merkle_tree_generator.get_blockchain_data()
+        self.assertEqual(b2h(byte_array), '0932f1d2e98219f7d7452801e2b64ebd9e5c005539db12d9b1ddabe7834d9044')
+
     def test_proofs_bitcoin_mainnet(self):
         self.do_test_signature(Chain.bitcoin_mainnet, 'bitcoinMainnet', 'BTCOpReturn')
 
@@ -1,38 +1,51 @@
+import asyncio
 import copy
+import logging
+import uuid
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from attrdict import AttrDict
-from cert_core import to_certificate_model
-from cert_verifier.verifier import verify_certificate
-from web3 import Web3
-from web3.exceptions import TransactionNotFound
 
+from blockcerts.accounts import get_account_pool
 from blockcerts.const import HTML_DATE_FORMAT, PLACEHOLDER_RECIPIENT_NAME, PLACEHOLDER_RECIPIENT_EMAIL, \
     PLACEHOLDER_ISSUING_DATE, PLACEHOLDER_ISSUER_LOGO, PLACEHOLDER_ISSUER_SIGNATURE_FILE, PLACEHOLDER_EXPIRATION_DATE, \
     PLACEHOLDER_CERT_TITLE, PLACEHOLDER_CERT_DESCRIPTION, ETH_PRIVATE_KEY_PATH, ETH_PRIVATE_KEY_FILE_NAME, \
-    HTML_PLACEHOLDERS, RECIPIENT_NAME_KEY, RECIPIENT_EMAIL_KEY, RECIPIENT_ADDITIONAL_FIELDS_KEY, RECIPIENT_EXPIRES_KEY
-from blockcerts.issuer.cert_issuer.simple import SimplifiedCertificateBatchIssuer
-from blockcerts.tools.cert_tools.create_v2_certificate_template import create_certificate_template
-from blockcerts.tools.cert_tools.instantiate_v2_certificate_batch import create_unsigned_certificates_from_roster
+    HTML_PLACEHOLDERS, RECIPIENT_EXPIRES_KEY
+from blockcerts.issuer.cert_issuer.errors import InsufficientFundsError
+from blockcerts.models import Issuer, Template, Recipient, Job, JobConfig, ToolsConfig
+from blockcerts.store import get_certificate_store, JobExistsError, JOB_STATUS_FAILED, JOB_STATUS_CONFIRMED, \
+    CertificateStore
+from blockcerts.workers import run_cpu_bound
 from flaskapp.config import get_config
-from flaskapp.errors import ValidationError
+from flaskapp.errors import ValidationError, ObjectExists, InsufficientFunds, BroadcastBatchFailed
+from flaskapp.metrics import time_stage, rpc_timing_middleware, BATCH_SIZE
+from flaskapp.preload import lazy_import
 
+# Heavy modules, only imported on first use (or preloaded, see `flaskapp.preload`).
+cert_core = lazy_import('cert_core')
+verifier = lazy_import('cert_verifier.verifier')
+web3 = lazy_import('web3')
+web3_exceptions = lazy_import('web3.exceptions')
+async_simple = lazy_import('blockcerts.issuer.cert_issuer.async_simple')
+providers = lazy_import('blockcerts.issuer.cert_issuer.providers')
+simple = lazy_import('blockcerts.issuer.cert_issuer.simple')
+tracker = lazy_import('blockcerts.tracker')
+certificate_template = lazy_import('blockcerts.tools.cert_tools.create_v2_certificate_template')
+certificate_batch = lazy_import('blockcerts.tools.cert_tools.instantiate_v2_certificate_batch')
 
-def write_private_key_file(private_key: str) -> None:
-    """Write the given ETH Private Key to the default key file."""
-    with open(f"{ETH_PRIVATE_KEY_PATH}/{ETH_PRIVATE_KEY_FILE_NAME}", mode='w') as private_key_file:
-        private_key_file.write(private_key)
+log = logging.getLogger(__name__)
 
 
-def get_display_html_for_recipient(recipient: AttrDict, template: AttrDict, issuer: AttrDict) -> str:
+def get_display_html_for_recipient(recipient: Recipient, template: Template, issuer: Issuer) -> str:
     """Take the template's displayHtml and replace placeholders in it."""
-    expiration = recipient.get(RECIPIENT_ADDITIONAL_FIELDS_KEY, {}).get(RECIPIENT_EXPIRES_KEY) or template.get(
-        'expires_at') or 'None'
+    additional_fields = recipient.additional_fields or {}
+    expiration = additional_fields.get(RECIPIENT_EXPIRES_KEY) or template.expires_at or 'None'
     result = copy.deepcopy(template.display_html)
     replacements = [
-        (PLACEHOLDER_RECIPIENT_NAME, recipient.get(RECIPIENT_NAME_KEY)),
-        (PLACEHOLDER_RECIPIENT_EMAIL, recipient.get(RECIPIENT_EMAIL_KEY)),
+        (PLACEHOLDER_RECIPIENT_NAME, recipient.name),
+        (PLACEHOLDER_RECIPIENT_EMAIL, recipient.identity),
         (PLACEHOLDER_ISSUING_DATE, datetime.utcnow().strftime(HTML_DATE_FORMAT)),
         (PLACEHOLDER_ISSUER_LOGO, str(issuer.logo_file)),
         (PLACEHOLDER_ISSUER_SIGNATURE_FILE, issuer.signature_file),
@@ -40,56 +53,296 @@ def get_display_html_for_recipient(recipient: AttrDict, template: AttrDict, issu
         (PLACEHOLDER_CERT_TITLE, template.title),
         (PLACEHOLDER_CERT_DESCRIPTION, template.description),
     ]
-    for key in recipient.get(RECIPIENT_ADDITIONAL_FIELDS_KEY, {}).keys():
+    for key, value in additional_fields.items():
         if not key == RECIPIENT_EXPIRES_KEY:
-            replacements.append(
-                (f"%{key.upper()}%", recipient.get(RECIPIENT_ADDITIONAL_FIELDS_KEY, {}).get(key))
-            )
+            replacements.append((f"%{key.upper()}%", value))
     for key, value in replacements:
         if value:
             result = result.replace(key, value)
     return result
 
 
-def issue_certificate_batch(issuer_data: AttrDict, template_data: AttrDict, recipients_data: List,
-                            job_data: AttrDict) -> List:
-    """Issue a batch of certificates and return them as a list."""
+def issue_certificate_batch(issuer_data: Issuer, template_data: Template, recipients_data: List[Recipient],
+                            job_data: Job, job_id: str = None, fingerprint: str = None) -> List:
+    """
+    Issue a batch of certificates and return them as a list.
+
+    When the certificate store is enabled the signed certificates are also persisted under the given job id (a
+    random one if none is given) as their proofs are generated, along with the fingerprint of the issuing request.
+    """
+    with time_stage('issue', 'total'):
+        try:
+            return _issue_certificate_batch(issuer_data, template_data, recipients_data, job_data, job_id, fingerprint)
+        except InsufficientFundsError as e:
+            raise InsufficientFunds(key='eth_public_key', details=str(e))
+
+
+def _issue_certificate_batch(issuer_data: Issuer, template_data: Template, recipients_data: List[Recipient],
+                             job_data: Job, job_id: str = None, fingerprint: str = None) -> List:
+    BATCH_SIZE.observe(len(recipients_data))
+    job_config = get_job_config(job_data)
+    with issuing_account(job_data, job_config) as job_config:
+        return _issue_from_account(issuer_data, template_data, recipients_data, job_data, job_config, job_id,
+                                   fingerprint)
+
+
+def _issue_from_account(issuer_data: Issuer, template_data: Template, recipients_data: List[Recipient], job_data: Job,
+                        job_config: JobConfig, job_id: str = None, fingerprint: str = None) -> List:
+    """Issue the batch from the issuing account set in the given job config."""
+    issuer_config, unsigned_certs, leaf_hashes = prepare_batch(
+        issuer_data, template_data, recipients_data, job_data, job_config
+    )
+    simple_certificate_batch_issuer = simple.SimplifiedCertificateBatchIssuer(
+        issuer_config, unsigned_certs, leaf_hashes
+    )
+
+    store = get_certificate_store(job_config.get('cert_store_path'))
+    if not store:
+        try:
+            tx_id, signed_certs = simple_certificate_batch_issuer.issue()
+        except Exception as e:
+            # Without a store no job keeps the tx id, so retries are told not to issue (and pay for) the batch again.
+            if not simple_certificate_batch_issuer.tx_id:
+                raise
+            track_anchor(simple_certificate_batch_issuer, job_id)
+            raise broadcast_failed(simple_certificate_batch_issuer.tx_id, e) from e
+        track_anchor(simple_certificate_batch_issuer, job_id)
+        return tx_id, signed_certs
+
+    job_id = create_job(store, job_id, job_data, fingerprint)
+    writer = store.writer(job_id)
+    try:
+        tx_id, signed_certs = simple_certificate_batch_issuer.issue(on_signed=writer.add)
+        with time_stage('issue', 'store'):
+            writer.flush()
+    except Exception:
+        # A job failing after its broadcast keeps its tx id, so that it can't be issued (and paid for) again.
+        store.finish_job(job_id, simple_certificate_batch_issuer.tx_id, status=JOB_STATUS_FAILED)
+        if simple_certificate_batch_issuer.tx_id:
+            track_anchor(simple_certificate_batch_issuer, job_id)
+        raise
+    store.finish_job(job_id, tx_id)
+    track_anchor(simple_certificate_batch_issuer, job_id, store)
+    return tx_id, signed_certs
+
+
+async def issue_certificate_batch_async(issuer_data: Issuer, template_data: Template, recipients_data: List[Recipient],
+                                        job_data: Job, job_id: str = None, fingerprint: str = None) -> List:
+    """
+    Coroutine flavour of issue_certificate_batch, anchoring through the asyncio issuance core (see `async_simple`).
+
+    Building the certificates and their merkle tree is CPU-bound and runs in the loop's default executor. The anchor
+    is then followed until confirmed by an asyncio task (see track_anchor_async) rather than the tracker's thread.
+    """
+    with time_stage('issue', 'total'):
+        try:
+            return await _issue_certificate_batch_async(issuer_data, template_data, recipients_data, job_data, job_id,
+                                                        fingerprint)
+        except InsufficientFundsError as e:
+            raise InsufficientFunds(key='eth_public_key', details=str(e))
+
+
+async def _issue_certificate_batch_async(issuer_data: Issuer, template_data: Template, recipients_data: List[Recipient],
+                                         job_data: Job, job_id: str = None, fingerprint: str = None) -> List:
+    BATCH_SIZE.observe(len(recipients_data))
     job_config = get_job_config(job_data)
+    loop = asyncio.get_event_loop()
+    with issuing_account(job_data, job_config) as job_config:
+        issuer_config, unsigned_certs, leaf_hashes = await loop.run_in_executor(
+            None, prepare_batch, issuer_data, template_data, recipients_data, job_data, job_config
+        )
+        batch_issuer = await async_simple.AsyncCertificateBatchIssuer.create(issuer_config, unsigned_certs, leaf_hashes)
+
+        store = get_certificate_store(job_config.get('cert_store_path'))
+        if not store:
+            try:
+                tx_id, signed_certs = await batch_issuer.issue_async()
+            except Exception as e:
+                if not batch_issuer.tx_id:
+                    raise
+                track_anchor_async(batch_issuer, job_id)
+                raise broadcast_failed(batch_issuer.tx_id, e) from e
+            track_anchor_async(batch_issuer, job_id)
+            return tx_id, signed_certs
+
+        job_id = create_job(store, job_id, job_data, fingerprint)
+        writer = store.writer(job_id)
+        try:
+            tx_id, signed_certs = await batch_issuer.issue_async(on_signed=writer.add)
+            with time_stage('issue', 'store'):
+                writer.flush()
+        except Exception:
+            # As in _issue_from_account, a job failing after its broadcast keeps its tx id.
+            store.finish_job(job_id, batch_issuer.tx_id, status=JOB_STATUS_FAILED)
+            if batch_issuer.tx_id:
+                track_anchor_async(batch_issuer, job_id)
+            raise
+        store.finish_job(job_id, tx_id)
+        track_anchor_async(batch_issuer, job_id, store)
+        return tx_id, signed_certs
+
+
+@contextmanager
+def issuing_account(job_data: Job, job_config: JobConfig):
+    """
+    Yield the given job config with the issuing account of the batch set: the job's own one if it provides it,
+    otherwise the least loaded configured one, counted in the account pool's load until the batch is done.
+    """
+    if has_job_account(job_data):
+        yield job_config
+        return
+    with get_account_pool().acquire(get_chain_id(job_config, job_data.blockchain)) as account:
+        yield job_config.replace(
+            eth_public_key=account.public_key,
+            eth_private_key=account.private_key,
+            eth_key_created_at=account.created_at,
+        )
+
+
+def prepare_batch(issuer_data: Issuer, template_data: Template, recipients_data: List[Recipient], job_data: Job,
+                  job_config: JobConfig) -> Tuple[AttrDict, Dict, List[str]]:
+    """
+    Validate the job and return the issuer config of the batch, its unsigned certificates and their leaf hashes.
+
+    Instantiating and hashing the certificates runs in the CPU worker pool, see `blockcerts.workers`.
+    """
     ensure_valid_issuer_data(issuer_data)
     ensure_valid_template_data(template_data)
     tools_config = get_tools_config(issuer_data, template_data, job_config)
     issuer_config = get_issuer_config(job_data, job_config)
     recipients = format_recipients(recipients_data, template_data, issuer_data)
-    template = create_certificate_template(tools_config)
-    unsigned_certs = create_unsigned_certificates_from_roster(
-        template,
-        recipients,
-        False,
-        tools_config.additional_per_recipient_fields,
-        tools_config.hash_emails
+    unsigned_certs, leaf_hashes = run_cpu_bound(build_unsigned_batch, tools_config, recipients)
+    return issuer_config, unsigned_certs, leaf_hashes
+
+
+def build_unsigned_batch(tools_config: ToolsConfig, recipients: List[Recipient]) -> Tuple[Dict, List[str]]:
+    """Instantiate the unsigned certificates of a batch and hash them into the leaves of its merkle tree."""
+    with time_stage('issue', 'create_certificate_template'):
+        template = certificate_template.create_certificate_template(tools_config)
+    with time_stage('issue', 'create_unsigned_certificates_from_roster'):
+        unsigned_certs = certificate_batch.create_unsigned_certificates_from_roster(
+            template,
+            recipients,
+            False,
+            tools_config.additional_per_recipient_fields,
+            tools_config.hash_emails
+        )
+    return unsigned_certs, simple.hash_certificates(unsigned_certs)
+
+
+def broadcast_failed(tx_id: str, error: Exception) -> BroadcastBatchFailed:
+    """Return the error of a batch failing after its anchoring transaction was broadcast, see `flaskapp.idempotency`."""
+    return BroadcastBatchFailed(key='tx_id', details=f"Failed after broadcasting {tx_id}: {error}")
+
+
+def create_job(store: CertificateStore, job_id: Optional[str], job_data: Job, fingerprint: str = None) -> str:
+    """Create the job of the batch in the store (under a random id if none is given) and return its id."""
+    job_id = job_id or str(uuid.uuid4())
+    try:
+        store.create_job(job_id, job_data.blockchain, fingerprint)
+    except JobExistsError:
+        raise ObjectExists(key='job_id', details=f"Job '{job_id}' already exists.")
+    return job_id
+
+
+def track_anchor(batch_issuer: 'simple.SimplifiedCertificateBatchIssuer', job_id: str = None,
+                 store: CertificateStore = None) -> None:
+    """
+    Have the anchoring transaction of the given batch tracked until confirmed, updating its job if stored.
+
+    Without tracking, the funds reserved for the transaction are given back right away and the account's balance is
+    read from the chain again before its next batch.
+    """
+    handler = batch_issuer.transaction_handler
+    confirmation_tracker = tracker.get_confirmation_tracker()
+    if not confirmation_tracker:
+        if handler.reservation:
+            handler.reservation.settle()
+        return
+    callbacks = {}
+    if store:
+        callbacks = dict(
+            on_replaced=store.replace_tx,
+            on_confirmed=lambda job, tx_id: store.replace_tx(job, tx_id, tx_id, status=JOB_STATUS_CONFIRMED),
+            on_given_up=lambda job, tx_id: store.replace_tx(job, tx_id, tx_id, status=JOB_STATUS_FAILED),
+        )
+    confirmation_tracker.track(tracker.PendingAnchor.from_handler(job_id, handler, **callbacks))
+
+
+def track_anchor_async(batch_issuer: 'async_simple.AsyncCertificateBatchIssuer', job_id: str = None,
+                       store: CertificateStore = None) -> Optional[asyncio.Future]:
+    """
+    Follow the anchoring transaction of the given batch from an asyncio task until confirmed, updating its job if
+    stored. Return the task, or None if tracking is disabled (the reserved funds are then given back right away).
+
+    As with track_anchor, anchors without a store are never replaced, as their certificates couldn't follow.
+    """
+    handler = batch_issuer.transaction_handler
+    config = get_config()
+    if not config.get('TX_CONFIRMATIONS'):
+        if handler.reservation:
+            handler.reservation.settle()
+        return None
+    return asyncio.ensure_future(_confirm_anchor_async(handler, config, job_id, store))
+
+
+async def _confirm_anchor_async(handler: 'async_simple.AsyncEthereumTransactionHandler', config: Dict,
+                                job_id: str = None, store: CertificateStore = None) -> Optional[str]:
+    first_tx_id = handler.tx_id
+    try:
+        confirmed = await handler.confirm_async(
+            config.get('TX_CONFIRMATIONS'),
+            config.get('TX_CONFIRMATION_DEADLINE'),
+            config.get('TX_MAX_REPLACEMENTS') if store else 0,
+            config.get('TX_TRACKER_INTERVAL'),
+            config.get('TX_TRACKER_GIVE_UP') or None,
+        )
+    except Exception:
+        log.exception("Failed to confirm anchoring transaction %s of job '%s'.", handler.tx_id, job_id)
+        return None
+    if confirmed is None:
+        if store:
+            store.replace_tx(job_id, first_tx_id, first_tx_id, status=JOB_STATUS_FAILED)
+        return None
+    tx_id, _ = confirmed
+    if store:
+        store.replace_tx(job_id, first_tx_id, tx_id, status=JOB_STATUS_CONFIRMED)
+    log.info("Anchoring transaction %s of job '%s' confirmed.", tx_id, job_id)
+    return tx_id
+
+
+def has_job_account(job_data: Job) -> bool:
+    """Tell whether the job provides its own issuing account instead of using one of the configured ones."""
+    return bool(
+        job_data.get('eth_public_key') and job_data.get('eth_private_key') and job_data.get('eth_key_created_at')
     )
-    simple_certificate_batch_issuer = SimplifiedCertificateBatchIssuer(issuer_config, unsigned_certs)
-    tx_id, signed_certs = simple_certificate_batch_issuer.issue()
-    return tx_id, signed_certs
 
 
-def get_job_config(job_data: AttrDict) -> AttrDict:
+def get_job_config(job_data: Job) -> JobConfig:
     """Returns the overall config modified by inputs in the job section"""
     config = get_config()
-    config = AttrDict(dict((k.lower(), v) for k, v in config.items()))
-    if job_data.get('eth_public_key') and job_data.get('eth_private_key') and job_data.get('eth_key_created_at'):
-        config.eth_public_key = job_data.eth_public_key
-        config.eth_private_key = job_data.eth_private_key
-        config.eth_key_created_at = job_data.eth_key_created_at
-    return AttrDict(config)
-
-
-def get_tools_config(issuer: AttrDict, template: AttrDict, job_config: AttrDict) -> AttrDict:
-    if template.get('expires_at'):
-        template.additional_global_fields = template.additional_global_fields + (
-            {"path": "$.expires", "value": template.get('expires_at')},
+    if has_job_account(job_data):
+        return JobConfig(
+            config=config,
+            eth_public_key=job_data.eth_public_key,
+            eth_private_key=job_data.eth_private_key,
+            eth_key_created_at=job_data.eth_key_created_at,
         )
-    return AttrDict(
+    return JobConfig(
+        config=config,
+        eth_public_key=config.get('ETH_PUBLIC_KEY'),
+        eth_private_key=config.get('ETH_PRIVATE_KEY'),
+        eth_key_created_at=config.get('ETH_KEY_CREATED_AT'),
+    )
+
+
+def get_tools_config(issuer: Issuer, template: Template, job_config: JobConfig) -> ToolsConfig:
+    additional_global_fields = template.additional_global_fields
+    if template.expires_at:
+        additional_global_fields = list(additional_global_fields) + [
+            {"path": "$.expires", "value": template.expires_at},
+        ]
+    return ToolsConfig(
         no_files=True,
         issuer_logo_file=issuer.logo_file,
         cert_image_file=template.image,
@@ -104,17 +357,18 @@ def get_tools_config(issuer: AttrDict, template: AttrDict, job_config: AttrDict)
         hash_emails=False,
         revocation_list_uri=issuer.revocation_list,
         issuer_public_key=job_config.get('eth_public_key'),
-        badge_id=str(template.id),
+        # cert_tools would generate a badge id in place otherwise, which the immutable config can't take.
+        badge_id=str(template.id) if template.id else str(uuid.uuid4()),
         issuer_signature_lines=issuer.signature_lines,
         issuer_signature_file=issuer.signature_file,
-        additional_global_fields=template.additional_global_fields,
+        additional_global_fields=additional_global_fields,
         additional_per_recipient_fields=template.additional_per_recipient_fields,
         display_html=template.display_html,
         public_key_created_at=job_config.get('eth_key_created_at'),
     )
 
 
-def get_issuer_config(job: AttrDict, job_config: AttrDict) -> AttrDict:
+def get_issuer_config(job: Job, job_config: JobConfig) -> AttrDict:
     eth_public_key = job_config.get('eth_public_key').split(':')[1] if ":" in job_config.get(
         'eth_public_key') else job_config.get('eth_public_key')
     return AttrDict(
@@ -127,32 +381,54 @@ def get_issuer_config(job: AttrDict, job_config: AttrDict) -> AttrDict:
         blockchain_certificates_dir="",
         work_dir="",
         safe_mode=False,
-        gas_price=job.gas_price,
-        gas_limit=job.gas_limit,
+        gas_price=job.get('gas_price'),
+        gas_limit=job.get('gas_limit'),
+        urgency=job.get('urgency'),
+        eth_chain_id=get_chain_id(job_config, job.blockchain),
+        eth_node_url=job_config.get(f"eth_node_url_{job.blockchain.split('_')[-1]}"),
+        eth_node_hedge_delay=job_config.get('eth_node_hedge_delay'),
+        eth_node_broadcast_count=job_config.get('eth_node_broadcast_count'),
+        balance_refresh_interval=job_config.get('balance_refresh_interval'),
+        low_balance_threshold=job_config.get('low_balance_threshold'),
+        low_balance_webhook_url=job_config.get('low_balance_webhook_url'),
+        signer_cache_size=job_config.get('signer_cache_size'),
+        signer_cache_ttl=job_config.get('signer_cache_ttl'),
         api_token="",
     )
 
 
-def ensure_valid_issuer_data(issuer: AttrDict) -> None:
+def get_chain_id(job_config: JobConfig, blockchain: str) -> int:
+    """Return the id of the chain the given blockchain (e.g. ethereum_ropsten) anchors to."""
+    return job_config.get(f"eth_chain_id_{blockchain.split('_')[-1]}")
+
+
+def ensure_valid_issuer_data(issuer: Issuer) -> None:
     """Validate the issuer object has all needed properties."""
     if not issuer.logo_file:
         raise ValidationError('issuer needs a logo file before it is able to issue')
 
 
-def ensure_valid_template_data(template: AttrDict) -> None:
+def ensure_valid_template_data(template: Template) -> None:
     """Validate the template object has all needed properties."""
     if not template.image:
         raise ValidationError('template needs an image file before it can be used to issue')
 
 
-def format_recipients(recipients_data: List, template_data: AttrDict, issuer_data: AttrDict) -> List:
-    """Replace placeholders with the right data the given template uses them in display_html."""
-    if any(word in template_data.display_html for word in HTML_PLACEHOLDERS):
-        for recipient in recipients_data:
-            recipient[RECIPIENT_ADDITIONAL_FIELDS_KEY]['displayHtml'] = get_display_html_for_recipient(
-                recipient, template_data, issuer_data
-            )
-    return recipients_data
+def format_recipients(recipients_data: List[Recipient], template_data: Template,
+                      issuer_data: Issuer) -> List[Recipient]:
+    """
+    Replace placeholders with the right data the given template uses them in display_html, returning the recipients
+    with their own displayHtml.
+    """
+    if not any(word in template_data.display_html for word in HTML_PLACEHOLDERS):
+        return recipients_data
+    return [
+        recipient.replace(additional_fields=dict(
+            recipient.additional_fields,
+            displayHtml=get_display_html_for_recipient(recipient, template_data, issuer_data),
+        ))
+        for recipient in recipients_data
+    ]
 
 
 def get_tx_receipt(chain: str, tx_id: str) -> dict:
@@ -174,12 +450,14 @@ def get_tx_receipt(chain: str, tx_id: str) -> dict:
     if not provider:
         raise ValidationError(f"Node url for chain '{chain}' not found in config.")
 
-    web3 = Web3(Web3.HTTPProvider(provider))
-    assert web3.isConnected()
+    pool = providers.get_node_pool(provider, config.get('ETH_NODE_HEDGE_DELAY'), config.get('ETH_NODE_BROADCAST_COUNT'))
+    client = web3.Web3(providers.PooledHTTPProvider(pool))
+    client.middleware_onion.add(rpc_timing_middleware)
 
     try:
-        receipt = web3.eth.getTransactionReceipt(tx_id)
-    except TransactionNotFound:
+        with time_stage('tx_receipt', 'get_transaction_receipt'):
+            receipt = client.eth.getTransactionReceipt(tx_id)
+    except web3_exceptions.TransactionNotFound:
         return None
 
     return _safe_hex_attribute_dict(receipt)
@@ -199,10 +477,12 @@ def _safe_hex_attribute_dict(hex_attrdict: AttrDict) -> dict:
 def verify_cert(cert_json):
     """Run verification on the given cert, return a tuple with (overall_result, individual_results)"""
     config = get_config()
-    certificate_model = to_certificate_model(certificate_json=cert_json)
-    result = verify_certificate(
-        certificate_model,
-        dict(etherscan_api_token=config.get('ETHERSCAN_API_TOKEN', ''))
-    )
+    with time_stage('verify', 'to_certificate_model'):
+        certificate_model = cert_core.to_certificate_model(certificate_json=cert_json)
+    with time_stage('verify', 'verify_certificate'):
+        result = verifier.verify_certificate(
+            certificate_model,
+            dict(etherscan_api_token=config.get('ETHERSCAN_API_TOKEN', ''))
+        )
     all_steps_passed = all(d.get('status') == 'passed' for d in result)
     return all_steps_passed, result
@@ -0,0 +1,120 @@
+"""
+Compact, immutable models of the issuing request and of the configs derived from it.
+
+A batch of 100k recipients used to mean 100k AttrDicts, each holding a dict and wrapping every value it returns on
+attribute access. These models store their fields in `__slots__` instead: they're built once from the validated
+payload, read with plain attribute access, and never modified (use `replace` to get a changed copy). They still
+support `get` and item access like the dicts they replace, and can be pickled to the CPU worker processes.
+"""
+from typing import Any, Dict, Mapping
+
+
+class Model:
+    """Immutable record of a fixed set of fields, any of them left out being None."""
+
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values.pop(name, None))
+        if values:
+            raise TypeError(f"{type(self).__name__} has no field(s) {', '.join(sorted(values))}")
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> 'Model':
+        """Build the model from the matching keys of the given mapping, ignoring the others."""
+        return cls(**{name: data[name] for name in cls.__slots__ if name in data})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def replace(self, **changes) -> 'Model':
+        """Return a copy of the model with the given fields changed."""
+        return type(self)(**dict(self.to_dict(), **changes))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = getattr(self, key) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f'{type(self).__name__} is immutable, use replace()')
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f'{type(self).__name__} is immutable, use replace()')
+
+    def __eq__(self, other: Any) -> bool:
+        return type(other) is type(self) and other.to_dict() == self.to_dict()
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return _restore, (type(self), self.to_dict())
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+def _restore(cls: type, values: Dict[str, Any]) -> Model:
+    return cls(**values)
+
+
+class Issuer(Model):
+    __slots__ = ('name', 'main_url', 'id', 'email', 'logo_file', 'revocation_list', 'intro_url', 'signature_lines',
+                 'signature_file')
+
+
+class Template(Model):
+    __slots__ = ('id', 'title', 'description', 'criteria_narrative', 'image', 'additional_global_fields',
+                 'additional_per_recipient_fields', 'display_html', 'expires_at')
+
+
+class Recipient(Model):
+    __slots__ = ('name', 'identity', 'pubkey', 'additional_fields')
+
+
+class Job(Model):
+    __slots__ = ('blockchain', 'eth_public_key', 'eth_private_key', 'eth_key_created_at', 'gas_price', 'gas_limit',
+                 'urgency')
+
+
+class ToolsConfig(Model):
+    """Config of the cert_tools template and certificates of a batch, see `blockcerts.misc.get_tools_config`."""
+
+    __slots__ = ('no_files', 'issuer_logo_file', 'cert_image_file', 'issuer_url', 'issuer_intro_url', 'issuer_email',
+                 'issuer_name', 'issuer_id', 'certificate_description', 'certificate_title', 'criteria_narrative',
+                 'hash_emails', 'revocation_list_uri', 'issuer_public_key', 'badge_id', 'issuer_signature_lines',
+                 'issuer_signature_file', 'additional_global_fields', 'additional_per_recipient_fields',
+                 'display_html', 'public_key_created_at')
+
+
+class JobConfig(Model):
+    """
+    The app config as seen by a job: its keys lowercased, with the issuing account of the job on top.
+
+    Other keys are read from the app config when asked for rather than copied for every request.
+    """
+
+    __slots__ = ('config', 'eth_public_key', 'eth_private_key', 'eth_key_created_at')
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self.__slots__:
+            return super().get(key, default)
+        return self.config.get(key.upper(), default)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for the keys that aren't fields.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self.config[name.upper()]
+        except KeyError:
+            raise AttributeError(name)
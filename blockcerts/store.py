@@ -0,0 +1,205 @@
+"""
+Disk-backed store of issued certificates.
+
+Signed certificates are written to an embedded SQLite database as their proofs are generated, keyed by issuing job
+and certificate uid, so that clients can fetch them again (page by page) after the `/issue` response is gone.
+"""
+import json
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+JOB_STATUS_ISSUING = 'issuing'
+JOB_STATUS_ISSUED = 'issued'
+JOB_STATUS_FAILED = 'failed'
+JOB_STATUS_CONFIRMED = 'confirmed'
+JOB_FINISHED_STATUSES = (JOB_STATUS_ISSUED, JOB_STATUS_CONFIRMED)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+WRITE_BUFFER_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    chain TEXT,
+    tx_id TEXT,
+    certificate_count INTEGER NOT NULL DEFAULT 0,
+    fingerprint TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS certificates (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    uid TEXT NOT NULL,
+    certificate TEXT NOT NULL,
+    PRIMARY KEY (job_id, position),
+    UNIQUE (job_id, uid)
+);
+"""
+
+_stores = {}
+
+
+class JobExistsError(Exception):
+    pass
+
+
+class CertificateStore:
+    """Issued certificates and their issuing jobs, persisted in a SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Yield a connection that commits on success and is always closed (connections can't cross a fork)."""
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def create_job(self, job_id: str, chain: str, fingerprint: str = None) -> None:
+        """
+        Register a new job, optionally along with a fingerprint of the request that started it.
+
+        Ids of jobs that failed before anything was broadcast can be reused, any other existing id raises
+        JobExistsError: reissuing a job that failed after its transaction was sent would pay for a second anchor.
+        """
+        now = _now()
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute('SELECT status, tx_id FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+            if row and (row['status'] != JOB_STATUS_FAILED or row['tx_id']):
+                raise JobExistsError(job_id)
+            connection.execute('DELETE FROM certificates WHERE job_id = ?', (job_id,))
+            connection.execute(
+                'INSERT OR REPLACE INTO jobs (job_id, status, chain, fingerprint, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, JOB_STATUS_ISSUING, chain, fingerprint, now, now),
+            )
+
+    def finish_job(self, job_id: str, tx_id: Optional[str], status: str = JOB_STATUS_ISSUED) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE jobs SET status = ?, tx_id = ?, updated_at = ?, '
+                'certificate_count = (SELECT COUNT(*) FROM certificates WHERE job_id = ?) WHERE job_id = ?',
+                (status, tx_id, _now(), job_id, job_id),
+            )
+
+    def replace_tx(self, job_id: str, old_tx_id: str, new_tx_id: str, status: str = None) -> None:
+        """Point a job, and the anchors of its certificates, to the transaction that replaced the original one."""
+        with self._connect() as connection:
+            if old_tx_id != new_tx_id:
+                rows = connection.execute(
+                    'SELECT position, certificate FROM certificates WHERE job_id = ?', (job_id,)
+                ).fetchall()
+                connection.executemany(
+                    'UPDATE certificates SET certificate = ? WHERE job_id = ? AND position = ?',
+                    [
+                        (json.dumps(_replace_anchor(json.loads(row['certificate']), old_tx_id, new_tx_id)), job_id,
+                         row['position'])
+                        for row in rows
+                    ],
+                )
+            connection.execute(
+                'UPDATE jobs SET tx_id = ?, status = coalesce(?, status), updated_at = ? WHERE job_id = ?',
+                (new_tx_id, status, _now(), job_id),
+            )
+
+    def add_certificates(self, job_id: str, certificates: List[Tuple[int, str, Dict]]) -> None:
+        """Persist the given (position, uid, certificate) triples of a job in a single transaction."""
+        with self._connect() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO certificates (job_id, position, uid, certificate) VALUES (?, ?, ?, ?)',
+                [(job_id, position, uid, json.dumps(cert)) for position, uid, cert in certificates],
+            )
+
+    def writer(self, job_id: str) -> 'CertificateWriter':
+        return CertificateWriter(self, job_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as connection:
+            row = connection.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_certificate(self, job_id: str, uid: str) -> Optional[Dict]:
+        with self._connect() as connection:
+            row = connection.execute(
+                'SELECT certificate FROM certificates WHERE job_id = ? AND uid = ?', (job_id, uid)
+            ).fetchone()
+        return json.loads(row['certificate']) if row else None
+
+    def get_certificates(self, job_id: str, cursor: int = -1, limit: int = DEFAULT_PAGE_SIZE) -> Tuple[List, int]:
+        """
+        Return up to `limit` certificates of the given job placed after `cursor`, in issuing order.
+
+        :return: tuple with the certificates and the cursor to get the next page with, or None if there are no more.
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                'SELECT position, certificate FROM certificates WHERE job_id = ? AND position > ? '
+                'ORDER BY position LIMIT ?',
+                (job_id, cursor, limit + 1),
+            ).fetchall()
+        next_cursor = rows[limit - 1]['position'] if len(rows) > limit else None
+        return [json.loads(row['certificate']) for row in rows[:limit]], next_cursor
+
+    def iter_certificates(self, job_id: str, page_size: int = MAX_PAGE_SIZE) -> Iterator[Dict]:
+        """Yield all the certificates of the given job in issuing order, reading them page by page."""
+        cursor = -1
+        while cursor is not None:
+            certificates, cursor = self.get_certificates(job_id, cursor=cursor, limit=page_size)
+            yield from certificates
+
+
+class CertificateWriter:
+    """Buffer certificates of a job as they get signed and write them to the store in chunks."""
+
+    def __init__(self, store: CertificateStore, job_id: str, buffer_size: int = WRITE_BUFFER_SIZE):
+        self.store = store
+        self.job_id = job_id
+        self.buffer_size = buffer_size
+        self.position = 0
+        self.buffer = []
+
+    def add(self, uid: str, certificate: Dict) -> None:
+        self.buffer.append((self.position, uid, certificate))
+        self.position += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.store.add_certificates(self.job_id, self.buffer)
+            self.buffer = []
+
+
+def get_certificate_store(path: Optional[str]) -> Optional[CertificateStore]:
+    """Return the store kept at the given path, or None if no path is configured."""
+    if not path:
+        return None
+    if path not in _stores:
+        _stores[path] = CertificateStore(path)
+    return _stores[path]
+
+
+def _replace_anchor(certificate: Dict, old_tx_id: str, new_tx_id: str) -> Dict:
+    """Point the anchors of the given certificate's signature that refer to old_tx_id to new_tx_id instead."""
+    for anchor in certificate.get('signature', {}).get('anchors', []):
+        if anchor.get('sourceId') == old_tx_id:
+            anchor['sourceId'] = new_tx_id
+    return certificate
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
@@ -3,13 +3,20 @@
 '''
 Merges a certificate template with recipients defined in a roster file. The result is
 unsigned certificates that can be given to cert-issuer.
+
+The roster is streamed: recipients are read, instantiated and written out chunk_size at a
+time, optionally in worker processes, so memory use doesn't grow with the roster.
 '''
+import collections
 import copy
 import csv
 import hashlib
+import itertools
 import json
 import os
+import time
 import uuid
+from concurrent.futures import ProcessPoolExecutor
 
 import configargparse
 
@@ -69,10 +76,39 @@ def instantiate_recipient(cert, recipient, additional_fields, hash_emails):
                 'there are fields that are not expected by the additional_per_recipient_fields configuration')
 
 
+DEFAULT_CHUNK_SIZE = 1000
+PROGRESS_EVERY = 10000
+
+
+class Progress:
+    '''Prints how many certificates were instantiated so far, every `every` of them.'''
+
+    def __init__(self, every=PROGRESS_EVERY):
+        self.every = every
+        self.count = 0
+        self.start = time.time()
+        self.next_report = every
+
+    def update(self, count):
+        self.count += count
+        if self.count >= self.next_report:
+            self.report()
+            self.next_report = (self.count // self.every + 1) * self.every
+
+    def report(self):
+        elapsed = time.time() - self.start
+        rate = self.count / elapsed if elapsed else 0
+        print('Instantiated {0} certificates ({1:.0f}/s)'.format(self.count, rate))
+
+
 def create_unsigned_certificates_from_roster(template, recipients, use_identities, additionalFields, hash_emails):
-    issued_on = helpers.create_iso8601_tz()
+    return dict(iter_unsigned_certificates(template, recipients, use_identities, additionalFields, hash_emails))
+
+
+def iter_unsigned_certificates(template, recipients, use_identities, additional_fields, hash_emails, issued_on=None):
+    '''Yields the (uid, certificate) of every recipient, validated.'''
+    issued_on = issued_on or helpers.create_iso8601_tz()
 
-    certs = {}
     for recipient in recipients:
         if use_identities:
             uid = template['badge']['name'] + recipient.identity
@@ -83,21 +119,62 @@ def create_unsigned_certificates_from_roster(template, recipients, use_identitie
         cert = copy.deepcopy(template)
 
         instantiate_assertion(cert, uid, issued_on)
-        instantiate_recipient(cert, recipient, additionalFields, hash_emails)
+        instantiate_recipient(cert, recipient, additional_fields, hash_emails)
 
         # validate certificate before writing
         schema_validator.validate_v2(cert)
 
-        certs[uid] = cert
-    return certs
+        yield uid, cert
 
 
-def get_recipients_from_roster(config):
+def instantiate_chunk(recipients, template, use_identities, additional_fields, hash_emails, issued_on):
+    return list(iter_unsigned_certificates(template, recipients, use_identities, additional_fields, hash_emails,
+                                           issued_on))
+
+
+def iter_instantiated_chunks(template, recipients, use_identities, additional_fields, hash_emails,
+                             chunk_size=DEFAULT_CHUNK_SIZE, workers=0):
+    '''
+    Yields lists of (uid, certificate), chunk_size recipients at a time and in roster order.
+
+    With workers, chunks are instantiated in that many processes, with at most two chunks per
+    worker read ahead of the one being yielded.
+    '''
+    args = (template, use_identities, additional_fields, hash_emails, helpers.create_iso8601_tz())
+    chunks = chunked(recipients, chunk_size)
+    if not workers:
+        for chunk in chunks:
+            yield instantiate_chunk(chunk, *args)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(instantiate_chunk, chunk, *args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_recipients_from_roster(config):
     roster = os.path.join(config.abs_data_dir, config.roster)
     with open(roster, 'r') as theFile:
-        reader = csv.DictReader(theFile)
-        recipients = map(lambda x: Recipient(x), reader)
-        return list(recipients)
+        for fields in csv.DictReader(theFile):
+            yield Recipient(fields)
+
+
+def get_recipients_from_roster(config):
+    return list(iter_recipients_from_roster(config))
 
 
 def get_template(config):
@@ -107,21 +184,30 @@ def get_template(config):
         return json.loads(cert_str)
 
 
+def write_certificates(certs, output_dir, no_clobber):
+    for uid, cert in certs:
+        cert_file = os.path.join(output_dir, uid + '.json')
+        if os.path.isfile(cert_file) and no_clobber:
+            continue
+
+        with open(cert_file, 'w') as unsigned_cert:
+            json.dump(cert, unsigned_cert)
+
+
 def instantiate_batch(config):
-    recipients = get_recipients_from_roster(config)
+    recipients = iter_recipients_from_roster(config)
     template = get_template(config)
     use_identities = config.filename_format == "certname_identity"
-    certs = create_unsigned_certificates_from_roster(template, recipients, use_identities, config.additional_per_recipient_fields, config.hash_emails)
     output_dir = os.path.join(config.abs_data_dir, config.unsigned_certificates_dir)
     print('Writing certificates to ' + output_dir)
 
-    for uid in certs.keys():
-        cert_file = os.path.join(output_dir, uid + '.json')
-        if os.path.isfile(cert_file) and config.no_clobber:
-            continue
-
-        with open(cert_file, 'w') as unsigned_cert:
-            json.dump(certs[uid], unsigned_cert)
+    progress = Progress()
+    chunks = iter_instantiated_chunks(template, recipients, use_identities, config.additional_per_recipient_fields,
+                                      config.hash_emails, config.chunk_size or DEFAULT_CHUNK_SIZE, config.workers)
+    for certs in chunks:
+        write_certificates(certs, output_dir, config.no_clobber)
+        progress.update(len(certs))
+    progress.report()
 
 
 def get_config():
@@ -139,6 +225,8 @@ def get_config():
     p.add_argument('--roster', type=str, help='roster file name')
     p.add_argument('--filename_format', type=str, help='how to format certificate filenames (one of certname_identity or uuid)')
     p.add_argument('--no_clobber', action='store_true', help='whether to overwrite existing certificates')
+    p.add_argument('--chunk_size', type=int, default=DEFAULT_CHUNK_SIZE, help='number of recipients instantiated at a time')
+    p.add_argument('--workers', type=int, default=0, help='number of worker processes instantiating certificates (0 to instantiate them in this one)')
     args, _ = p.parse_known_args()
     args.abs_data_dir = os.path.abspath(os.path.join(cwd, args.data_dir))
 
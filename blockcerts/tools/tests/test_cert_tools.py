@@ -3,7 +3,9 @@ import os
 
 from cert_tools.create_v2_certificate_template import create_certificate_template
 from cert_tools.create_v2_issuer import generate_issuer, generate_issuer_file
-from cert_tools.instantiate_v2_certificate_batch import create_unsigned_certificates_from_roster
+from attrdict import AttrDict
+
+from cert_tools.instantiate_v2_certificate_batch import create_unsigned_certificates_from_roster, instantiate_batch
 
 
 def test_create_v2_certificate_template_no_files(config_no_files):
@@ -138,3 +140,34 @@ def test_create_v2_certificate_no_files(config_no_files, recipients):
     for id, cert in certs.items():
         for key in keys_to_check:
             assert cert[key] == template_no_files[key]
+
+
+def test_instantiate_batch_streams_roster(config_no_files, tmp_path):
+    template = create_certificate_template(config_no_files)
+    (tmp_path / 'template.json').write_text(json.dumps(template))
+    (tmp_path / 'roster.csv').write_text(
+        'name,pubkey,identity\n'
+        'Eularia Landroth,ecdsa-koblitz-pubkey:mtr98kany9G1XYNU74pRnfBQmaCg2FZLmc,eularia@landroth.org\n'
+        'Mcallister Greenborough,ecdsa-koblitz-pubkey:mkwntSiQmc14H65YxwckLenxY3DsEpvFbe,mcallister@greenborough.org\n'
+        'Lorem Ipsum,ecdsa-koblitz-pubkey:msBCHdwaQ7N2ypBYupkp6uNxtr9Pg76imj,lorem@ipsum.org\n'
+    )
+    os.mkdir(str(tmp_path / 'unsigned'))
+    config = AttrDict(
+        abs_data_dir=str(tmp_path),
+        roster='roster.csv',
+        template_dir='',
+        template_file_name='template.json',
+        unsigned_certificates_dir='unsigned',
+        filename_format='uuid',
+        additional_per_recipient_fields=None,
+        hash_emails=False,
+        no_clobber=False,
+        chunk_size=2,
+        workers=0,
+    )
+    instantiate_batch(config)
+    written = [json.loads(path.read_text()) for path in (tmp_path / 'unsigned').iterdir()]
+    assert sorted(cert['recipient']['identity'] for cert in written) == [
+        'eularia@landroth.org', 'lorem@ipsum.org', 'mcallister@greenborough.org'
+    ]
+    assert len({cert['issuedOn'] for cert in written}) == 1
@@ -0,0 +1,203 @@
+"""
+Background tracking of anchoring transactions until they're confirmed.
+
+Every anchoring transaction is watched until it is buried under the configured number of confirmations. If it isn't
+mined before the deadline, a replacement paying higher fees is broadcast at the same nonce (so only one of them can
+ever be mined), up to a maximum number of replacements and never beyond the job's gas price cap. Whichever attempt
+ends up mined is reported back, so that the job and its certificates point to the transaction that really holds the
+merkle root. Anchors whose certificates can't be updated that way (no certificate store) are never replaced, as the
+certificates returned to the client would point to a transaction that never gets mined. Anchors still not mined
+`give_up_after` seconds after their first broadcast (dropped, or stuck with no replacement left) stop being tracked:
+the funds reserved for them are given back, the account's nonces follow the node again (so that later transactions
+don't wait behind a dropped nonce) and their job is reported as failed.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from web3.exceptions import TransactionNotFound
+
+from blockcerts.issuer.cert_issuer.errors import InsufficientFundsError
+from blockcerts.issuer.cert_issuer.fees import FeeEstimate, REPLACEMENT_FEE_BUMP
+from blockcerts.issuer.cert_issuer.ledger import Reservation
+from blockcerts.issuer.cert_issuer.nonces import NonceManager
+from flaskapp.config import get_config
+
+log = logging.getLogger(__name__)
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+class PendingAnchor:
+    """An anchoring transaction waiting to be confirmed, along with the replacements sent for it."""
+
+    __slots__ = ('job_id', 'web3', 'send_transaction', 'tx_info', 'fees', 'max_gas_price', 'tx_ids', 'first_sent_at',
+                 'sent_at', 'reservation', 'nonces', 'on_replaced', 'on_confirmed', 'on_given_up')
+
+    def __init__(self, job_id: str, web3, send_transaction: Callable[[Dict], str], tx_info: Dict,
+                 fees: FeeEstimate, tx_id: str, max_gas_price: int = None, reservation: Reservation = None,
+                 nonces: NonceManager = None, on_replaced: Callable[[str, str, str], None] = None,
+                 on_confirmed: Callable[[str, str], None] = None, on_given_up: Callable[[str, str], None] = None):
+        """
+        :param on_replaced: called with the job id, the original and the mined tx ids when a replacement got mined.
+            Anchors without it are never replaced, as nothing would point their certificates to the replacement.
+        :param on_given_up: called with the job id and the last tx id when the anchor is given up on.
+        """
+        self.job_id = job_id
+        self.web3 = web3
+        self.send_transaction = send_transaction
+        self.tx_info = tx_info
+        self.fees = fees
+        self.max_gas_price = max_gas_price
+        self.tx_ids = [tx_id]
+        self.first_sent_at = self.sent_at = time.monotonic()
+        self.reservation = reservation
+        self.nonces = nonces
+        self.on_replaced = on_replaced
+        self.on_confirmed = on_confirmed
+        self.on_given_up = on_given_up
+
+    @classmethod
+    def from_handler(cls, job_id: str, handler, **callbacks) -> 'PendingAnchor':
+        """Track the last transaction sent by the given SimplifiedEthereumTransactionHandler."""
+        return cls(job_id, handler.web3, handler.send_transaction, handler.tx_info, handler.fees, handler.tx_id,
+                   handler.max_gas_price, handler.reservation, handler.nonces, **callbacks)
+
+    @property
+    def tx_id(self) -> str:
+        return self.tx_ids[-1]
+
+
+class ConfirmationTracker:
+    """Watch pending anchors from a background thread, replacing those stuck for longer than the deadline."""
+
+    def __init__(self, confirmations: int, deadline: float, max_replacements: int, interval: float,
+                 give_up_after: float = None):
+        """
+        :param give_up_after: seconds after which anchors still not mined are dropped, None to track them forever.
+        """
+        self.confirmations = confirmations
+        self.deadline = deadline
+        self.max_replacements = max_replacements
+        self.interval = interval
+        self.give_up_after = give_up_after
+        self.pending = []  # type: List[PendingAnchor]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def track(self, anchor: PendingAnchor) -> None:
+        with self._lock:
+            self.pending.append(anchor)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='confirmation-tracker', daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def poll(self) -> None:
+        """Check every pending anchor once."""
+        with self._lock:
+            pending = list(self.pending)
+        for anchor in pending:
+            try:
+                done = self._check(anchor)
+            except Exception:
+                log.exception("Failed to check anchoring transaction %s of job '%s'.", anchor.tx_id, anchor.job_id)
+                continue
+            if done:
+                with self._lock:
+                    self.pending.remove(anchor)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def _check(self, anchor: PendingAnchor) -> bool:
+        """Confirm, replace or keep waiting for the given anchor. Return whether it needs no more tracking."""
+        mined_tx_id, receipt = self._get_mined(anchor)
+        if receipt is not None:
+            depth = anchor.web3.eth.blockNumber - receipt['blockNumber'] + 1
+            if depth < self.confirmations:
+                return False
+            if anchor.reservation:
+                anchor.reservation.settle(anchor.web3.eth.getBalance(anchor.reservation.account.address))
+            if mined_tx_id != anchor.tx_ids[0] and anchor.on_replaced:
+                anchor.on_replaced(anchor.job_id, anchor.tx_ids[0], mined_tx_id)
+            if anchor.on_confirmed:
+                anchor.on_confirmed(anchor.job_id, mined_tx_id)
+            log.info("Anchoring transaction %s of job '%s' confirmed.", mined_tx_id, anchor.job_id)
+            return True
+
+        now = time.monotonic()
+        if self.give_up_after is not None and now - anchor.first_sent_at > self.give_up_after:
+            if anchor.reservation:
+                anchor.reservation.settle()
+            if anchor.nonces:
+                anchor.nonces.resync()
+            if anchor.on_given_up:
+                anchor.on_given_up(anchor.job_id, anchor.tx_id)
+            log.warning("Gave up on anchoring transaction %s of job '%s', still not mined after %s seconds.",
+                        anchor.tx_id, anchor.job_id, self.give_up_after)
+            return True
+        if anchor.on_replaced and now - anchor.sent_at > self.deadline \
+                and len(anchor.tx_ids) <= self.max_replacements:
+            self._replace(anchor)
+        return False
+
+    @staticmethod
+    def _get_mined(anchor: PendingAnchor):
+        """Return the id and receipt of the attempt that got mined, if any (newest attempts are likelier)."""
+        for tx_id in reversed(anchor.tx_ids):
+            try:
+                receipt = anchor.web3.eth.getTransactionReceipt(tx_id)
+            except TransactionNotFound:
+                continue
+            if receipt is not None and receipt.get('blockNumber') is not None:
+                return tx_id, receipt
+        return None, None
+
+    @staticmethod
+    def _replace(anchor: PendingAnchor) -> None:
+        """Broadcast the anchor again, at the same nonce, with bumped fees."""
+        fees = anchor.fees.bumped(REPLACEMENT_FEE_BUMP)
+        cap = anchor.max_gas_price
+        if cap and (fees.max_fee_per_gas or fees.gas_price) > cap:
+            log.warning("Anchoring transaction %s of job '%s' is stuck but its fees already reach the job's cap.",
+                        anchor.tx_id, anchor.job_id)
+            anchor.sent_at = time.monotonic()
+            return
+        if anchor.reservation:
+            try:
+                anchor.reservation.resize(fees.max_cost)
+            except InsufficientFundsError as e:
+                log.warning("Anchoring transaction %s of job '%s' is stuck but can't be replaced: %s", anchor.tx_id,
+                            anchor.job_id, e)
+                anchor.sent_at = time.monotonic()
+                return
+        tx_info = dict(anchor.tx_info, **fees.tx_fields())
+        tx_id = anchor.send_transaction(tx_info)
+        log.info("Replaced stuck anchoring transaction %s of job '%s' with %s.", anchor.tx_id, anchor.job_id, tx_id)
+        anchor.tx_info, anchor.fees, anchor.sent_at = tx_info, fees, time.monotonic()
+        anchor.tx_ids.append(tx_id)
+
+
+def get_confirmation_tracker() -> Optional[ConfirmationTracker]:
+    """Return the tracker of this process, or None if tracking is disabled (`TX_CONFIRMATIONS` set to 0)."""
+    global _tracker
+    config = get_config()
+    if not config.get('TX_CONFIRMATIONS'):
+        return None
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = ConfirmationTracker(
+                confirmations=config.get('TX_CONFIRMATIONS'),
+                deadline=config.get('TX_CONFIRMATION_DEADLINE'),
+                max_replacements=config.get('TX_MAX_REPLACEMENTS'),
+                interval=config.get('TX_TRACKER_INTERVAL'),
+                give_up_after=config.get('TX_TRACKER_GIVE_UP') or None,
+            )
+    return _tracker
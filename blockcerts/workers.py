@@ -0,0 +1,83 @@
+"""
+Pool of worker processes for the CPU-bound stages of issuance.
+
+uwsgi serves each of its processes' requests from up to 200 gevent greenlets, which only yield to each other on I/O.
+Instantiating certificates, normalizing them (`normalize_jsonld`) and hashing them for the merkle tree is pure-Python
+CPU work that would block the hub meanwhile, stalling every other request of the process (`/ping`, `/tx`, `/verify`)
+until a large batch is prepared. These stages run in a pool of `CPU_WORKERS` processes instead, while the request's
+greenlet waits for them cooperatively. At most `CPU_QUEUE_SIZE` batches wait for a free worker on top of the ones being
+prepared: further batches are turned away with a 503 rather than piling up. Setting `CPU_WORKERS` to 0 runs these
+stages inline, as do requests being profiled, so that their profile covers these stages too.
+"""
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+try:
+    from gevent import Greenlet, get_hub, getcurrent
+except ImportError:
+    Greenlet = None
+
+from flaskapp.config import get_config
+from flaskapp.errors import ServiceUnavailable
+from flaskapp.profiling import is_profiling
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class CpuWorkerPool:
+    """Run functions in worker processes, with a bounded number of calls waiting for a free worker."""
+
+    def __init__(self, max_workers: int, max_queued: int):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queued)
+
+    def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) in a worker process and return its result, failing right away if the queue is full."""
+        if not self._slots.acquire(blocking=False):
+            raise ServiceUnavailable(key='cpu_workers', details='Too many batches are being prepared, retry later.')
+        try:
+            return wait(self.executor.submit(fn, *args))
+        finally:
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown()
+
+
+def wait(future: Future) -> Any:
+    """Return the result of the given future, letting the other greenlets run meanwhile when called from one."""
+    return call_blocking(future.result)
+
+
+def call_blocking(fn: Callable, *args) -> Any:
+    """
+    Call a function blocking on threading primitives. From a greenlet, it's called from the hub's thread pool instead,
+    as it would otherwise block the whole process (threading isn't monkey-patched).
+    """
+    if Greenlet is not None and isinstance(getcurrent(), Greenlet):
+        return get_hub().threadpool.apply(fn, args)
+    return fn(*args)
+
+
+def run_cpu_bound(fn: Callable, *args) -> Any:
+    """Run fn(*args) in the CPU worker pool of this process, or inline if it's disabled or the request is profiled."""
+    pool = get_cpu_worker_pool()
+    if not pool or is_profiling():
+        return fn(*args)
+    return pool.run(fn, *args)
+
+
+def get_cpu_worker_pool() -> Optional[CpuWorkerPool]:
+    """Return the pool of this process, or None if CPU-bound stages run inline (`CPU_WORKERS` set to 0)."""
+    global _pool
+    config = get_config()
+    if not config.get('CPU_WORKERS'):
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = CpuWorkerPool(config.get('CPU_WORKERS'), config.get('CPU_QUEUE_SIZE'))
+    return _pool
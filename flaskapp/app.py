@@ -2,9 +2,12 @@ from typing import Dict
 
 from flask import Flask
 
-from blockcerts.misc import write_private_key_file
+from flaskapp.codec import register_json_codec
 from flaskapp.config import parse_config, set_config
 from flaskapp.errors import register_errors
+from flaskapp.metrics import register_metrics
+from flaskapp.preload import warm
+from flaskapp.profiling import register_profiling
 from flaskapp.routes import setup_routes
 
 
@@ -13,7 +16,11 @@ def create_app(config_data: Dict) -> Flask:
 
     app.config.update(parse_config(config_data))
     set_config(app.config)
+    register_json_codec(app)
     register_errors(app)
+    register_metrics()
+    register_profiling(app)
     setup_routes(app)
-    write_private_key_file(app.config.get('ETH_PRIVATE_KEY'))
+    if app.config.get('PRELOAD'):
+        warm()
     return app
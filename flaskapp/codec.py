@@ -0,0 +1,132 @@
+import re
+import time
+
+from flask import Flask
+from flask.json import JSONEncoder, JSONDecoder
+
+from flaskapp.metrics import JSON_CODEC_SECONDS
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+JSON_CODEC_AUTO = 'auto'
+JSON_CODEC_ORJSON = 'orjson'
+JSON_CODEC_STDLIB = 'stdlib'
+
+# orjson writes float exponents as `1e16` where the stdlib writes `1e+16` and turns NaN/Infinity into `null`, so any
+# output containing an exponent or a `null` is re-encoded by the stdlib to keep responses byte-compatible.
+_EXPONENT_FLOAT = re.compile(rb'(?:^|[\[:,])-?[0-9]+(?:\.[0-9]+)?[eE]')
+# orjson parses integers that don't fit in 64 bits as floats, the stdlib keeps them as ints.
+_BIG_INTEGER = re.compile(r'(?:^|[\[:,])\s*-?[0-9]{19,}')
+# The stdlib's `ensure_ascii` escapes everything outside of the printable ASCII range, DEL included.
+_NON_ASCII = re.compile('[\x7f-\U0010ffff]')
+_MISSING = object()
+
+
+def _escape_non_ascii(match) -> str:
+    """Escape a single non-ascii char exactly like `json.encoder.py_encode_basestring_ascii` does."""
+    code_point = ord(match.group(0))
+    if code_point > 0xffff:
+        code_point -= 0x10000
+        return '\\u{0:04x}\\u{1:04x}'.format(0xd800 | (code_point >> 10), 0xdc00 | (code_point & 0x3ff))
+    return '\\u{0:04x}'.format(code_point)
+
+
+class TimedJSONEncoder(JSONEncoder):
+    """Flask's JSON encoder, reporting encoding time to the metrics."""
+
+    def encode(self, o) -> str:
+        start = time.perf_counter()
+        encoded, backend = self._encode(o)
+        JSON_CODEC_SECONDS.labels('encode', backend).observe(time.perf_counter() - start)
+        return encoded
+
+    def _encode(self, o):
+        return super().encode(o), JSON_CODEC_STDLIB
+
+
+class FastJSONEncoder(TimedJSONEncoder):
+    """
+    Encode with orjson whenever the result is guaranteed to match the stdlib's byte by byte.
+
+    Only the compact representation used by `jsonify` outside of debug mode is accelerated, everything else (and
+    every payload orjson can't render identically) goes through the stdlib encoder.
+    """
+
+    def _encode(self, o):
+        encoded = self._orjson_encode(o)
+        if encoded is None:
+            return super()._encode(o)
+        return encoded, JSON_CODEC_ORJSON
+
+    def _orjson_encode(self, o):
+        if self.indent is not None or self.skipkeys or (self.item_separator, self.key_separator) != (',', ':'):
+            return None
+
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            encoded = orjson.dumps(o, default=self.default, option=option)
+        except orjson.JSONEncodeError:
+            return None
+        if b'null' in encoded or _EXPONENT_FLOAT.search(encoded):
+            return None
+
+        encoded = encoded.decode('utf-8')
+        if self.ensure_ascii and not encoded.isascii():
+            encoded = _NON_ASCII.sub(_escape_non_ascii, encoded)
+        return encoded
+
+
+class TimedJSONDecoder(JSONDecoder):
+    """Flask's JSON decoder, reporting decoding time to the metrics."""
+
+    def decode(self, s, *args, **kwargs):
+        start = time.perf_counter()
+        decoded, backend = self._decode(s, *args, **kwargs)
+        JSON_CODEC_SECONDS.labels('decode', backend).observe(time.perf_counter() - start)
+        return decoded
+
+    def _decode(self, s, *args, **kwargs):
+        return super().decode(s, *args, **kwargs), JSON_CODEC_STDLIB
+
+
+class FastJSONDecoder(TimedJSONDecoder):
+    """Decode with orjson, falling back to the stdlib for anything orjson would parse differently or reject."""
+
+    def _decode(self, s, *args, **kwargs):
+        decoded = self._orjson_decode(s)
+        if decoded is _MISSING:
+            return super()._decode(s, *args, **kwargs)
+        return decoded, JSON_CODEC_ORJSON
+
+    def _orjson_decode(self, s):
+        if self.object_hook or self.object_pairs_hook or self.parse_float is not float or self.parse_int is not int:
+            return _MISSING
+        if _BIG_INTEGER.search(s):
+            return _MISSING
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            return _MISSING
+
+
+def register_json_codec(app: Flask) -> None:
+    """Plug the JSON codec selected through the `JSON_CODEC` config var into the given app."""
+    codec = app.config.get('JSON_CODEC')
+    if codec == JSON_CODEC_AUTO:
+        codec = JSON_CODEC_ORJSON if orjson else JSON_CODEC_STDLIB
+
+    if codec == JSON_CODEC_ORJSON:
+        if not orjson:
+            raise RuntimeError("JSON_CODEC 'orjson' needs the orjson package to be installed.")
+        app.json_encoder = FastJSONEncoder
+        app.json_decoder = FastJSONDecoder
+    elif codec == JSON_CODEC_STDLIB:
+        app.json_encoder = TimedJSONEncoder
+        app.json_decoder = TimedJSONDecoder
+    else:
+        raise ValueError(f"Unknown JSON_CODEC '{codec}'.")
@@ -2,18 +2,50 @@ from typing import Dict
 
 from flask import Config
 
+from blockcerts.const import CERT_STORE_PATH, PROFILE_DIR
+
 # All config passed to `create_app()` is filtered through this list. That means that if you wish to
 # introduce a new config variable, you need to add it here, otherwise it will not be available. 
 # Each triple represents a config variable: (<name>, <type>, <default value>).
 CONFIG_VARS = [
     ('TESTING', bool, False),
     ('DEBUG', bool, False),
+    ('PRELOAD', bool, False),  # Import heavy modules when the app is created rather than on first use.
     ('ETH_PUBLIC_KEY', str, None),
     ('ETH_PRIVATE_KEY', str, None),
     ('ETH_KEY_CREATED_AT', str, None),
+    ('ETH_PUBLIC_KEYS', str, None),  # Additional issuing accounts, comma-separated.
+    ('ETH_PRIVATE_KEYS', str, None),
+    ('ETH_KEYS_CREATED_AT', str, None),  # Either one date per additional account or a single one for all of them.
     ('ETH_NODE_URL_ROPSTEN', str, None),
     ('ETH_NODE_URL_MAINNET', str, None),
+    ('SIGNER_CACHE_SIZE', int, 64),
+    ('SIGNER_CACHE_TTL', int, 60 * 60),
+    ('ETH_CHAIN_ID_ROPSTEN', int, 3),  # Nodes on any other chain are refused, override it for local test chains.
+    ('ETH_CHAIN_ID_MAINNET', int, 1),
+    ('ETH_NODE_HEDGE_DELAY', float, 0.3),  # Receipt and nonce reads are not hedged when set to 0.
+    ('ETH_NODE_BROADCAST_COUNT', int, 2),
     ('ETHERSCAN_API_TOKEN', str, None),
+    ('JSON_CODEC', str, 'auto'),
+    ('CERT_STORE_PATH', str, CERT_STORE_PATH),  # Set to an empty string to disable the certificate store.
+    ('IDEMPOTENCY_CACHE_SIZE', int, 32),
+    ('IDEMPOTENCY_TTL', int, 24 * 60 * 60),
+    ('IDEMPOTENCY_WAIT_TIMEOUT', float, 60.0),  # Seconds a duplicate waits for the original request before a 409.
+    ('PROFILE_TOKEN', str, None),  # Profiling and its admin endpoints are disabled unless a token is set.
+    ('PROFILE_SAMPLE_RATE', float, 0.0),
+    ('PROFILE_MODE', str, 'cprofile'),  # Either 'cprofile' or 'sampling'.
+    ('PROFILE_DIR', str, PROFILE_DIR),
+    ('PROFILE_MAX_FILES', int, 20),
+    ('BALANCE_REFRESH_INTERVAL', float, 60.0),
+    ('LOW_BALANCE_THRESHOLD', int, 0),  # In wei, low balance alerts are disabled when set to 0.
+    ('LOW_BALANCE_WEBHOOK_URL', str, None),
+    ('TX_CONFIRMATIONS', int, 3),  # Anchoring transactions are not tracked when set to 0.
+    ('TX_CONFIRMATION_DEADLINE', int, 180),
+    ('TX_MAX_REPLACEMENTS', int, 5),
+    ('TX_TRACKER_INTERVAL', float, 15.0),
+    ('TX_TRACKER_GIVE_UP', int, 24 * 60 * 60),  # Anchors are tracked until mined when set to 0.
+    ('CPU_WORKERS', int, 2),  # CPU-bound issuance stages run inline, in the request's worker, when set to 0.
+    ('CPU_QUEUE_SIZE', int, 8),
 ]
 
 _global_config = None
@@ -75,5 +75,21 @@ class ResourceNotFound(AppError):
     code = 404
 
 
+class InsufficientFunds(AppError):
+    code = 402
+
+
+class IdempotencyKeyReused(AppError):
+    code = 422
+
+
 class ServerError(AppError):
     code = 500
+
+
+class BroadcastBatchFailed(ServerError):
+    """A batch failed after its anchoring transaction was broadcast, so retrying it would pay for it again."""
+
+
+class ServiceUnavailable(AppError):
+    code = 503
@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from blockcerts.workers import call_blocking
+from flaskapp.config import get_config
+from flaskapp.errors import IdempotencyKeyReused, ObjectExists, BroadcastBatchFailed
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+DEFAULT_WAIT_TIMEOUT = 60.0
+
+_cache = None
+
+
+class _Entry:
+    __slots__ = ('fingerprint', 'done', 'result', 'error', 'finished_at')
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished_at = None
+
+
+class IdempotencyCache:
+    """
+    Bounded cache of in-flight and completed requests, keyed by their idempotency key.
+
+    The first request with a given key runs, concurrent duplicates wait for it and get its result (or its error) and
+    later duplicates get the stored result until it expires or gets evicted. Duplicates give up with a 409 if the first
+    request doesn't finish within `wait_timeout` seconds. Failed requests aren't kept, so they can be retried, unless
+    they failed after broadcasting their batch (BroadcastBatchFailed): duplicates then get that error, carrying the tx
+    id, rather than paying for the batch again. Only completed entries are ever evicted.
+    """
+
+    def __init__(self, max_size: int, ttl: float, wait_timeout: float = DEFAULT_WAIT_TIMEOUT):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def run(self, key: str, fingerprint: str, fn: Callable[[], Any]) -> Any:
+        """Run `fn` for the first request with the given key, return its result to every duplicate."""
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = _Entry(fingerprint)
+            elif entry.fingerprint != fingerprint:
+                raise IdempotencyKeyReused(
+                    key=key, details='This idempotency key was already used for a different request.'
+                )
+            else:
+                self._entries.move_to_end(key)
+
+        if not owner:
+            if not call_blocking(entry.done.wait, self.wait_timeout):
+                raise ObjectExists(key=IDEMPOTENCY_KEY_HEADER,
+                                   details='A request with this idempotency key is still running, retry later.')
+            if entry.error is not None:
+                raise entry.error
+            return entry.result
+
+        try:
+            entry.result = fn()
+        except Exception as e:
+            entry.error = e
+            if not isinstance(e, BroadcastBatchFailed):
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+            raise
+        finally:
+            entry.finished_at = time.monotonic()
+            entry.done.set()
+        return entry.result
+
+    def _evict(self) -> None:
+        """Drop expired entries, then the least recently used completed ones while over capacity."""
+        now = time.monotonic()
+        finished = [(key, entry) for key, entry in self._entries.items() if entry.finished_at is not None]
+        for key, entry in finished:
+            if now - entry.finished_at > self.ttl:
+                del self._entries[key]
+        for key, entry in finished:
+            if len(self._entries) < self.max_size:
+                break
+            self._entries.pop(key, None)
+
+
+def get_idempotency_cache() -> IdempotencyCache:
+    global _cache
+    if _cache is None:
+        config = get_config()
+        _cache = IdempotencyCache(
+            config.get('IDEMPOTENCY_CACHE_SIZE'), config.get('IDEMPOTENCY_TTL'), config.get('IDEMPOTENCY_WAIT_TIMEOUT')
+        )
+    return _cache
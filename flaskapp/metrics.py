@@ -0,0 +1,94 @@
+"""
+Prometheus metrics of the app.
+
+When `PROMETHEUS_MULTIPROC_DIR` is set (see uwsgi.ini) every worker writes its samples to that directory and
+`/metrics` aggregates them, so the endpoint reports the same numbers whichever worker serves it. Workers drop their
+live gauges' samples when they exit, so that the balances they last saw aren't reported anymore.
+"""
+import os
+from typing import Callable, Tuple
+
+from prometheus_client import Histogram, Gauge, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client import multiprocess
+
+from blockcerts.issuer.cert_issuer import instrumentation
+
+BATCH_SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+
+JSON_CODEC_SECONDS = Histogram(
+    'vce_json_codec_seconds',
+    'Time spent encoding and decoding JSON request/response bodies.',
+    ['operation', 'backend'],
+)
+
+STAGE_SECONDS = Histogram(
+    'vce_stage_seconds',
+    'Time spent in each stage of the issuing, verification and receipt pipelines.',
+    ['pipeline', 'stage'],
+)
+
+RPC_SECONDS = Histogram(
+    'vce_rpc_seconds',
+    'Latency of outbound Ethereum JSON-RPC calls.',
+    ['method'],
+)
+
+BATCH_SIZE = Histogram(
+    'vce_batch_size',
+    'Number of certificates per issued batch.',
+    buckets=BATCH_SIZE_BUCKETS,
+)
+
+ACCOUNT_BALANCE = Gauge(
+    'vce_account_balance_wei',
+    'Balance of each issuing account minus the maximum cost of its transactions in flight.',
+    ['chain_id', 'address'],
+    multiprocess_mode='livemin',
+)
+
+
+def time_stage(pipeline: str, stage: str):
+    """Return a context manager (or decorator) that observes the duration of the given pipeline stage."""
+    return STAGE_SECONDS.labels(pipeline, stage).time()
+
+
+def time_rpc(method: str):
+    """Return a context manager (or decorator) that observes the latency of a JSON-RPC call."""
+    return RPC_SECONDS.labels(method).time()
+
+
+def set_account_balance(chain_id: int, address: str, available: int) -> None:
+    ACCOUNT_BALANCE.labels(str(chain_id), address).set(available)
+
+
+def rpc_timing_middleware(make_request: Callable, web3) -> Callable:
+    """Web3 middleware observing the latency of every JSON-RPC call by method."""
+    def middleware(method, params):
+        with time_rpc(method):
+            return make_request(method, params)
+    return middleware
+
+
+def register_metrics() -> None:
+    """Have the issuer report to these metrics, and uwsgi workers clear their live samples when they exit."""
+    instrumentation.install(time_stage=time_stage, time_rpc=time_rpc, report_balance=set_account_balance)
+    if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        return
+    try:
+        import uwsgi
+    except ImportError:
+        return
+    uwsgi.atexit = _mark_process_dead
+
+
+def _mark_process_dead() -> None:
+    multiprocess.mark_process_dead(os.getpid())
+
+
+def generate_metrics() -> Tuple[bytes, str]:
+    """Return the current metrics in the Prometheus text format along with their content type."""
+    registry = REGISTRY
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,84 @@
+"""
+Lazy imports of the heavy dependencies, and their preloading.
+
+Importing web3, the cert_* packages and the issuance modules built on them takes most of the time needed to start the
+app. Modules using them import them through `lazy_import`, which only imports them when one of their attributes is
+first used, so tests and tools that don't issue or verify don't pay for them. Under uwsgi (`PRELOAD` set) they're all
+imported by `warm` in the master process instead, before it forks its workers: the workers then share these modules'
+memory copy-on-write rather than each importing them on their first request. Run `python -m flaskapp.preload` to get
+the import time of every lazily imported module.
+"""
+import gc
+import importlib
+import json
+import logging
+import sys
+import time
+from types import ModuleType
+from typing import Dict, List
+
+log = logging.getLogger(__name__)
+
+_lazy_modules = []  # type: List[str]
+
+
+class LazyModule:
+    """Stand-in for a module, importing it on first attribute access."""
+
+    __slots__ = ('__name__',)
+
+    def __init__(self, name: str):
+        self.__name__ = name
+
+    def __getattr__(self, attr: str):
+        # Always go through sys.modules, so that attributes patched on the real module are seen.
+        return getattr(importlib.import_module(self.__name__), attr)
+
+    def __repr__(self) -> str:
+        return f'<lazy module {self.__name__!r}>'
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return the given module, or a stand-in importing it on first use if it isn't imported yet."""
+    if name not in _lazy_modules:
+        _lazy_modules.append(name)
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def warm(freeze: bool = True) -> Dict[str, float]:
+    """
+    Import every lazily imported module and return the seconds each import took (0 for those already imported).
+
+    :param freeze: move everything allocated so far out of the garbage collector's reach (`gc.freeze`), so that
+        collections in forked workers don't write to, and thus copy, the memory they share with the master.
+    """
+    timings = {}
+    for name in list(_lazy_modules):
+        start = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = time.perf_counter() - start
+    log.info('Preloaded %s modules in %.2fs: %s', len(timings), sum(timings.values()),
+             ', '.join(f'{name} {seconds:.2f}s' for name, seconds in timings.items()))
+    if freeze:
+        gc.collect()
+        gc.freeze()
+    return timings
+
+
+def import_report() -> Dict:
+    """Create the app without preloading, then measure the import time of every lazily imported module."""
+    from flaskapp.app import create_app
+
+    start = time.perf_counter()
+    create_app({'PRELOAD': False})
+    app_seconds = time.perf_counter() - start
+    timings = warm(freeze=False)
+    return dict(
+        create_app_seconds=app_seconds,
+        preload_seconds=sum(timings.values()),
+        modules=dict(sorted(timings.items(), key=lambda item: -item[1])),
+    )
+
+
+if __name__ == '__main__':
+    print(json.dumps(import_report(), indent=4))
@@ -0,0 +1,234 @@
+"""
+On-demand request profiling.
+
+A request runs under a profiler when it carries the configured `PROFILE_TOKEN` in the `X-Profile-Token` header, or
+when `PROFILE_SAMPLE_RATE` picks it. `PROFILE_MODE` selects either the deterministic `cprofile` profiler (stored as
+a pstats dump) or a low-overhead `sampling` profiler (stored as collapsed stacks, as read by flamegraph.pl or
+speedscope). Profiles are kept in `PROFILE_DIR`, dropping the oldest ones beyond `PROFILE_MAX_FILES`, and can be
+listed and downloaded through the `/admin/profiles` endpoints, which require the same token.
+
+Both profilers hook a whole OS thread, which under gevent serves many greenlets. They only record the greenlet of the
+profiled request: the sampling profiler skips the samples taken while it's switched out, and the deterministic one is
+paused on every switch out of it (`GreenletProfile`).
+"""
+import cProfile
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+
+try:
+    import greenlet
+except ImportError:
+    greenlet = None
+
+from flask import Flask, g, has_request_context, jsonify, request, send_from_directory
+
+from flaskapp.config import get_config
+from flaskapp.errors import Unauthorized, ResourceNotFound
+
+PROFILE_TOKEN_HEADER = 'X-Profile-Token'
+PROFILE_NAME_HEADER = 'X-Profile-Name'
+PROFILE_MODE_CPROFILE = 'cprofile'
+PROFILE_MODE_SAMPLING = 'sampling'
+PROFILE_EXTENSIONS = {PROFILE_MODE_CPROFILE: 'prof', PROFILE_MODE_SAMPLING: 'txt'}
+SAMPLING_INTERVAL = 0.005
+
+# Only one profiler can be active per process, requests arriving while it is taken just aren't profiled.
+_profiling_lock = threading.Lock()
+
+
+class GreenletProfile(cProfile.Profile):
+    """
+    cProfile.Profile only recording the greenlet that enabled it, by pausing it whenever that greenlet switches out.
+
+    The calls in progress are closed when it's paused, so the functions waiting on I/O only get the cumulative time
+    spent before their first switch.
+    """
+    _greenlet = None
+    _previous_trace = None
+
+    def enable(self) -> None:
+        super().enable()
+        self._greenlet = greenlet.getcurrent() if greenlet else None
+        self._previous_trace = greenlet.settrace(self._trace) if greenlet else None
+
+    def disable(self) -> None:
+        if self._greenlet is not None:
+            greenlet.settrace(self._previous_trace)
+            self._greenlet = None
+        super().disable()
+
+    def _trace(self, event: str, args) -> None:
+        origin, target = args
+        try:
+            if origin is self._greenlet:
+                cProfile.Profile.disable(self)
+            elif target is self._greenlet:
+                cProfile.Profile.enable(self)
+        except ValueError:
+            # Another profiler took the hook meanwhile.
+            pass
+        if self._previous_trace is not None:
+            self._previous_trace(event, args)
+
+
+class SamplingProfiler:
+    """
+    Sample the stack of the thread that enabled it at a fixed interval and count the collapsed stacks, leaving out the
+    samples taken while another greenlet than the one that enabled it is running.
+    """
+
+    def __init__(self, interval: float = SAMPLING_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_id = None
+        self._greenlet = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def enable(self) -> None:
+        self._thread_id = threading.get_ident()
+        self._greenlet = greenlet.getcurrent() if greenlet else None
+        self._sampler = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self._sampler.start()
+
+    def disable(self) -> None:
+        self._stop.set()
+        self._sampler.join()
+
+    def dump_stats(self, path: str) -> None:
+        with open(path, mode='w') as profile_file:
+            for stack, count in self.stacks.most_common():
+                profile_file.write(f'{stack} {count}\n')
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            if self._greenlet is not None and self._greenlet.gr_frame is not None:
+                # Only a switched out greenlet keeps its frame: the thread is running another one.
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+
+def register_profiling(app: Flask) -> None:
+    @app.before_request
+    def start_profiling():
+        if request.endpoint in ('list_profiles', 'download_profile') or not _should_profile():
+            return
+        if not _profiling_lock.acquire(blocking=False):
+            return
+        mode = get_config().get('PROFILE_MODE')
+        profiler = SamplingProfiler() if mode == PROFILE_MODE_SAMPLING else GreenletProfile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (e.g. a coverage tool) already owns the profiling hook.
+            _profiling_lock.release()
+            return
+        g.profiler = profiler
+        g.profile_mode = mode if mode in PROFILE_EXTENSIONS else PROFILE_MODE_CPROFILE
+
+    @app.after_request
+    def stop_profiling(response):
+        name = _finish_profiling()
+        if name:
+            response.headers[PROFILE_NAME_HEADER] = name
+        return response
+
+    @app.teardown_request
+    def discard_profiling(error):
+        _finish_profiling()
+
+    @app.route('/admin/profiles', methods=['GET'])
+    def list_profiles():
+        _ensure_authorized()
+        return jsonify(dict(profiles=_list_profiles()))
+
+    @app.route('/admin/profiles/<name>', methods=['GET'])
+    def download_profile(name):
+        _ensure_authorized()
+        if name not in {profile['name'] for profile in _list_profiles()}:
+            raise ResourceNotFound(key='name', details=f"Profile '{name}' not found.")
+        return send_from_directory(get_config().get('PROFILE_DIR'), name, as_attachment=True)
+
+
+def is_profiling() -> bool:
+    """Tell whether the current request runs under a profiler."""
+    return has_request_context() and g.get('profiler') is not None
+
+
+def _is_authorized() -> bool:
+    token = get_config().get('PROFILE_TOKEN')
+    given = request.headers.get(PROFILE_TOKEN_HEADER)
+    return bool(token and given) and hmac.compare_digest(token.encode(), given.encode())
+
+
+def _ensure_authorized() -> None:
+    if not get_config().get('PROFILE_TOKEN'):
+        raise ResourceNotFound(details='Profiling is disabled.')
+    if not _is_authorized():
+        raise Unauthorized(key=PROFILE_TOKEN_HEADER, details='A valid profiling token is required.')
+
+
+def _should_profile() -> bool:
+    if _is_authorized():
+        return True
+    sample_rate = get_config().get('PROFILE_SAMPLE_RATE') or 0
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def _finish_profiling() -> Optional[str]:
+    """Stop the profiler of the current request if there's one, store its profile and return the profile's name."""
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return None
+    try:
+        profiler.disable()
+        return _store_profile(profiler, g.profile_mode)
+    finally:
+        _profiling_lock.release()
+
+
+def _store_profile(profiler, mode: str) -> str:
+    """Write the given profile to the profiles dir and drop the oldest profiles beyond the configured maximum."""
+    config = get_config()
+    profile_dir = config.get('PROFILE_DIR')
+    os.makedirs(profile_dir, exist_ok=True)
+    endpoint = (request.endpoint or 'unknown').replace('.', '_')
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}-{endpoint}.{PROFILE_EXTENSIONS[mode]}"
+    path = os.path.join(profile_dir, name)
+    profiler.dump_stats(f'{path}.tmp')
+    os.replace(f'{path}.tmp', path)
+
+    for profile in _list_profiles()[config.get('PROFILE_MAX_FILES'):]:
+        try:
+            os.remove(os.path.join(profile_dir, profile['name']))
+        except FileNotFoundError:
+            pass
+    return name
+
+
+def _list_profiles() -> List[Dict]:
+    """Return the stored profiles, newest first."""
+    profile_dir = get_config().get('PROFILE_DIR')
+    if not os.path.isdir(profile_dir):
+        return []
+    profiles = []
+    for entry in os.scandir(profile_dir):
+        extension = entry.name.rsplit('.', 1)[-1]
+        if entry.is_file() and extension in PROFILE_EXTENSIONS.values():
+            stat = entry.stat()
+            profiles.append(dict(name=entry.name, size=stat.st_size, created_at=stat.st_mtime))
+    return sorted(profiles, key=lambda profile: (profile['created_at'], profile['name']), reverse=True)
@@ -1,10 +1,33 @@
-from attrdict import AttrDict
-from flask import jsonify, request
-from voluptuous import Schema, REMOVE_EXTRA
+import hashlib
+import json
+import uuid
 
-from blockcerts.const import ISSUER_SCHEMA, TEMPLATE_SCHEMA, RECIPIENT_SCHEMA, JOB_SCHEMA
+from flask import jsonify, request, Response
+from voluptuous import Schema, REMOVE_EXTRA, Coerce, Range, Optional, All
+
+from blockcerts.accounts import get_account_pool
+from blockcerts.compact import compact_batch
+from blockcerts.const import ISSUING_JOB_SCHEMA, COMPACT_RESPONSE_FORMAT
 from blockcerts.misc import issue_certificate_batch, get_tx_receipt, verify_cert
+from blockcerts.models import Issuer, Template, Recipient, Job
+from blockcerts.store import get_certificate_store, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, JOB_FINISHED_STATUSES, \
+    JOB_STATUS_FAILED
 from flaskapp.config import get_config
+from flaskapp.errors import ResourceNotFound, ObjectExists, IdempotencyKeyReused
+from flaskapp.idempotency import get_idempotency_cache, IDEMPOTENCY_KEY_HEADER
+from flaskapp.metrics import generate_metrics
+
+IDEMPOTENT_JOB_NAMESPACE = uuid.UUID('6f1f2a4e-3c55-4b0c-9a39-2d1b1c0c7e21')
+
+CERTIFICATES_PAGE_SCHEMA = Schema(
+    {
+        Optional('limit', default=DEFAULT_PAGE_SIZE): All(Coerce(int), Range(min=1, max=MAX_PAGE_SIZE)),
+        Optional('cursor'): All(Coerce(int), Range(min=-1)),
+        Optional('page'): All(Coerce(int), Range(min=1)),
+        Optional('format'): str,
+    },
+    extra=REMOVE_EXTRA,
+)
 
 
 def setup_routes(app):
@@ -14,35 +37,63 @@ def setup_routes(app):
 
     @app.route('/issue', methods=['POST'])
     def issue_certs():
-        issuing_job_schema = Schema(
-            {
-                'issuer': ISSUER_SCHEMA,
-                'template': TEMPLATE_SCHEMA,
-                'recipients': RECIPIENT_SCHEMA,
-                'job': JOB_SCHEMA,
-            },
-            required=True,
-            extra=REMOVE_EXTRA,
-        )
-        payload = issuing_job_schema(request.get_json())
-        tx_id, signed_certs = issue_certificate_batch(
-            AttrDict(payload['issuer']),
-            AttrDict(payload['template']),
-            [AttrDict(rec) for rec in payload['recipients']],
-            AttrDict(payload['job']),
-        )
+        payload = ISSUING_JOB_SCHEMA(request.get_json())
+        idempotency_key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        fingerprint = get_fingerprint(payload) if idempotency_key else None
+        job_id = payload['job'].pop('job_id', None)
+        if idempotency_key:
+            job_id = job_id or str(uuid.uuid5(IDEMPOTENT_JOB_NAMESPACE, idempotency_key))
+            job_id, tx_id, signed_certificates = get_idempotency_cache().run(
+                idempotency_key, fingerprint, lambda: _issue_once(payload, job_id, fingerprint)
+            )
+        else:
+            job_id, tx_id, signed_certificates = _issue(payload, job_id or str(uuid.uuid4()))
+        if request.args.get('format') == COMPACT_RESPONSE_FORMAT:
+            signed_certificates = compact_batch(signed_certificates)
         return jsonify(dict(
+            job_id=job_id,
             tx_id=tx_id,
-            signed_certificates=list(signed_certs.values())
+            signed_certificates=signed_certificates
         ))
 
+    @app.route('/jobs/<job_id>', methods=['GET'])
+    def issuing_job(job_id):
+        return jsonify(_get_stored_job(job_id))
+
+    @app.route('/jobs/<job_id>/certificates', methods=['GET'])
+    def issued_certificates(job_id):
+        """Page through the certificates of a job, either with `page` numbers or with the returned `next_cursor`."""
+        _get_stored_job(job_id)
+        args = CERTIFICATES_PAGE_SCHEMA(request.args.to_dict())
+        limit = args['limit']
+        cursor = (args['page'] - 1) * limit - 1 if 'page' in args else args.get('cursor', -1)
+        certificates, next_cursor = _get_store().get_certificates(job_id, cursor=cursor, limit=limit)
+        if args.get('format') == COMPACT_RESPONSE_FORMAT:
+            certificates = compact_batch(certificates)
+        return jsonify(dict(
+            job_id=job_id,
+            certificates=certificates,
+            next_cursor=next_cursor,
+        ))
+
+    @app.route('/jobs/<job_id>/certificates/<uid>', methods=['GET'])
+    def issued_certificate(job_id, uid):
+        _get_stored_job(job_id)
+        certificate = _get_store().get_certificate(job_id, uid)
+        if not certificate:
+            raise ResourceNotFound(key='uid', details=f"Certificate '{uid}' not found in job '{job_id}'.")
+        return jsonify(certificate)
+
     @app.route('/config', methods=['GET'])
     def public_config():
         config = get_config()
+        accounts = get_account_pool().accounts
         return jsonify(
             dict(
                 ETH_PUBLIC_KEY=config.get('ETH_PUBLIC_KEY'),
                 ETH_KEY_CREATED_AT=config.get('ETH_KEY_CREATED_AT'),
+                ETH_PUBLIC_KEYS=[account.public_key for account in accounts],
+                ETH_KEYS_CREATED_AT=[account.created_at for account in accounts],
             )
         )
 
@@ -53,6 +104,11 @@ def setup_routes(app):
             return jsonify(dict(receipt)), 200
         return f"Tx '{tx_id}' not found in chain '{chain}'.", 404
 
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        data, content_type = generate_metrics()
+        return Response(data, content_type=content_type)
+
     @app.route('/verify', methods=['POST'])
     def verify():
         payload = request.get_json()
@@ -61,3 +117,52 @@ def setup_routes(app):
             verified=results[0],
             steps=results[1]
         ))
+
+
+def _issue(payload: dict, job_id: str, fingerprint: str = None) -> tuple:
+    tx_id, signed_certs = issue_certificate_batch(
+        Issuer.from_dict(payload['issuer']),
+        Template.from_dict(payload['template']),
+        [Recipient.from_dict(recipient) for recipient in payload['recipients']],
+        Job.from_dict(payload['job']),
+        job_id=job_id,
+        fingerprint=fingerprint,
+    )
+    return job_id, tx_id, list(signed_certs.values())
+
+
+def _issue_once(payload: dict, job_id: str, fingerprint: str) -> tuple:
+    """
+    Issue the given batch unless a job started by the same request is already stored.
+
+    This covers duplicates the in-memory cache can't see: those handled by other workers or arriving after a restart.
+    """
+    store = _get_store()
+    job = store.get_job(job_id) if store else None
+    if job and job['fingerprint'] != fingerprint:
+        raise IdempotencyKeyReused(key='job_id', details=f"Job '{job_id}' was started by a different request.")
+    if job and job['status'] in JOB_FINISHED_STATUSES:
+        return job_id, job['tx_id'], list(store.iter_certificates(job_id))
+    if job and job['status'] != JOB_STATUS_FAILED:
+        raise ObjectExists(key='job_id', details=f"Job '{job_id}' is still being issued, see /jobs/{job_id}.")
+    if job and job['tx_id']:
+        raise ObjectExists(key='job_id', details=f"Job '{job_id}' failed after broadcasting {job['tx_id']}.")
+    return _issue(payload, job_id, fingerprint)
+
+
+def get_fingerprint(payload: dict) -> str:
+    """Hash the validated payload, so that requests only differing in formatting, key order or extra keys match."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def _get_store():
+    return get_certificate_store(get_config().get('CERT_STORE_PATH'))
+
+
+def _get_stored_job(job_id: str) -> dict:
+    """Return the stored job with the given id or fail with a 404."""
+    store = _get_store()
+    job = store.get_job(job_id) if store else None
+    if not job:
+        raise ResourceNotFound(key='job_id', details=f"Job '{job_id}' not found.")
+    return job
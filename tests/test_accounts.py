@@ -0,0 +1,59 @@
+import pytest
+
+from blockcerts.accounts import AccountPool, IssuingAccount, parse_accounts
+from blockcerts.issuer.cert_issuer.ledger import BalanceLedger
+from flaskapp.errors import ValidationError
+
+
+def make_account(i: int) -> IssuingAccount:
+    return IssuingAccount(f'ecdsa-koblitz-pubkey:0x{i:040x}', f'0x{i:064x}', '2019-01-01T00:00:00.000000+00:00')
+
+
+def test_parse_accounts():
+    accounts = parse_accounts({
+        'ETH_PUBLIC_KEY': 'ecdsa-koblitz-pubkey:0xa',
+        'ETH_PRIVATE_KEY': '0x1',
+        'ETH_KEY_CREATED_AT': 'then',
+        'ETH_PUBLIC_KEYS': 'ecdsa-koblitz-pubkey:0xb, ecdsa-koblitz-pubkey:0xc',
+        'ETH_PRIVATE_KEYS': '0x2, 0x3',
+        'ETH_KEYS_CREATED_AT': 'now',
+    })
+    assert [account.address for account in accounts] == ['0xa', '0xb', '0xc']
+    assert [account.created_at for account in accounts] == ['then', 'now', 'now']
+
+
+def test_parse_accounts_mismatch():
+    with pytest.raises(ValueError):
+        parse_accounts({'ETH_PUBLIC_KEYS': '0xa,0xb', 'ETH_PRIVATE_KEYS': '0x1'})
+
+
+def test_least_loaded_funded_account():
+    ledger = BalanceLedger()
+    accounts = [make_account(i) for i in range(3)]
+    pool = AccountPool(accounts, ledger)
+    ledger.account(3, accounts[0].address).refresh(0)
+    ledger.account(3, accounts[1].address).refresh(100)
+    ledger.account(3, accounts[2].address).refresh(200)
+
+    with pool.acquire(3) as first:
+        assert first == accounts[2]
+        with pool.acquire(3) as second:
+            assert second == accounts[1]
+        # As loaded as the first account once it has a transaction awaiting confirmation, but poorer.
+        ledger.account(3, accounts[1].address).reserve(50)
+        with pool.acquire(3) as third:
+            assert third == accounts[2]
+    assert pool.in_flight == {account.public_key: 0 for account in accounts}
+
+
+def test_no_accounts():
+    with pytest.raises(ValidationError):
+        with AccountPool([], BalanceLedger()).acquire(3):
+            pass
+
+
+def test_config_lists_issuing_keys(app, json_client):
+    app.config.update(ETH_PUBLIC_KEYS='ecdsa-koblitz-pubkey:0xb', ETH_PRIVATE_KEYS='0x2', ETH_KEYS_CREATED_AT='now')
+    response = json_client.get('/config')
+    assert response.json['ETH_PUBLIC_KEYS'][-1] == 'ecdsa-koblitz-pubkey:0xb'
+    assert response.json['ETH_KEYS_CREATED_AT'][-1] == 'now'
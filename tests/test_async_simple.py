@@ -0,0 +1,173 @@
+import asyncio
+import inspect
+import json
+import os
+from unittest import mock
+
+import pytest
+
+from blockcerts.issue_async import main
+from blockcerts.issuer.cert_issuer.async_simple import AsyncJsonRpcClient, AsyncEthereumTransactionHandler
+from blockcerts.issuer.cert_issuer.fees import FeeEstimate
+from blockcerts.issuer.cert_issuer.ledger import BalanceLedger
+from blockcerts.issuer.cert_issuer.providers import NodePool
+
+
+def make_client(answers, **options):
+    """Return a client whose nodes answer with the given coroutine functions of (payload), by url."""
+    pool = NodePool(list(answers), **options)
+    client = AsyncJsonRpcClient(pool)
+
+    async def post(node, payload):
+        return await answers[node.url](payload)
+
+    client._post = post
+    return client
+
+
+def answer(result=None, delay=0.0, error=None):
+    async def respond(payload):
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return {'jsonrpc': '2.0', 'id': payload['id'], 'result': result}
+    return respond
+
+
+def test_broadcast_returns_first_success():
+    client = make_client({'http://node-0': answer(error=ConnectionError()), 'http://node-1': answer('0xabc')})
+    assert asyncio.run(client.call('eth_sendRawTransaction', ['0x01'])) == '0xabc'
+
+
+def test_hedged_read_goes_to_second_node_when_first_is_late():
+    client = make_client(
+        {'http://node-0': answer('slow', delay=0.5), 'http://node-1': answer('fast')}, hedge_delay=0.01
+    )
+    assert asyncio.run(client.call('eth_getTransactionReceipt', ['0xabc'])) == 'fast'
+
+
+def test_batch_falls_back_to_single_calls():
+    async def respond(payload):
+        if isinstance(payload, list):
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'message': 'batches not supported'}}
+        return {'jsonrpc': '2.0', 'id': payload['id'], 'result': payload['method']}
+
+    client = make_client({'http://node-0': respond})
+    results = asyncio.run(client.call_batch([('eth_chainId', []), ('eth_blockNumber', [])]))
+    assert results == ['eth_chainId', 'eth_blockNumber']
+
+
+class FakeClient:
+    def __init__(self, batch, sends, receipts=None):
+        self.batch = batch
+        self.sends = list(sends)
+        self.receipts = receipts or {}
+
+    async def call_batch(self, calls):
+        return self.batch[:len(calls)]
+
+    async def call(self, method, params):
+        if method == 'eth_feeHistory':
+            raise ValueError('method not found')
+        if method == 'eth_gasPrice':
+            return hex(100)
+        if method == 'eth_blockNumber':
+            return hex(20)
+        if method == 'eth_getBalance':
+            return hex(10 ** 17)
+        if method == 'eth_getTransactionReceipt':
+            return self.receipts.get(params[0])
+        result = self.sends.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture
+def handler():
+    with mock.patch.dict(os.environ, {'ETH_NODE_URL_ROPSTEN': 'http://node-0'}):
+        handler = AsyncEthereumTransactionHandler(
+            chain='ropsten',
+            path_to_secret='',
+            private_key='0x' + '11' * 32,
+            account_from='0x0000000000000000000000000000000000000002',
+            ledger=BalanceLedger(),
+        )
+    handler.signer = mock.Mock()
+    handler.signer.sign_transaction.return_value.rawTransaction = b'\x01'
+    handler.fee_oracle.history_blocks, handler.fee_oracle.ttl = 10, 0
+    yield handler
+
+
+def test_issue_transaction_retries_at_same_nonce(handler):
+    handler.client = FakeClient(['0x3', '0x7', hex(10 ** 18)], [ValueError('underpriced'), '0xabc'])
+    assert asyncio.run(handler.issue_transaction_async(b'\x01' * 32)) == '0xabc'
+    first, retry = (call[0][0] for call in handler.signer.sign_transaction.call_args_list)
+    assert first['nonce'] == retry['nonce'] == 7
+    assert retry['gasPrice'] > first['gasPrice'] == 110
+    assert handler.reservation.amount == retry['gas'] * retry['gasPrice']
+
+
+def test_confirm_replaces_stuck_transaction(handler):
+    handler.client = FakeClient(['0x3', '0x7', hex(10 ** 18)], ['0xabc', '0xdef'])
+    asyncio.run(handler.issue_transaction_async(b'\x01' * 32))
+    handler.client.receipts = {}
+
+    async def confirm():
+        task = asyncio.ensure_future(handler.confirm_async(confirmations=3, deadline=0, max_replacements=1, interval=0))
+        while handler.tx_id != '0xdef':
+            await asyncio.sleep(0)
+        handler.client.receipts['0xdef'] = {'blockNumber': hex(15)}
+        return await task
+
+    tx_id, receipt = asyncio.run(confirm())
+    assert tx_id == '0xdef'
+    assert handler.fees.gas_price > 110
+    assert handler.account.reservations == set()
+    assert handler.account.balance == 10 ** 17
+
+
+def test_legacy_fees_when_node_has_no_fee_history(handler):
+    handler.client = FakeClient([], [])
+    fees = asyncio.run(handler._estimate_fees_async(b'\x01' * 32, None))
+    assert fees == FeeEstimate(fees.gas_limit, gas_price=110)
+
+
+def test_confirm_gives_up(handler):
+    handler.client = FakeClient(['0x3', '0x7', hex(10 ** 18)], ['0xabc'])
+    asyncio.run(handler.issue_transaction_async(b'\x01' * 32))
+    result = asyncio.run(handler.confirm_async(confirmations=1, deadline=60, max_replacements=0, interval=0,
+                                               give_up_after=0))
+    assert result is None
+    assert handler.account.reservations == set()
+    assert handler.nonces.next_nonce is None
+
+
+def test_sync_methods_are_kept(handler):
+    for name in ('issue_transaction', 'send_transaction', '_preflight'):
+        assert not inspect.iscoroutinefunction(getattr(handler, name)), name
+
+
+def test_cli_issues_batches_concurrently(tmp_path, issuer, template, three_recipients, job):
+    batch = tmp_path / 'batch.json'
+    batch.write_text(json.dumps(dict(issuer=issuer, template=template, recipients=three_recipients,
+                                     job=dict(job, job_id='job-1'))))
+    running = []
+
+    async def issue(*args, job_id=None):
+        running.append(job_id)
+        await asyncio.sleep(0)
+        assert len(running) == 2
+        return '0xabc', {'uid': {'id': job_id}}
+
+    with mock.patch('blockcerts.issue_async.issue_certificate_batch_async', side_effect=issue):
+        assert main([str(batch), str(batch), '--output-dir', str(tmp_path / 'out')]) == 0
+    assert json.loads((tmp_path / 'out' / 'job-1.json').read_text()) == dict(
+        job_id='job-1', tx_id='0xabc', signed_certificates=[{'id': 'job-1'}]
+    )
+
+
+def test_cli_fails_on_invalid_batch(tmp_path):
+    batch = tmp_path / 'batch.json'
+    batch.write_text(json.dumps({'recipients': []}))
+    assert main([str(batch), '--no-wait']) == 1
@@ -0,0 +1,38 @@
+import base64
+
+from benchmarks.issuance import compare, run
+from benchmarks.synthetic import make_image, make_template, make_roster, PNG_DATA_URI_PREFIX
+from flaskapp.config import get_config
+
+
+def test_synthetic_data():
+    image = make_image(1000)
+    assert image.startswith(PNG_DATA_URI_PREFIX)
+    assert len(base64.b64decode(image[len(PNG_DATA_URI_PREFIX):])) == 1000
+    assert make_image(1000) == image
+
+    template = make_template(image_size=10, additional_fields=2)
+    assert '%FIELD_1%' in template.display_html
+
+    roster = make_roster(50, additional_fields=2)
+    assert len({recipient.identity for recipient in roster}) == 50
+    assert roster[0].additional_fields['field_1'] == 'value 1 of recipient 0'
+
+
+def test_run(app):
+    config = get_config()
+    result = run([5], image_size=100, additional_fields=1, memory=False)['results']['5']
+    assert get_config() is config
+    assert result['stages']['total'] > 0
+    assert {'create_certificate_template', 'normalize_jsonld', 'merkle_tree', 'broadcast'} <= result['stages'].keys()
+    assert result['throughput']['total'] > 0
+
+
+def test_compare():
+    baseline = dict(results={'10': dict(stages=dict(total=1.0, broadcast=0.1), peak_memory_bytes=1000)})
+    results = dict(results={'10': dict(stages=dict(total=1.1, broadcast=0.2), peak_memory_bytes=2000)})
+    regressions = compare(results, baseline, tolerance=0.2)
+    assert len(regressions) == 2
+    assert 'broadcast' in regressions[0]
+    assert 'peak memory' in regressions[1]
+    assert compare(results, baseline, tolerance=2) == []
@@ -0,0 +1,68 @@
+import json
+from unittest import mock
+
+import pytest
+
+from blockcerts.issuer.cert_issuer import certificate_handlers
+from blockcerts.issuer.cert_issuer.certificate_handlers import CertificateV2Handler, CertificateBatchHandler
+from blockcerts.issuer.cert_issuer.merkle_tree_generator import MerkleTreeGenerator
+
+
+def test_certificate_is_read_once(tmp_path):
+    metadata = mock.Mock()
+    metadata.unsigned_cert_file_name = str(tmp_path / 'unsigned.json')
+    metadata.blockchain_cert_file_name = str(tmp_path / 'blockchain.json')
+    with open(metadata.unsigned_cert_file_name, 'w') as unsigned_file:
+        json.dump({'kek': 'kek'}, unsigned_file)
+    handler = CertificateV2Handler()
+
+    with mock.patch('blockcerts.issuer.cert_issuer.certificate_handlers.normalize_jsonld', return_value='normalized'), \
+            mock.patch.object(CertificateV2Handler, '_read_certificate',
+                              wraps=handler._read_certificate) as read_method:
+        assert handler.get_byte_array_to_issue(metadata) == b'normalized'
+        assert handler.get_byte_array_to_issue(metadata) == b'normalized'
+        handler.add_proof(metadata, {'a': 'merkel'})
+
+    assert read_method.call_count == 1
+    with open(metadata.blockchain_cert_file_name) as blockchain_file:
+        assert json.load(blockchain_file) == {'kek': 'kek', 'signature': {'a': 'merkel'}}
+
+
+def test_evicted_certificate_is_read_again():
+    handler = CertificateV2Handler(cache_size=1)
+    first, second = mock.Mock(unsigned_cert_file_name='1.json'), mock.Mock(unsigned_cert_file_name='2.json')
+    with mock.patch('blockcerts.issuer.cert_issuer.certificate_handlers.normalize_jsonld', return_value='normalized'), \
+            mock.patch.object(CertificateV2Handler, '_read_certificate', return_value={}) as read_method:
+        handler.get_byte_array_to_issue(first)
+        handler.get_byte_array_to_issue(second)
+        handler._get_certificate_to_issue(second)
+        handler._get_certificate_to_issue(first)
+    assert read_method.call_count == 3
+
+
+def test_batch_handler_write_errors():
+    certificates_to_issue = {uid: mock.Mock() for uid in ['1', '2', '3']}
+    certificate_handler = mock.Mock()
+    certificate_handler.get_byte_array_to_issue.side_effect = [b'1', b'2', b'3']
+    written = []
+
+    def add_proof(metadata, proof):
+        if metadata is certificates_to_issue['2']:
+            raise IOError('disk full')
+        written.append(metadata)
+
+    certificate_handler.add_proof.side_effect = add_proof
+    batch_handler = CertificateBatchHandler(
+        secret_manager=mock.Mock(), certificate_handler=certificate_handler, merkle_tree=MerkleTreeGenerator()
+    )
+    batch_handler.set_certificates_in_batch(certificates_to_issue)
+    batch_handler.prepare_batch()
+
+    with mock.patch.object(certificate_handlers.helpers, 'copy_output', return_value={}) as copy_output:
+        batch_handler.finish_batch('5604f0c442922b5db54b69f8f363b3eac67835d36a006b98e8727f83b6a830c0', mock.Mock())
+        with pytest.raises(certificate_handlers.OutputWriteError) as raised:
+            batch_handler.post_batch_actions(mock.Mock())
+
+    assert len(written) == 2
+    assert list(raised.value.errors) == ['2']
+    assert list(copy_output.call_args[0][0]) == ['1', '3']
@@ -0,0 +1,98 @@
+import os
+from unittest import mock
+
+import pytest
+
+from blockcerts.issuer.cert_issuer.checkpoint import BatchCheckpoint, ResumeError, STAGE_BROADCAST, STAGE_PREPARED
+from blockcerts.issuer.cert_issuer.issuer import Issuer
+
+
+@pytest.fixture
+def cert_files(tmp_path):
+    cert_files = []
+    for uid in ['1', '2']:
+        cert_files.append(str(tmp_path / f'{uid}.json'))
+        with open(cert_files[-1], 'w') as cert_file:
+            cert_file.write('{}')
+    yield cert_files
+
+
+def test_save_and_load(tmp_path, cert_files):
+    checkpoint = BatchCheckpoint(str(tmp_path))
+    assert not checkpoint.load()
+    checkpoint.save_prepared(['1', '2'], cert_files, ['aa', 'bb'], 'cc')
+    checkpoint.save_broadcast('0xabc')
+
+    resumed = BatchCheckpoint(str(tmp_path))
+    assert resumed.load()
+    assert resumed.stage == STAGE_BROADCAST
+    assert resumed.tx_id == '0xabc'
+    assert resumed.get_leaf_hashes(['1', '2'], cert_files) == ['aa', 'bb']
+
+
+def test_changed_batch_is_not_resumed(tmp_path, cert_files):
+    checkpoint = BatchCheckpoint(str(tmp_path))
+    checkpoint.save_prepared(['1', '2'], cert_files, ['aa', 'bb'], 'cc')
+    assert checkpoint.stage == STAGE_PREPARED
+    with pytest.raises(ResumeError):
+        checkpoint.get_leaf_hashes(['1', '3'], cert_files)
+
+
+def test_modified_certificate_is_not_resumed(tmp_path, cert_files):
+    checkpoint = BatchCheckpoint(str(tmp_path))
+    checkpoint.save_prepared(['1', '2'], cert_files, ['aa', 'bb'], 'cc')
+    with open(cert_files[1], 'w') as cert_file:
+        cert_file.write('{"edited": true}')
+    with pytest.raises(ResumeError):
+        checkpoint.get_leaf_hashes(['1', '2'], cert_files)
+
+
+def test_tree_file_is_checkpointed_instead_of_leaves(tmp_path, cert_files):
+    tree_file = str(tmp_path / 'merkle_tree')
+    with open(tree_file, 'wb') as f:
+        f.write(b'tree')
+    checkpoint = BatchCheckpoint(str(tmp_path))
+    checkpoint.save_prepared(['1', '2'], cert_files, None, 'cc', tree_file=tree_file)
+    assert 'leaf_hashes' not in checkpoint.state
+
+    resumed = BatchCheckpoint(str(tmp_path))
+    assert resumed.load()
+    assert resumed.get_leaf_hashes(['1', '2'], cert_files) is None
+    assert resumed.get_tree_file(['1', '2'], cert_files) == tree_file
+    with open(tree_file, 'ab') as f:
+        f.write(b'modified')
+    with pytest.raises(ResumeError):
+        resumed.get_tree_file(['1', '2'], cert_files)
+
+
+def test_clear(tmp_path, cert_files):
+    checkpoint = BatchCheckpoint(str(tmp_path))
+    checkpoint.save_prepared(['1'], cert_files[:1], ['aa'], 'aa')
+    checkpoint.clear()
+    assert sorted(os.listdir(tmp_path)) == ['1.json', '2.json']
+    assert checkpoint.get_leaf_hashes(['1'], cert_files[:1]) is None
+
+
+def test_issuer_saves_tx_id_before_finishing(tmp_path):
+    checkpoint = BatchCheckpoint(str(tmp_path))
+    batch_handler, transaction_handler = mock.Mock(), mock.Mock()
+    transaction_handler.issue_transaction.return_value = '0xabc'
+    tx_ids = []
+    batch_handler.finish_batch.side_effect = lambda tx_id, chain: tx_ids.append(checkpoint.tx_id)
+
+    Issuer(batch_handler, transaction_handler, checkpoint=checkpoint).issue(mock.Mock())
+
+    batch_handler.finish_batch.assert_called_once_with('0xabc', mock.ANY)
+    assert tx_ids == ['0xabc']
+
+
+def test_issuer_resumes_broadcast_batch(tmp_path):
+    checkpoint = BatchCheckpoint(str(tmp_path))
+    checkpoint.save_broadcast('0xabc')
+    batch_handler, transaction_handler = mock.Mock(), mock.Mock()
+
+    tx_id = Issuer(batch_handler, transaction_handler, checkpoint=checkpoint).issue(mock.Mock())
+
+    assert tx_id == '0xabc'
+    transaction_handler.issue_transaction.assert_not_called()
+    batch_handler.finish_batch.assert_called_once_with('0xabc', mock.ANY)
@@ -0,0 +1,63 @@
+import json
+from datetime import datetime
+from uuid import UUID
+
+import pytest
+from flask import jsonify
+from flask.json import JSONEncoder
+
+from flaskapp.codec import FastJSONEncoder, FastJSONDecoder, register_json_codec
+
+COMPACT = dict(sort_keys=True, separators=(',', ':'))
+
+
+@pytest.mark.parametrize("data", [
+    {'b': 1, 'a': {'d': 'data:image/png;base64,iVBORw0KGgo', 'c': [1, 2.5, True, False]}},
+    {'name': 'José Müller', 'emoji': '\U0001F600', 'del': '\x7f', 'control': '\n\t\x00'},
+    {'small': 1e-07, 'big': 1e+16, 'nan': float('nan'), 'none': None},
+    {'wei': 2 ** 70, 'negative': -2 ** 65},
+    {'when': datetime(2020, 4, 29, 12, 14, 21), 'uid': UUID('eff07e73-f0d1-47d5-99a1-74ca59e66d80')},
+    [{'nested': [[], {}, '']}],
+    'just a string',
+    1.5e+300,
+])
+def test_fast_encoder_matches_stdlib(data):
+    expected = json.dumps(data, cls=JSONEncoder, **COMPACT)
+    assert json.dumps(data, cls=FastJSONEncoder, **COMPACT) == expected
+
+
+def test_fast_encoder_pretty_print_matches_stdlib(issued_cert):
+    expected = json.dumps(issued_cert, indent=2, separators=(', ', ': '), sort_keys=True)
+    assert json.dumps(issued_cert, cls=FastJSONEncoder, indent=2, separators=(', ', ': '), sort_keys=True) == expected
+
+
+@pytest.mark.parametrize("raw", [
+    '{"a": 1, "a": 2, "b": [1.5, -0, true, null]}',
+    '{"wei": 1180591620717411303424}',
+    '{"nan": NaN}',
+    '"\\u00e9"',
+])
+def test_fast_decoder_matches_stdlib(raw):
+    assert json.loads(raw, cls=FastJSONDecoder) == json.loads(raw)
+    assert type(json.loads(raw, cls=FastJSONDecoder)) is type(json.loads(raw))
+
+
+def test_fast_decoder_keeps_errors():
+    with pytest.raises(ValueError):
+        json.loads('{"a": ', cls=FastJSONDecoder)
+
+
+def test_jsonify_is_byte_compatible(app, issued_cert):
+    app.debug = False
+    with app.app_context():
+        fast = jsonify(issued_cert).get_data()
+        app.config['JSON_CODEC'] = 'stdlib'
+        register_json_codec(app)
+        stdlib = jsonify(issued_cert).get_data()
+    assert fast == stdlib
+
+
+def test_unknown_codec(app):
+    app.config['JSON_CODEC'] = 'yaml'
+    with pytest.raises(ValueError):
+        register_json_codec(app)
@@ -0,0 +1,71 @@
+import copy
+from unittest import mock
+
+import pytest
+from flask import url_for
+
+from blockcerts.compact import compact_batch, expand_batch, COMPACT_BATCH_FORMAT
+
+
+@pytest.fixture
+def signed_batch(issued_cert):
+    batch = []
+    for i, name in enumerate(['Phaws', 'John', 'Ben']):
+        cert = copy.deepcopy(issued_cert)
+        cert['id'] = f'urn:uuid:eff07e73-f0d1-47d5-99a1-74ca59e66d8{i}'
+        cert['recipientProfile']['name'] = name
+        cert['recipient']['identity'] = f'{name.lower()}@mail.com'
+        cert['signature']['targetHash'] = f'{i}' * 64
+        cert['signature']['proof'] = [{'right': f'{i}' * 64}]
+        batch.append(cert)
+    yield batch
+
+
+def test_compact_batch_roundtrip(signed_batch):
+    compact = compact_batch(signed_batch)
+    assert compact['format'] == COMPACT_BATCH_FORMAT
+    assert compact['shared']['badge'] == signed_batch[0]['badge']
+    assert compact['shared']['signature']['merkleRoot'] == signed_batch[0]['signature']['merkleRoot']
+    for delta in compact['certificates']:
+        assert 'badge' not in delta
+        assert 'verification' not in delta
+        assert set(delta['signature'].keys()) == {'targetHash', 'proof'}
+    assert expand_batch(compact) == signed_batch
+
+
+def test_compact_batch_keeps_value_types(signed_batch):
+    signed_batch[0]['recipient']['hashed'] = 0
+    signed_batch[1]['expires'] = '2028-02-07T23:52:16.636+00:00'
+    signed_batch[2]['recipientProfile'] = {}
+    expanded = expand_batch(compact_batch(signed_batch))
+    assert expanded == signed_batch
+    assert type(expanded[0]['recipient']['hashed']) is int
+    assert expanded[1]['recipient']['hashed'] is False
+    assert 'expires' not in expanded[0]
+
+
+def test_compact_batch_single_and_empty(issued_cert):
+    assert expand_batch(compact_batch([issued_cert])) == [issued_cert]
+    assert expand_batch(compact_batch([])) == []
+
+
+def test_expand_batch_unknown_format():
+    with pytest.raises(ValueError):
+        expand_batch({'format': 'compact-batch/0', 'shared': {}, 'certificates': []})
+
+
+def test_issuing_endpoint_compact(app, issuer, template, three_recipients, job, json_client, signed_batch):
+    signed_certs = {cert['id']: cert for cert in signed_batch}
+    with mock.patch('flaskapp.routes.issue_certificate_batch', return_value=('0xabc', signed_certs)):
+        response = json_client.post(
+            url_for('issue_certs', format='compact', _external=True),
+            data=dict(
+                issuer=issuer,
+                template=template,
+                recipients=three_recipients,
+                job=job
+            )
+        )
+    assert response.status_code == 200
+    assert response.json['tx_id'] == '0xabc'
+    assert expand_batch(response.json['signed_certificates']) == signed_batch
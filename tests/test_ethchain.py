@@ -0,0 +1,38 @@
+import os
+
+import pytest
+from flask import url_for
+
+ethchain = pytest.importorskip('benchmarks.ethchain')
+
+
+@pytest.fixture
+def local_chain():
+    with ethchain.LocalChain(accounts=2) as chain:
+        yield chain
+
+
+def test_local_chain_funds_accounts(local_chain):
+    from web3 import Web3
+
+    web3 = Web3(Web3.HTTPProvider(local_chain.url))
+    for address, _ in local_chain.accounts:
+        assert web3.eth.getBalance(address) == ethchain.DEFAULT_BALANCE
+
+
+def test_issuing_against_local_chain(local_chain, issuer, template, three_recipients, job):
+    node_url = os.environ.get('ETH_NODE_URL_ROPSTEN')
+    app = ethchain.create_local_app(local_chain, TESTING=True, CERT_STORE_PATH='')
+    with app.test_request_context():
+        client = app.test_client()
+        response = client.post(
+            url_for('issue_certs', _external=True),
+            json=dict(issuer=issuer, template=template, recipients=three_recipients, job=job),
+        )
+        assert response.status_code == 200
+        tx_id = response.get_json()['tx_id']
+
+        response = client.get(url_for('tx_receipt', chain='ropsten', tx_id=tx_id, _external=True))
+        assert response.status_code == 200
+        assert response.get_json()['status'] == 1
+    assert os.environ.get('ETH_NODE_URL_ROPSTEN') == node_url
@@ -0,0 +1,68 @@
+from unittest import mock
+
+import pytest
+
+from blockcerts.issuer.cert_issuer import fees
+from blockcerts.issuer.cert_issuer.errors import InsufficientGasLimitError
+from blockcerts.issuer.cert_issuer.fees import FeeOracle, FeeEstimate, intrinsic_gas
+
+GWEI = 10 ** 9
+
+
+@pytest.fixture(autouse=True)
+def clear_fee_histories():
+    fees._fee_histories.clear()
+    yield
+
+
+@pytest.fixture
+def web3():
+    web3 = mock.Mock()
+    web3.provider.endpoint_uri = 'http://node'
+    web3.manager.request_blocking.return_value = {
+        'baseFeePerGas': [hex(GWEI)] * 11,
+        'reward': [[hex(GWEI // 10), hex(GWEI // 2), hex(2 * GWEI)]] * 10,
+    }
+    web3.eth.gasPrice = 10 * GWEI
+    yield web3
+
+
+def test_intrinsic_gas():
+    assert intrinsic_gas(b'') == 21000
+    assert intrinsic_gas(bytes(32)) == 21000 + 32 * 4
+    assert intrinsic_gas(b'\x01' * 32) == 21000 + 32 * 16
+
+
+def test_estimate_by_urgency(web3):
+    oracle = FeeOracle(web3)
+    low, medium, high = (oracle.estimate(b'\x01' * 32, urgency) for urgency in fees.URGENCY_LEVELS)
+    assert low.gas_limit == 21512
+    assert low.max_priority_fee_per_gas == GWEI // 10
+    assert medium.max_priority_fee_per_gas == GWEI // 2
+    assert high.max_priority_fee_per_gas == 2 * GWEI
+    assert low.max_fee_per_gas < medium.max_fee_per_gas < high.max_fee_per_gas
+    assert medium.max_fee_per_gas == int(GWEI * 1.125 ** 6) + GWEI // 2
+    assert medium.tx_fields() == dict(gas=21512, maxFeePerGas=medium.max_fee_per_gas, maxPriorityFeePerGas=GWEI // 2)
+    assert web3.manager.request_blocking.call_count == 1
+
+
+def test_estimate_caps(web3):
+    estimate = FeeOracle(web3).estimate(b'\x01' * 32, 'high', max_gas_price=GWEI)
+    assert estimate.max_fee_per_gas == GWEI
+    assert estimate.max_priority_fee_per_gas == GWEI
+    assert estimate.max_cost == 21512 * GWEI
+    with pytest.raises(InsufficientGasLimitError):
+        FeeOracle(web3).estimate(b'\x01' * 32, max_gas_limit=21000)
+
+
+def test_estimate_legacy(web3):
+    web3.manager.request_blocking.side_effect = ValueError('the method eth_feeHistory does not exist')
+    estimate = FeeOracle(web3).estimate(b'\x01' * 32, 'high', max_gas_price=12 * GWEI)
+    assert not estimate.is_eip1559
+    assert estimate.gas_price == 12 * GWEI
+    assert estimate.tx_fields() == dict(gas=21512, gasPrice=12 * GWEI)
+
+
+def test_bumped():
+    estimate = FeeEstimate(21512, max_fee_per_gas=100, max_priority_fee_per_gas=10).bumped(1.2)
+    assert estimate == FeeEstimate(21512, max_fee_per_gas=120, max_priority_fee_per_gas=12)
@@ -0,0 +1,60 @@
+import os
+from unittest import mock
+
+import pytest
+
+from blockcerts.issuer.cert_issuer import helpers
+
+
+def test_write_atomically(tmp_path):
+    file_name = str(tmp_path / 'cert.json')
+    helpers.write_atomically(file_name, '{}')
+    helpers.write_atomically(file_name, '{"a": 1}')
+    with open(file_name) as cert_file:
+        assert cert_file.read() == '{"a": 1}'
+    assert os.listdir(tmp_path) == ['cert.json']
+    assert os.stat(file_name).st_mode & 0o777 == 0o666 & ~helpers.UMASK
+
+    os.chmod(file_name, 0o640)
+    helpers.write_atomically(file_name, '{}')
+    assert os.stat(file_name).st_mode & 0o777 == 0o640
+
+
+def test_link_or_copy_replaces_existing_file(tmp_path):
+    from_file, to_file = tmp_path / 'from.json', tmp_path / 'to.json'
+    from_file.write_text('{"a": 1}')
+    to_file.write_text('{}')
+    assert helpers.link_or_copy(str(from_file), str(to_file)) == str(to_file)
+    assert os.path.samefile(from_file, to_file)
+    assert helpers.link_or_copy(str(from_file), str(to_file)) == str(to_file)
+    assert sorted(os.listdir(tmp_path)) == ['from.json', 'to.json']
+
+
+def test_link_or_copy_falls_back_to_copying(tmp_path):
+    from_file, to_file = tmp_path / 'from.json', tmp_path / 'to.json'
+    from_file.write_text('{"a": 1}')
+    to_file.write_text('{}')
+    with mock.patch('os.link', side_effect=OSError('cross-device link')):
+        helpers.link_or_copy(str(from_file), str(to_file))
+    assert not os.path.samefile(from_file, to_file)
+    assert to_file.read_text() == '{"a": 1}'
+    assert sorted(os.listdir(tmp_path)) == ['from.json', 'to.json']
+
+
+def test_link_or_copy_keeps_target_when_failing(tmp_path):
+    from_file, to_file = tmp_path / 'from.json', tmp_path / 'to.json'
+    from_file.write_text('{"a": 1}')
+    to_file.write_text('{}')
+    with mock.patch('os.link', side_effect=OSError('cross-device link')), \
+            mock.patch('shutil.copy2', side_effect=OSError('disk full')), pytest.raises(OSError):
+        helpers.link_or_copy(str(from_file), str(to_file))
+    assert to_file.read_text() == '{}'
+    assert sorted(os.listdir(tmp_path)) == ['from.json', 'to.json']
+
+
+def test_link_tree(tmp_path):
+    from_dir, to_dir = tmp_path / 'from', tmp_path / 'to'
+    from_dir.mkdir()
+    (from_dir / 'cert.json').write_text('{}')
+    helpers.link_tree(str(from_dir), str(to_dir))
+    assert os.path.samefile(from_dir / 'cert.json', to_dir / 'cert.json')
@@ -0,0 +1,160 @@
+import json
+import threading
+from contextlib import contextmanager
+from unittest import mock
+
+import pytest
+from flask import url_for
+
+from flaskapp.errors import IdempotencyKeyReused, ObjectExists, BroadcastBatchFailed
+from flaskapp.idempotency import IdempotencyCache
+
+
+def test_cache_returns_stored_result():
+    cache = IdempotencyCache(max_size=10, ttl=60)
+    fn = mock.Mock(return_value='result')
+    assert cache.run('key', 'fingerprint', fn) == 'result'
+    assert cache.run('key', 'fingerprint', fn) == 'result'
+    assert fn.call_count == 1
+
+
+def test_cache_rejects_different_fingerprint():
+    cache = IdempotencyCache(max_size=10, ttl=60)
+    cache.run('key', 'fingerprint', lambda: 'result')
+    with pytest.raises(IdempotencyKeyReused):
+        cache.run('key', 'other', lambda: 'result')
+
+
+def test_cache_forgets_failures():
+    cache = IdempotencyCache(max_size=10, ttl=60)
+    with pytest.raises(ValueError):
+        cache.run('key', 'fingerprint', mock.Mock(side_effect=ValueError))
+    assert cache.run('key', 'fingerprint', lambda: 'result') == 'result'
+
+
+def test_cache_keeps_failures_after_broadcast():
+    cache = IdempotencyCache(max_size=10, ttl=60)
+    fn = mock.Mock(side_effect=BroadcastBatchFailed(key='tx_id', details='Failed after broadcasting 0xabc'))
+    for _ in range(2):
+        with pytest.raises(BroadcastBatchFailed):
+            cache.run('key', 'fingerprint', fn)
+    assert fn.call_count == 1
+
+
+def test_cache_eviction():
+    cache = IdempotencyCache(max_size=2, ttl=60)
+    for key in ['a', 'b', 'c']:
+        cache.run(key, 'fingerprint', lambda: key)
+    fn = mock.Mock(return_value='again')
+    assert cache.run('a', 'fingerprint', fn) == 'again'
+    assert fn.call_count == 1
+
+    cache = IdempotencyCache(max_size=10, ttl=-1)
+    cache.run('a', 'fingerprint', lambda: 'result')
+    assert cache.run('a', 'fingerprint', fn) == 'again'
+    assert fn.call_count == 2
+
+
+def test_cache_concurrent_duplicate_waits():
+    cache = IdempotencyCache(max_size=10, ttl=60)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+        return 'result'
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.run('key', 'fingerprint', slow)))
+    owner.start()
+    started.wait()
+    fn = mock.Mock(return_value='duplicate')
+    duplicate = threading.Thread(target=lambda: results.append(cache.run('key', 'fingerprint', fn)))
+    duplicate.start()
+    release.set()
+    owner.join()
+    duplicate.join()
+    assert results == ['result', 'result']
+    fn.assert_not_called()
+
+
+def test_cache_duplicate_gives_up_waiting():
+    cache = IdempotencyCache(max_size=10, ttl=60, wait_timeout=0.01)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+        return 'result'
+
+    owner = threading.Thread(target=cache.run, args=('key', 'fingerprint', slow))
+    owner.start()
+    started.wait()
+    with pytest.raises(ObjectExists):
+        cache.run('key', 'fingerprint', lambda: 'duplicate')
+    release.set()
+    owner.join()
+    assert cache.run('key', 'fingerprint', lambda: 'again') == 'result'
+
+
+def test_issuing_endpoint_idempotency_key(app, client, issuer, template, three_recipients, job, issued_cert):
+    app.config['CERT_STORE_PATH'] = ''
+    data = json.dumps(dict(issuer=issuer, template=template, recipients=three_recipients, job=job))
+    with mock.patch('flaskapp.routes.issue_certificate_batch',
+                    return_value=('0xabc', {issued_cert['id']: issued_cert})) as issue:
+        responses = [
+            client.post(url_for('issue_certs', _external=True), data=data, content_type='application/json',
+                        headers={'Idempotency-Key': 'retried-key'})
+            for _ in range(2)
+        ]
+        assert issue.call_count == 1
+        assert responses[0].get_json() == responses[1].get_json()
+        assert responses[0].get_json()['tx_id'] == '0xabc'
+
+        other_data = json.dumps(dict(issuer=issuer, template=template, recipients=three_recipients[:1], job=job))
+        response = client.post(url_for('issue_certs', _external=True), data=other_data,
+                               content_type='application/json', headers={'Idempotency-Key': 'retried-key'})
+        assert response.status_code == 422
+        assert issue.call_count == 1
+
+
+def test_issuing_endpoint_fingerprints_validated_payload(app, client, issuer, template, three_recipients, job,
+                                                         issued_cert):
+    app.config['CERT_STORE_PATH'] = ''
+    payload = dict(issuer=issuer, template=template, recipients=three_recipients, job=job)
+    with mock.patch('flaskapp.routes.issue_certificate_batch',
+                    return_value=('0xabc', {issued_cert['id']: issued_cert})) as issue:
+        for data in (json.dumps(payload), json.dumps(dict(payload, unknown=1), sort_keys=True, indent=2)):
+            response = client.post(url_for('issue_certs', _external=True), data=data,
+                                   content_type='application/json', headers={'Idempotency-Key': 'formatted-key'})
+            assert response.status_code == 200
+        assert issue.call_count == 1
+
+
+def test_issuing_endpoint_broadcast_failure_without_store(app, client, issuer, template, three_recipients, job):
+    app.config['CERT_STORE_PATH'] = ''
+    app.config['CPU_WORKERS'] = 0
+
+    @contextmanager
+    def issuing_account(job_data, job_config):
+        yield job_config
+
+    batch_issuer = mock.Mock()
+    batch_issuer.return_value.tx_id = '0xabc'
+    batch_issuer.return_value.issue.side_effect = IOError('disk full')
+    data = json.dumps(dict(issuer=issuer, template=template, recipients=three_recipients, job=job))
+    with mock.patch('blockcerts.misc.issuing_account', issuing_account), \
+            mock.patch('blockcerts.misc.get_issuer_config'), \
+            mock.patch('blockcerts.issuer.cert_issuer.simple.SimplifiedCertificateBatchIssuer', batch_issuer), \
+            mock.patch('blockcerts.misc.track_anchor') as track_anchor:
+        responses = [
+            client.post(url_for('issue_certs', _external=True), data=data, content_type='application/json',
+                        headers={'Idempotency-Key': 'broadcast-key'})
+            for _ in range(2)
+        ]
+    for response in responses:
+        assert response.status_code == 500
+        assert response.get_json()['error'] == 'broadcast-batch-failed'
+        assert '0xabc' in response.get_json()['details']
+    assert batch_issuer.return_value.issue.call_count == 1
+    track_anchor.assert_called_once()
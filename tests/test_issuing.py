@@ -5,16 +5,26 @@ from flask import url_for
 
 from blockcerts.const import RECIPIENT_NAME_KEY, RECIPIENT_EMAIL_KEY
 from blockcerts.misc import issue_certificate_batch, format_recipients, get_tx_receipt
+from blockcerts.models import Issuer, Template, Recipient, Job
+
+
+def as_models(issuer, template, recipients, job):
+    return (
+        Issuer.from_dict(issuer),
+        Template.from_dict(template),
+        [Recipient.from_dict(recipient) for recipient in recipients],
+        Job.from_dict(job),
+    )
 
 
 def test_issuing(app, issuer, template, three_recipients, job):
-    tx_id, issued_certs = issue_certificate_batch(issuer, template, three_recipients, job)
+    tx_id, issued_certs = issue_certificate_batch(*as_models(issuer, template, three_recipients, job))
     assert isinstance(issued_certs, dict)
     assert len(issued_certs) == 3
 
 
 def test_issuing_custom_keypair(app, issuer, template, three_recipients, job_custom_keypair_1):
-    tx_id, issued_certs = issue_certificate_batch(issuer, template, three_recipients, job_custom_keypair_1)
+    tx_id, issued_certs = issue_certificate_batch(*as_models(issuer, template, three_recipients, job_custom_keypair_1))
     assert isinstance(issued_certs, dict)
     assert len(issued_certs) == 3
 
@@ -177,7 +187,10 @@ def test_recipient_specific_html_creation(app, issuer, template, three_recipient
                             '"%ISSUER_SIGNATURE_FILE%" "%EXPIRATION_DATE%"  "%CERT_TITLE%" "%CERT_DESCRIPTION%"'
     for recipient in three_recipients:
         assert not recipient['additional_fields']['displayHtml']
+    issuer, template, three_recipients, _ = as_models(issuer, template, three_recipients, {})
     recipients = format_recipients(three_recipients, template, issuer)
+    for recipient in three_recipients:
+        assert not recipient['additional_fields']['displayHtml']
     for recipient in recipients:
         assert recipient['additional_fields']['displayHtml'].startswith(f'"{recipient.get(RECIPIENT_NAME_KEY)}" - '
                                                                         f'"{recipient.get(RECIPIENT_EMAIL_KEY)}" - "')
@@ -212,6 +225,7 @@ def test_recipient_specific_html_creation_additional_fields(app, issuer, templat
     for recipient in three_recipients:
         assert not recipient['additional_fields'].get('displayHtml')
 
+    issuer, template, three_recipients, _ = as_models(issuer, template, three_recipients, {})
     recipients = format_recipients(three_recipients, template, issuer)
 
     for recipient in recipients:
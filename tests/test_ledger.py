@@ -0,0 +1,70 @@
+from unittest import mock
+
+import pytest
+
+from blockcerts.issuer.cert_issuer import ledger
+from blockcerts.issuer.cert_issuer.errors import InsufficientFundsError
+from blockcerts.issuer.cert_issuer.ledger import BalanceLedger
+
+ADDRESS = '0x0000000000000000000000000000000000000001'
+
+
+@pytest.fixture
+def account():
+    account = BalanceLedger(refresh_interval=60).account(3, ADDRESS)
+    account.refresh(1000)
+    yield account
+
+
+def test_reservations_debit_available_balance(account):
+    first = account.reserve(600)
+    assert account.available == 400
+    with pytest.raises(InsufficientFundsError):
+        account.reserve(500)
+    first.release()
+    assert account.reserve(500).amount == 500
+
+
+def test_resize(account):
+    reservation = account.reserve(600)
+    reservation.resize(900)
+    assert account.available == 100
+    with pytest.raises(InsufficientFundsError):
+        reservation.resize(1100)
+    assert reservation.amount == 900
+
+
+def test_settle_refreshes_balance(account):
+    account.reserve(300).settle(balance=700)
+    assert account.available == 700
+    assert not account.stale
+    account.reserve(300).settle()
+    assert account.stale
+
+
+def test_settle_is_atomic(account):
+    reservation = account.reserve(300)
+    with mock.patch.object(account, '_update', side_effect=lambda: snapshots.append(account.available)):
+        snapshots = []
+        reservation.settle(balance=700)
+    assert snapshots == [700]
+
+
+def test_accounts_are_shared_per_chain():
+    balances = BalanceLedger()
+    assert balances.account(3, ADDRESS) is balances.account(3, ADDRESS.upper().replace('0X', '0x'))
+    assert balances.account(3, ADDRESS) is not balances.account(1, ADDRESS)
+    assert balances.account(3, ADDRESS).stale
+
+
+def test_low_balance_alert_fires_once():
+    balances = BalanceLedger(low_balance_threshold=500, webhook_url='http://alerts')
+    account = balances.account(3, ADDRESS)
+    with mock.patch.object(ledger, '_post_alert') as post_alert:
+        account.refresh(1000)
+        reservation = account.reserve(600)
+        account.reserve(100)
+        reservation.release()
+        account.reserve(600)
+    payloads = [call[0][1] for call in post_alert.call_args_list]
+    assert [payload['available'] for payload in payloads] == [400, 300]
@@ -0,0 +1,36 @@
+import argparse
+
+import pytest
+
+from benchmarks.loadgen import percentile, summarize, parse_mix, format_summary
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert [percentile(values, pct) for pct in (50, 95, 99, 100)] == [50, 95, 99, 100]
+    assert percentile([0.5], 99) == 0.5
+    assert percentile([], 50) is None
+
+
+def test_summarize():
+    samples = {'ping': [(0.01, True), (0.03, True), (0.02, False)], 'issue': [(1.0, True)]}
+    summary = summarize(samples, elapsed=2.0)
+    ping = summary['endpoints']['ping']
+    assert ping['requests'] == 3
+    assert ping['errors'] == 1
+    assert ping['throughput'] == 1.5
+    assert ping['p50'] == 0.02
+    assert summary['endpoints']['all']['requests'] == 4
+    assert summary['endpoints']['all']['p99'] == 1.0
+
+
+def test_format_summary():
+    summary = summarize({'ping': [(0.01, True), (0.02, False)]}, elapsed=1.0)
+    ping = format_summary(summary).splitlines()[1]
+    assert ping.split()[:3] == ['ping', '2', '1']
+
+
+def test_parse_mix():
+    assert parse_mix('issue=1,ping=4,tx') == {'issue': 1.0, 'ping': 4.0, 'tx': 1.0}
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_mix('unknown=1')
@@ -0,0 +1,92 @@
+from unittest import mock
+
+import pytest
+from cert_core import Chain
+
+from blockcerts.issuer.cert_issuer.merkle_tree_file import MerkleTreeFile, MerkleTreeFileWriter, get_level_sizes
+from blockcerts.issuer.cert_issuer.merkle_tree_generator import MerkleTreeGenerator
+
+
+def get_test_data(count):
+    return [str(num).encode('utf-8') for num in range(1, count + 1)]
+
+
+@pytest.fixture
+def tree_file(tmp_path):
+    yield str(tmp_path / 'merkle_tree')
+
+
+def test_level_sizes():
+    assert get_level_sizes(1) == [1]
+    assert get_level_sizes(5) == [5, 3, 2, 1]
+
+
+def test_root(tree_file):
+    generator = MerkleTreeGenerator(tree_file)
+    generator.populate(get_test_data(3))
+    assert generator.get_blockchain_data().hex() == '0932f1d2e98219f7d7452801e2b64ebd9e5c005539db12d9b1ddabe7834d9044'
+
+
+@pytest.mark.parametrize('count', range(1, 10))
+def test_same_tree_as_in_memory(tree_file, count):
+    in_memory = MerkleTreeGenerator()
+    in_memory.populate(get_test_data(count))
+    on_disk = MerkleTreeGenerator(tree_file)
+    on_disk.populate(get_test_data(count))
+
+    assert on_disk.get_blockchain_data() == in_memory.get_blockchain_data()
+    assert on_disk.get_leaf_hashes() == in_memory.get_leaf_hashes()
+    assert list(on_disk.get_proof_generator('0xabc', Chain.ethereum_ropsten)) == \
+        list(in_memory.get_proof_generator('0xabc', Chain.ethereum_ropsten))
+
+
+def test_populate_hashes(tree_file):
+    in_memory = MerkleTreeGenerator()
+    in_memory.populate(get_test_data(4))
+    on_disk = MerkleTreeGenerator(tree_file)
+    on_disk.populate_hashes(in_memory.get_leaf_hashes())
+    assert on_disk.get_blockchain_data() == in_memory.get_blockchain_data()
+
+
+def test_chunked_levels(tree_file):
+    in_memory = MerkleTreeGenerator()
+    in_memory.populate(get_test_data(11))
+    writer = MerkleTreeFileWriter(tree_file)
+    for leaf in in_memory.get_leaf_hashes():
+        writer.add_leaf(bytes.fromhex(leaf))
+    with mock.patch('blockcerts.issuer.cert_issuer.merkle_tree_file.CHUNK_NODES', 4):
+        root = writer.finish()
+    assert root == in_memory.get_blockchain_data()
+
+
+def test_load_tree_file(tree_file):
+    built = MerkleTreeGenerator(tree_file)
+    built.populate(get_test_data(5))
+    built.get_blockchain_data()
+    built.close()
+    in_memory = MerkleTreeGenerator()
+    in_memory.populate(get_test_data(5))
+
+    loaded = MerkleTreeGenerator()
+    loaded.load_tree_file(tree_file)
+    try:
+        assert loaded.get_blockchain_data() == in_memory.get_blockchain_data()
+        assert loaded.get_leaf_hashes() == in_memory.get_leaf_hashes()
+    finally:
+        loaded.close()
+
+
+def test_close(tree_file):
+    generator = MerkleTreeGenerator(tree_file)
+    generator.populate(get_test_data(3))
+    generator.get_blockchain_data()
+    generator.close()
+    with pytest.raises(ValueError):
+        generator.get_leaf_hashes()
+
+
+def test_rejects_other_files(tree_file):
+    with open(tree_file, 'wb') as f:
+        f.write(b'\0' * 64)
+    with pytest.raises(ValueError):
+        MerkleTreeFile(tree_file)
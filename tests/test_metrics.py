@@ -0,0 +1,59 @@
+import os
+from unittest import mock
+
+from flask import url_for
+from prometheus_client import REGISTRY
+
+from blockcerts.issuer.cert_issuer import instrumentation
+from flaskapp import metrics
+from flaskapp.metrics import time_stage, rpc_timing_middleware
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_time_stage():
+    before = _sample('vce_stage_seconds_count', pipeline='test', stage='stage')
+    with time_stage('test', 'stage'):
+        pass
+    assert _sample('vce_stage_seconds_count', pipeline='test', stage='stage') == before + 1
+
+
+def test_rpc_timing_middleware():
+    before = _sample('vce_rpc_seconds_count', method='eth_test')
+    make_request = mock.Mock(return_value={'result': '0x1'})
+    middleware = rpc_timing_middleware(make_request, None)
+    assert middleware('eth_test', []) == {'result': '0x1'}
+    make_request.assert_called_once_with('eth_test', [])
+    assert _sample('vce_rpc_seconds_count', method='eth_test') == before + 1
+
+
+def test_issuer_reports_to_metrics(app):
+    before = _sample('vce_stage_seconds_count', pipeline='issue', stage='merkle_tree')
+    with instrumentation.time_stage('issue', 'merkle_tree'):
+        pass
+    assert _sample('vce_stage_seconds_count', pipeline='issue', stage='merkle_tree') == before + 1
+    instrumentation.report_balance(3, '0x1', 700)
+    assert _sample('vce_account_balance_wei', chain_id='3', address='0x1') == 700
+
+
+def test_dead_workers_marked_on_exit(monkeypatch, tmp_path):
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+    uwsgi = mock.Mock(spec=['atexit'])
+    with mock.patch.dict('sys.modules', uwsgi=uwsgi), \
+            mock.patch.object(metrics.multiprocess, 'mark_process_dead') as mark_process_dead:
+        metrics.register_metrics()
+        uwsgi.atexit()
+    mark_process_dead.assert_called_once_with(os.getpid())
+
+
+def test_metrics_endpoint(client):
+    with time_stage('issue', 'create_certificate_template'):
+        pass
+    response = client.get(url_for('metrics', _external=True))
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    body = response.get_data(as_text=True)
+    assert 'vce_stage_seconds_count{pipeline="issue",stage="create_certificate_template"}' in body
+    assert 'vce_batch_size' in body
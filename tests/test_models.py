@@ -0,0 +1,66 @@
+import pickle
+import uuid
+
+import pytest
+
+from blockcerts.misc import format_recipients, get_tools_config
+from blockcerts.models import Recipient, Template, Issuer, JobConfig
+
+
+@pytest.fixture
+def recipient():
+    return Recipient.from_dict(dict(name='Ada', identity='ada@mail.com', pubkey='-', additional_fields={}, extra=1))
+
+
+def test_attribute_and_key_access(recipient):
+    assert recipient.name == recipient['name'] == recipient.get('name') == 'Ada'
+    assert recipient.get('missing', 'default') == 'default'
+    with pytest.raises(KeyError):
+        recipient['extra']
+
+
+def test_immutable(recipient):
+    with pytest.raises(AttributeError):
+        recipient.name = 'Alan'
+    with pytest.raises(AttributeError):
+        recipient.anything = 1
+    changed = recipient.replace(name='Alan')
+    assert (recipient.name, changed.name) == ('Ada', 'Alan')
+
+
+def test_unknown_fields_are_refused():
+    with pytest.raises(TypeError):
+        Recipient(name='Ada', extra=1)
+
+
+def test_pickle(recipient):
+    assert pickle.loads(pickle.dumps(recipient)) == recipient
+
+
+def test_job_config_reads_app_config():
+    job_config = JobConfig(config={'CERT_STORE_PATH': '/tmp/store'}, eth_public_key='0xabc')
+    assert job_config.eth_public_key == job_config.get('eth_public_key') == '0xabc'
+    assert job_config.cert_store_path == job_config.get('cert_store_path') == '/tmp/store'
+    assert job_config.get('eth_chain_id_ropsten', 3) == 3
+
+
+def test_recipients_and_template_are_not_modified(app, issuer, template, three_recipients):
+    issuer = Issuer.from_dict(issuer)
+    template = Template.from_dict(dict(template, display_html='%RECIPIENT_NAME%', expires_at='2028-01-01'))
+    recipients = [Recipient.from_dict(recipient) for recipient in three_recipients]
+
+    formatted = format_recipients(recipients, template, issuer)
+    tools_config = get_tools_config(issuer, template, JobConfig(config={}))
+
+    assert [recipient.additional_fields['displayHtml'] for recipient in formatted] == ['Phaws', 'John', 'Ben']
+    assert all(recipient.additional_fields['displayHtml'] == '' for recipient in recipients)
+    assert tools_config.additional_global_fields[-1] == {'path': '$.expires', 'value': '2028-01-01'}
+    assert len(template.additional_global_fields) == len(tools_config.additional_global_fields) - 1
+
+
+def test_badge_id_generated_without_template_id(app, issuer, template):
+    issuer = Issuer.from_dict(issuer)
+    template = Template.from_dict(dict(template, id=None))
+    badge_id = get_tools_config(issuer, template, JobConfig(config={})).badge_id
+    assert badge_id != 'None'
+    assert badge_id == str(uuid.UUID(badge_id))
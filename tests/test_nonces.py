@@ -0,0 +1,28 @@
+from blockcerts.issuer.cert_issuer.nonces import NonceManager
+
+
+def test_consecutive_nonces():
+    nonces = NonceManager()
+    assert nonces.allocate(5) == 5
+    # The node doesn't know about nonce 5 yet.
+    assert nonces.allocate(5) == 6
+    # Another process or node moved ahead.
+    assert nonces.allocate(9) == 9
+
+
+def test_release():
+    nonces = NonceManager()
+    first, second = nonces.allocate(5), nonces.allocate(5)
+    nonces.release(second)
+    assert nonces.allocate(5) == second
+    nonces.release(first)
+    assert nonces.next_nonce is None
+    assert nonces.allocate(5) == first
+
+
+def test_resync():
+    nonces = NonceManager()
+    nonces.allocate(5), nonces.allocate(5)
+    nonces.resync()
+    # The transaction at nonce 5 was dropped, the node points at it again.
+    assert nonces.allocate(5) == 5
@@ -0,0 +1,36 @@
+import sys
+
+import pytest
+
+from flaskapp import preload
+from flaskapp.preload import LazyModule, lazy_import, warm
+
+
+@pytest.fixture
+def heavy_module(tmp_path, monkeypatch):
+    (tmp_path / 'heavy_module_for_tests.py').write_text('VALUE = 42\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(preload, '_lazy_modules', [])
+    yield 'heavy_module_for_tests'
+    sys.modules.pop('heavy_module_for_tests', None)
+
+
+def test_imported_on_first_use(heavy_module):
+    module = lazy_import(heavy_module)
+    assert isinstance(module, LazyModule)
+    assert heavy_module not in sys.modules
+    assert module.VALUE == 42
+    assert heavy_module in sys.modules
+
+
+def test_patches_are_seen(heavy_module, monkeypatch):
+    module = lazy_import(heavy_module)
+    monkeypatch.setattr(f'{heavy_module}.VALUE', 7)
+    assert module.VALUE == 7
+
+
+def test_warm(heavy_module):
+    lazy_import(heavy_module)
+    timings = warm(freeze=False)
+    assert list(timings) == [heavy_module]
+    assert heavy_module in sys.modules
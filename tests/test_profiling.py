@@ -0,0 +1,127 @@
+import pstats
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+import pytest
+from flask import url_for
+
+from flaskapp.profiling import PROFILE_TOKEN_HEADER, PROFILE_NAME_HEADER, GreenletProfile, SamplingProfiler
+
+
+@pytest.fixture
+def profiling_app(app, tmp_path):
+    app.config['PROFILE_TOKEN'] = 'secret'
+    app.config['PROFILE_DIR'] = str(tmp_path)
+    app.config['PROFILE_MAX_FILES'] = 2
+    yield app
+
+
+def test_profile_requested_by_header(profiling_app, client, tmp_path):
+    response = client.get(url_for('ping_route', _external=True), headers={PROFILE_TOKEN_HEADER: 'secret'})
+    assert response.status_code == 200
+    name = response.headers[PROFILE_NAME_HEADER]
+    assert name.endswith('-ping_route.prof')
+    assert pstats.Stats(str(tmp_path / name)).total_calls > 0
+
+    response = client.get(url_for('ping_route', _external=True), headers={PROFILE_TOKEN_HEADER: 'wrong'})
+    assert response.status_code == 200
+    assert PROFILE_NAME_HEADER not in response.headers
+
+
+def test_profile_sampling(profiling_app, client, tmp_path):
+    profiling_app.config['PROFILE_SAMPLE_RATE'] = 1.0
+    profiling_app.config['PROFILE_MODE'] = 'sampling'
+    response = client.get(url_for('ping_route', _external=True))
+    assert response.headers[PROFILE_NAME_HEADER].endswith('-ping_route.txt')
+
+    profiling_app.config['PROFILE_SAMPLE_RATE'] = 0.0
+    response = client.get(url_for('ping_route', _external=True))
+    assert PROFILE_NAME_HEADER not in response.headers
+
+
+def test_profiles_ring_and_admin_endpoints(profiling_app, client):
+    headers = {PROFILE_TOKEN_HEADER: 'secret'}
+    names = [
+        client.get(url_for('ping_route', _external=True), headers=headers).headers[PROFILE_NAME_HEADER]
+        for _ in range(3)
+    ]
+    response = client.get(url_for('list_profiles', _external=True), headers=headers)
+    assert response.status_code == 200
+    listed = [profile['name'] for profile in response.get_json()['profiles']]
+    assert len(listed) == 2
+    assert names[2] in listed
+
+    response = client.get(url_for('download_profile', name=names[2], _external=True), headers=headers)
+    assert response.status_code == 200
+    assert response.data
+
+    response = client.get(url_for('download_profile', name='../config.py', _external=True), headers=headers)
+    assert response.status_code == 404
+
+
+def test_admin_endpoints_need_token(profiling_app, client):
+    assert client.get(url_for('list_profiles', _external=True)).status_code == 401
+    profiling_app.config['PROFILE_TOKEN'] = None
+    assert client.get(url_for('list_profiles', _external=True)).status_code == 404
+
+
+def test_profiled_issue_covers_cpu_bound_stages(profiling_app, client, tmp_path, issuer, template, three_recipients,
+                                                job):
+    profiling_app.config['CPU_WORKERS'] = 1
+
+    @contextmanager
+    def issuing_account(job_data, job_config):
+        yield job_config
+
+    batch_issuer = mock.Mock(tx_id='0xabc')
+    batch_issuer.return_value.issue.return_value = ('0xabc', {})
+    with mock.patch('blockcerts.misc.issuing_account', issuing_account), \
+            mock.patch('blockcerts.misc.get_issuer_config'), \
+            mock.patch('blockcerts.issuer.cert_issuer.simple.SimplifiedCertificateBatchIssuer', batch_issuer), \
+            mock.patch('blockcerts.misc.get_certificate_store', return_value=None), \
+            mock.patch('blockcerts.misc.track_anchor'), \
+            mock.patch('blockcerts.workers.CpuWorkerPool') as pool:
+        response = client.post(
+            url_for('issue_certs', _external=True),
+            json=dict(issuer=issuer, template=template, recipients=three_recipients, job=job),
+            headers={PROFILE_TOKEN_HEADER: 'secret'},
+        )
+    assert response.status_code == 200
+    pool.return_value.run.assert_not_called()
+    stats = pstats.Stats(str(tmp_path / response.headers[PROFILE_NAME_HEADER])).stats
+    functions = {function for _, _, function in stats}
+    assert 'create_certificate_template' in functions
+
+
+def spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def own_work():
+    spin(0.05)
+
+
+def other_work():
+    spin(0.05)
+
+
+@pytest.mark.parametrize('profiler', [GreenletProfile(), SamplingProfiler(interval=0.001)])
+def test_profiler_leaves_out_other_greenlets(profiler):
+    greenlet = pytest.importorskip('greenlet')
+
+    def request():
+        profiler.enable()
+        greenlet.greenlet(other_work).switch()
+        own_work()
+        profiler.disable()
+
+    greenlet.greenlet(request).switch()
+    if isinstance(profiler, SamplingProfiler):
+        recorded = ';'.join(profiler.stacks)
+    else:
+        recorded = ';'.join(function for _, _, function in pstats.Stats(profiler).stats)
+    assert 'own_work' in recorded
+    assert 'other_work' not in recorded
@@ -0,0 +1,120 @@
+import json
+import time
+from unittest import mock
+
+import pytest
+from web3 import Web3
+
+from blockcerts.issuer.cert_issuer import providers
+from blockcerts.issuer.cert_issuer.providers import NodePool, PooledHTTPProvider, get_node_pool
+
+
+class FakeProvider:
+    def __init__(self, result=None, delay=0.0, error=None):
+        self.result = result
+        self.delay = delay
+        self.error = error
+        self.calls = []
+
+    def make_request(self, method, params):
+        self.calls.append(method)
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return {'jsonrpc': '2.0', 'id': 1, 'result': self.result}
+
+
+def make_pool(*fake_providers, **options):
+    pool = NodePool([f'http://node-{i}' for i in range(len(fake_providers))], **options)
+    for node, provider in zip(pool.nodes, fake_providers):
+        node.provider = provider
+    return pool
+
+
+def test_reads_go_to_fastest_node():
+    slow, fast = FakeProvider('slow'), FakeProvider('fast')
+    pool = make_pool(slow, fast)
+    pool.nodes[0].latency, pool.nodes[1].latency = 1.0, 0.1
+    assert pool.request('eth_chainId', [])['result'] == 'fast'
+    assert slow.calls == []
+
+
+def test_failover_and_circuit_breaker():
+    down, up = FakeProvider(error=ConnectionError()), FakeProvider('up')
+    pool = make_pool(down, up, hedge_delay=0)
+    pool.nodes[1].latency = 0.5
+    assert pool.request('eth_chainId', [])['result'] == 'up'
+    for _ in range(providers.FAILURE_THRESHOLD):
+        pool.nodes[0].record_failure(0.0)
+    assert not pool.nodes[0].available
+    down.calls.clear()
+    pool.request('eth_chainId', [])
+    assert down.calls == []
+
+
+def test_json_rpc_errors_are_not_failures():
+    pool = make_pool(FakeProvider())
+    pool.nodes[0].provider.make_request = lambda method, params: {'error': {'message': 'nonce too low'}}
+    assert 'error' in pool.request('eth_sendRawTransaction', ['0x'])
+    assert pool.nodes[0].failures == 0
+
+
+def test_hedged_read():
+    stuck, spare = FakeProvider('stuck', delay=0.5), FakeProvider('spare')
+    pool = make_pool(stuck, spare, hedge_delay=0.05)
+    pool.nodes[1].latency = 0.1
+    start = time.perf_counter()
+    assert pool.request('eth_getTransactionReceipt', ['0xabc'])['result'] == 'spare'
+    assert time.perf_counter() - start < 0.5
+
+
+def test_broadcast_to_several_nodes():
+    first, second, third = FakeProvider('0x1'), FakeProvider('0x1'), FakeProvider('0x1')
+    pool = make_pool(first, second, third, broadcast_count=2)
+    pool.nodes[2].latency = 1.0
+    assert pool.request('eth_sendRawTransaction', ['0x'])['result'] == '0x1'
+    time.sleep(0.05)
+    assert (len(first.calls), len(second.calls), len(third.calls)) == (1, 1, 0)
+
+
+def test_broadcast_fails_when_no_node_answers():
+    pool = make_pool(FakeProvider(error=ConnectionError()), FakeProvider(error=ConnectionError()))
+    with pytest.raises(ConnectionError):
+        pool.request('eth_sendRawTransaction', ['0x'])
+
+
+def test_pools_are_shared():
+    with mock.patch.object(providers, '_pools', {}):
+        pool = get_node_pool('http://a, http://b')
+        assert [node.url for node in pool.nodes] == ['http://a', 'http://b']
+        assert get_node_pool('http://a, http://b') is pool
+        assert PooledHTTPProvider(pool).endpoint_uri == 'http://a,http://b'
+
+
+def test_request_batch_keeps_order():
+    pool = make_pool(FakeProvider())
+    pool.nodes[0].provider.get_request_kwargs = lambda: {}
+
+    def answer(url, data, **kwargs):
+        calls = json.loads(data)
+        assert kwargs['timeout'] == providers.BATCH_TIMEOUT
+        return mock.Mock(json=lambda: [dict(id=call['id'], result=call['method']) for call in reversed(calls)])
+
+    pool.nodes[0].session = mock.Mock(post=mock.Mock(side_effect=answer))
+    results = PooledHTTPProvider(pool).request_batch([('eth_chainId', []), ('eth_getBalance', ['0x1', 'latest'])])
+    assert results == ['eth_chainId', 'eth_getBalance']
+
+
+def test_request_batch_without_batch_support():
+    provider = FakeProvider('0x1')
+    pool = make_pool(provider)
+    provider.get_request_kwargs = lambda: {}
+    unsupported = {'id': None, 'error': {'message': 'batch requests not supported'}}
+    pool.nodes[0].session = mock.Mock(post=mock.Mock(return_value=mock.Mock(json=lambda: unsupported)))
+    assert PooledHTTPProvider(pool).request_batch([('eth_chainId', []), ('eth_blockNumber', [])]) == ['0x1'] * 2
+    assert provider.calls == ['eth_chainId', 'eth_blockNumber']
+
+
+def test_is_connected():
+    assert Web3(PooledHTTPProvider(make_pool(FakeProvider('client/v1')))).isConnected()
+    assert not Web3(PooledHTTPProvider(make_pool(FakeProvider(error=IOError())))).isConnected()
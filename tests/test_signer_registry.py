@@ -0,0 +1,36 @@
+from unittest import mock
+
+from blockcerts.issuer.cert_issuer import signer_registry
+from blockcerts.issuer.cert_issuer.signer_registry import SignerRegistry, key_fingerprint
+
+KEY = '0x' + '11' * 32
+
+
+def test_accounts_are_derived_once():
+    registry = SignerRegistry()
+    with mock.patch.object(signer_registry.Account, 'from_key', wraps=signer_registry.Account.from_key) as from_key:
+        signer = registry.get(KEY)
+        assert registry.get(KEY[2:]) is signer
+    from_key.assert_called_once()
+    assert signer.address == signer_registry.Account.from_key(KEY).address
+
+
+def test_keys_are_not_stored():
+    registry = SignerRegistry()
+    registry.get(KEY)
+    assert list(registry._signers) == [key_fingerprint(KEY)]
+    assert KEY[2:] not in key_fingerprint(KEY)
+
+
+def test_expiry_and_capacity():
+    registry = SignerRegistry(max_size=2, ttl=60)
+    keys = ['0x' + f'{i:02x}' * 32 for i in range(1, 4)]
+    for key in keys:
+        registry.get(key)
+    assert len(registry) == 2
+    assert key_fingerprint(keys[0]) not in registry._signers
+
+    with mock.patch.object(signer_registry.time, 'monotonic', return_value=signer_registry.time.monotonic() + 61):
+        first = registry.get(keys[1])
+        assert len(registry) == 1
+    assert first.address == signer_registry.Account.from_key(keys[1]).address
@@ -0,0 +1,106 @@
+import pytest
+
+from blockcerts.store import CertificateStore, JobExistsError, JOB_STATUS_ISSUING, JOB_STATUS_ISSUED, \
+    JOB_STATUS_CONFIRMED, JOB_STATUS_FAILED
+
+
+@pytest.fixture
+def store(tmp_path):
+    yield CertificateStore(str(tmp_path / 'cert_store.sqlite3'))
+
+
+@pytest.fixture
+def stored_job(store, issued_cert):
+    store.create_job('job-1', 'ethereum_ropsten')
+    writer = store.writer('job-1')
+    writer.buffer_size = 2
+    for i in range(5):
+        writer.add(f'uid-{i}', dict(issued_cert, id=f'urn:uuid:uid-{i}'))
+    writer.flush()
+    store.finish_job('job-1', '0xabc')
+    yield 'job-1'
+
+
+def test_create_job(store):
+    store.create_job('job-1', 'ethereum_ropsten')
+    job = store.get_job('job-1')
+    assert job['status'] == JOB_STATUS_ISSUING
+    assert job['tx_id'] is None
+    with pytest.raises(JobExistsError):
+        store.create_job('job-1', 'ethereum_ropsten')
+
+
+def test_failed_jobs_are_reused_unless_broadcast(store):
+    store.create_job('job-1', 'ethereum_ropsten')
+    store.finish_job('job-1', None, status=JOB_STATUS_FAILED)
+    store.create_job('job-1', 'ethereum_ropsten')
+    assert store.get_job('job-1')['status'] == JOB_STATUS_ISSUING
+
+    store.finish_job('job-1', '0xabc', status=JOB_STATUS_FAILED)
+    with pytest.raises(JobExistsError):
+        store.create_job('job-1', 'ethereum_ropsten')
+
+
+def test_finish_job(store, stored_job):
+    job = store.get_job(stored_job)
+    assert job['status'] == JOB_STATUS_ISSUED
+    assert job['tx_id'] == '0xabc'
+    assert job['certificate_count'] == 5
+
+
+def test_replace_tx(store, stored_job, issued_cert):
+    old_tx_id = issued_cert['signature']['anchors'][0]['sourceId']
+    store.add_certificates(stored_job, [(5, 'uid-5', dict(issued_cert, id='urn:uuid:uid-5', note=old_tx_id))])
+    store.replace_tx(stored_job, old_tx_id, '0xdef', status=JOB_STATUS_CONFIRMED)
+    job = store.get_job(stored_job)
+    assert job['status'] == JOB_STATUS_CONFIRMED
+    assert job['tx_id'] == '0xdef'
+    certificate = store.get_certificate(stored_job, 'uid-0')
+    assert certificate['signature']['anchors'][0]['sourceId'] == '0xdef'
+    certificate = store.get_certificate(stored_job, 'uid-5')
+    assert certificate['signature']['anchors'][0]['sourceId'] == '0xdef'
+    assert certificate['note'] == old_tx_id
+
+
+def test_get_certificates_by_cursor(store, stored_job):
+    certificates, cursor = store.get_certificates(stored_job, limit=2)
+    assert [cert['id'] for cert in certificates] == ['urn:uuid:uid-0', 'urn:uuid:uid-1']
+    certificates, cursor = store.get_certificates(stored_job, cursor=cursor, limit=2)
+    assert [cert['id'] for cert in certificates] == ['urn:uuid:uid-2', 'urn:uuid:uid-3']
+    certificates, cursor = store.get_certificates(stored_job, cursor=cursor, limit=2)
+    assert [cert['id'] for cert in certificates] == ['urn:uuid:uid-4']
+    assert cursor is None
+
+
+def test_get_certificate(store, stored_job, issued_cert):
+    assert store.get_certificate(stored_job, 'uid-3') == dict(issued_cert, id='urn:uuid:uid-3')
+    assert store.get_certificate(stored_job, 'missing') is None
+    assert store.get_job('missing') is None
+
+
+def test_job_endpoints(app, json_client, store, stored_job):
+    app.config['CERT_STORE_PATH'] = store.path
+
+    response = json_client.get(f'/jobs/{stored_job}')
+    assert response.status_code == 200
+    assert response.json['tx_id'] == '0xabc'
+
+    response = json_client.get(f'/jobs/{stored_job}/certificates?page=2&limit=2')
+    assert [cert['id'] for cert in response.json['certificates']] == ['urn:uuid:uid-2', 'urn:uuid:uid-3']
+    assert response.json['next_cursor'] == 3
+
+    response = json_client.get(f'/jobs/{stored_job}/certificates?cursor=3&limit=2')
+    assert [cert['id'] for cert in response.json['certificates']] == ['urn:uuid:uid-4']
+    assert response.json['next_cursor'] is None
+
+    response = json_client.get(f'/jobs/{stored_job}/certificates/uid-1')
+    assert response.json['id'] == 'urn:uuid:uid-1'
+
+
+def test_job_endpoints_not_found(app, json_client, store):
+    app.config['CERT_STORE_PATH'] = store.path
+    assert json_client.get('/jobs/missing').status_code == 404
+    assert json_client.get('/jobs/missing/certificates').status_code == 404
+
+    app.config['CERT_STORE_PATH'] = ''
+    assert json_client.get('/jobs/missing').status_code == 404
@@ -0,0 +1,140 @@
+from unittest import mock
+
+import pytest
+from web3.exceptions import TransactionNotFound
+
+from blockcerts.issuer.cert_issuer.fees import FeeEstimate
+from blockcerts.issuer.cert_issuer.nonces import NonceManager
+from blockcerts.tracker import ConfirmationTracker, PendingAnchor
+
+
+class FakeChain:
+    """Minimal stand-in for `web3.eth`, mining whichever transactions are listed in `mined`."""
+
+    def __init__(self):
+        self.blockNumber = 100
+        self.mined = {}
+
+    def getBalance(self, address):
+        return 500
+
+    def getTransactionReceipt(self, tx_id):
+        if tx_id not in self.mined:
+            raise TransactionNotFound(tx_id)
+        return {'blockNumber': self.mined[tx_id]}
+
+
+@pytest.fixture
+def chain():
+    yield FakeChain()
+
+
+@pytest.fixture
+def anchor(chain):
+    sent = iter(['0x2', '0x3', '0x4'])
+    yield PendingAnchor(
+        job_id='job-1',
+        web3=mock.Mock(eth=chain),
+        send_transaction=mock.Mock(side_effect=lambda tx_info: next(sent)),
+        tx_info={'nonce': 7, 'gas': 21000, 'maxFeePerGas': 100, 'maxPriorityFeePerGas': 10},
+        fees=FeeEstimate(21000, max_fee_per_gas=100, max_priority_fee_per_gas=10),
+        tx_id='0x1',
+        max_gas_price=120,
+        on_replaced=mock.Mock(),
+        on_confirmed=mock.Mock(),
+    )
+
+
+def test_confirmed_after_enough_blocks(chain, anchor):
+    tracker = ConfirmationTracker(confirmations=3, deadline=60, max_replacements=5, interval=1)
+    tracker.pending.append(anchor)
+    chain.mined['0x1'] = 99
+    tracker.poll()
+    assert tracker.pending == [anchor]
+    chain.blockNumber = 101
+    tracker.poll()
+    assert tracker.pending == []
+    anchor.on_confirmed.assert_called_once_with('job-1', '0x1')
+    anchor.on_replaced.assert_not_called()
+
+
+def test_stuck_transaction_replaced_at_same_nonce(chain, anchor):
+    tracker = ConfirmationTracker(confirmations=1, deadline=0, max_replacements=5, interval=1)
+    tracker.pending.append(anchor)
+    tracker.poll()
+    tx_info = anchor.send_transaction.call_args[0][0]
+    assert tx_info['nonce'] == 7
+    assert (tx_info['maxFeePerGas'], tx_info['maxPriorityFeePerGas']) == (113, 12)
+    assert anchor.tx_ids == ['0x1', '0x2']
+
+    # The next bump would go beyond the job's gas price cap.
+    tracker.poll()
+    assert anchor.tx_ids == ['0x1', '0x2']
+
+    chain.mined['0x2'] = 100
+    tracker.poll()
+    anchor.on_replaced.assert_called_once_with('job-1', '0x1', '0x2')
+    anchor.on_confirmed.assert_called_once_with('job-1', '0x2')
+
+
+def test_replacements_limited(chain, anchor):
+    anchor.max_gas_price = None
+    tracker = ConfirmationTracker(confirmations=1, deadline=0, max_replacements=2, interval=1)
+    tracker.pending.append(anchor)
+    for _ in range(4):
+        tracker.poll()
+    assert anchor.tx_ids == ['0x1', '0x2', '0x3']
+
+
+def test_not_replaced_without_store(chain, anchor):
+    anchor.on_replaced = None
+    tracker = ConfirmationTracker(confirmations=1, deadline=0, max_replacements=5, interval=1)
+    tracker.pending.append(anchor)
+    tracker.poll()
+    anchor.send_transaction.assert_not_called()
+    assert tracker.pending == [anchor]
+
+
+def test_reservation_settled_on_confirmation(chain, anchor):
+    anchor.reservation = mock.Mock()
+    tracker = ConfirmationTracker(confirmations=1, deadline=60, max_replacements=5, interval=1)
+    tracker.pending.append(anchor)
+    chain.mined['0x1'] = 100
+    tracker.poll()
+    anchor.reservation.settle.assert_called_once_with(500)
+
+
+def test_gives_up_on_transactions_never_mined(chain, anchor):
+    anchor.reservation = mock.Mock()
+    anchor.nonces = NonceManager()
+    anchor.nonces.allocate(7)
+    anchor.on_replaced = None
+    anchor.on_given_up = mock.Mock()
+    tracker = ConfirmationTracker(confirmations=1, deadline=0, max_replacements=5, interval=1, give_up_after=60)
+    tracker.pending.append(anchor)
+    tracker.poll()
+    assert tracker.pending == [anchor]
+    anchor.first_sent_at -= 61
+    tracker.poll()
+    assert tracker.pending == []
+    anchor.reservation.settle.assert_called_once_with()
+    anchor.on_confirmed.assert_not_called()
+    anchor.on_given_up.assert_called_once_with('job-1', '0x1')
+    # The dropped nonce is handed out again once the node's pending nonce falls back to it.
+    assert anchor.nonces.allocate(7) == 7
+
+
+def test_job_failed_when_given_up(app, tmp_path):
+    from blockcerts import misc
+    from blockcerts.store import CertificateStore, JOB_STATUS_FAILED
+
+    store = CertificateStore(str(tmp_path / 'cert_store.sqlite3'))
+    store.create_job('job-1', 'ethereum_ropsten')
+    store.finish_job('job-1', '0x1')
+    tracker = mock.Mock()
+    with mock.patch('blockcerts.tracker.get_confirmation_tracker', return_value=tracker), \
+            mock.patch('blockcerts.tracker.PendingAnchor.from_handler') as from_handler:
+        misc.track_anchor(mock.Mock(), 'job-1', store)
+    from_handler.call_args[1]['on_given_up']('job-1', '0x1')
+    assert store.get_job('job-1')['status'] == JOB_STATUS_FAILED
+    assert store.get_job('job-1')['tx_id'] == '0x1'
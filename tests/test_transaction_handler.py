@@ -0,0 +1,66 @@
+import os
+from unittest import mock
+
+import pytest
+
+from blockcerts.issuer.cert_issuer.errors import UnexpectedChainError, InsufficientFundsError
+from blockcerts.issuer.cert_issuer.fees import FeeEstimate
+from blockcerts.issuer.cert_issuer.ledger import BalanceLedger
+from blockcerts.issuer.cert_issuer.simple import SimplifiedEthereumTransactionHandler
+
+
+@pytest.fixture
+def handler():
+    with mock.patch.dict(os.environ, {'ETH_NODE_URL_ROPSTEN': 'http://node'}):
+        handler = SimplifiedEthereumTransactionHandler(
+            chain='ropsten',
+            path_to_secret='',
+            private_key='0x' + '11' * 32,
+            account_from='0x0000000000000000000000000000000000000001',
+            ledger=BalanceLedger(),
+        )
+    handler.web3 = mock.Mock()
+    handler.web3.provider.request_batch.return_value = ['0x3', '0x7', hex(10 ** 18)]
+    handler.fee_oracle = mock.Mock()
+    handler.fee_oracle.estimate.return_value = FeeEstimate(21000, max_fee_per_gas=100, max_priority_fee_per_gas=10)
+    handler.send_transaction = mock.Mock(side_effect=[ValueError('underpriced'), '0xabc'])
+    yield handler
+
+
+def test_preflight_in_one_batch(handler):
+    assert handler.issue_transaction(b'\x01' * 32) == '0xabc'
+    handler.web3.provider.request_batch.assert_called_once()
+    first, retry = (call[0][0] for call in handler.send_transaction.call_args_list)
+    assert first['nonce'] == retry['nonce'] == 7
+    assert first['chainId'] == 3
+    assert retry['maxFeePerGas'] > first['maxFeePerGas']
+    assert handler.reservation.amount == 21000 * retry['maxFeePerGas']
+
+
+def test_preflight_refuses_other_chains(handler):
+    handler.web3.provider.request_batch.return_value = ['0x1', '0x7', hex(10 ** 18)]
+    with pytest.raises(UnexpectedChainError):
+        handler.issue_transaction(b'\x01' * 32)
+    handler.send_transaction.assert_not_called()
+
+
+def test_preflight_accepts_formatted_quantities(handler):
+    # e.g. eth-tester's provider, which returns ints rather than hex strings
+    handler.web3.provider.request_batch.return_value = [3, 7, 10 ** 18]
+    assert handler.issue_transaction(b'\x01' * 32) == '0xabc'
+
+
+def test_balance_read_only_when_stale(handler):
+    handler.issue_transaction(b'\x01' * 32)
+    handler.send_transaction = mock.Mock(return_value='0xdef')
+    handler.web3.provider.request_batch.return_value = ['0x3', '0x8']
+    handler.issue_transaction(b'\x02' * 32)
+    calls = handler.web3.provider.request_batch.call_args[0][0]
+    assert [method for method, params in calls] == ['eth_chainId', 'eth_getTransactionCount']
+
+
+def test_underfunded_batch_rejected(handler):
+    handler.web3.provider.request_batch.return_value = ['0x3', '0x7', hex(1000)]
+    with pytest.raises(InsufficientFundsError):
+        handler.issue_transaction(b'\x01' * 32)
+    handler.send_transaction.assert_not_called()
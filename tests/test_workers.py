@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+from blockcerts.workers import CpuWorkerPool
+from flaskapp.errors import ServiceUnavailable
+
+
+@pytest.fixture
+def pool():
+    pool = CpuWorkerPool(max_workers=1, max_queued=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_runs_in_another_process(pool):
+    assert pool.run(os.getpid) != os.getpid()
+
+
+def test_full_queue_is_refused(pool):
+    pool._slots.acquire()
+    pool._slots.acquire()
+    with pytest.raises(ServiceUnavailable):
+        pool.run(os.getpid)
+    pool._slots.release()
+    assert pool.run(abs, -1) == 1